@@ -0,0 +1,76 @@
+"""
+Benchmark resolving changed files against a large synthetic CODEOWNERS file.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codeowners [rules] [paths]
+"""
+import random
+import sys
+import time
+
+from src.codeowners import CodeOwners
+
+
+def synthetic_codeowners(rules: int, rng: random.Random) -> str:
+    lines = ["* @org/everyone", "*.md @org/docs"]
+    for i in range(rules):
+        team = f"@org/team-{i % 200}"
+        kind = i % 4
+        if kind == 0:
+            lines.append(f"/services/svc-{i}/ {team}")
+        elif kind == 1:
+            lines.append(f"/libs/lib-{i % 500}/src/*.py {team}")
+        elif kind == 2:
+            lines.append(f"/services/svc-{rng.randrange(rules)}/config/ {team}")
+        else:
+            lines.append(f"config-{i}.yaml {team}")
+    return "\n".join(lines)
+
+
+def synthetic_paths(count: int, rules: int, rng: random.Random) -> list[str]:
+    paths = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            svc = rng.randrange(rules)
+            paths.append(f"services/svc-{svc}/config/app/settings.yaml")
+        else:
+            paths.append(f"libs/lib-{rng.randrange(500)}/src/module_{rng.randrange(50)}.py")
+    return paths
+
+
+def naive_owners(codeowners: CodeOwners, path: str) -> list[str]:
+    owners = []
+    for rule in codeowners.rules:
+        if rule.regex.fullmatch(path):
+            owners = rule.owners
+    return owners
+
+
+def main(rules: int = 5000, count: int = 5000) -> None:
+    rng = random.Random(42)
+    text = synthetic_codeowners(rules, rng)
+    paths = synthetic_paths(count, rules, rng)
+
+    start = time.perf_counter()
+    codeowners = CodeOwners(text)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [codeowners.owners_for(path) for path in paths]
+    index_time = time.perf_counter() - start
+
+    sample = paths[: max(1, count // 10)]
+    start = time.perf_counter()
+    naive = [naive_owners(codeowners, path) for path in sample]
+    naive_time = (time.perf_counter() - start) * count / len(sample)
+
+    assert naive == indexed[: len(sample)]
+    print(f"{rules} rules, {count} paths")
+    print(f"build index:    {build * 1000:8.1f} ms")
+    print(f"indexed lookup: {index_time * 1000:8.1f} ms ({index_time / count * 1e6:.1f} us/path)")
+    print(f"naive scan:     {naive_time * 1000:8.1f} ms (estimated from {len(sample)} paths)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,71 @@
+"""
+Benchmark compiling the scoring rules once per config rather than once per PR.
+
+Scores PRs under a few distinct configs, each with a holiday calendar, first building
+the rules from scratch for every PR and then through the compiled rules cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_config [prs]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+
+from src.config import CompiledRules, RiskConfig, cache_info, clear_cache, compile_rules
+from src.replay import SnapshotFile
+from src.risk import assess_risk
+
+
+def calendar(path: str, days: int = 200) -> None:
+    start = datetime(2024, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("holidays:\n")
+        for i in range(days):
+            f.write(f"  - date: {(start + timedelta(days=i * 3)).date()}\n")
+
+
+def main(count: int = 10000) -> None:
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "holidays.yaml")
+        calendar(path)
+        configs = [
+            RiskConfig(calendars=(path,)),
+            RiskConfig(max_files=10, min_certainty=80, calendars=(path,)),
+            RiskConfig(
+                churn_weights=".sql=2,.md=0", timezone="Europe/London", calendars=(path,)
+            ),
+        ]
+        prs = [
+            (
+                rng.choice(configs),
+                [SnapshotFile(f"src/module_{i}.py", rng.randrange(100)) for i in range(10)],
+                datetime(2024, 1, 1, tzinfo=UTC) + timedelta(hours=rng.randrange(24 * 365)),
+            )
+            for _ in range(count)
+        ]
+
+        def score(rules_for):
+            start = time.perf_counter()
+            for config, files, when in prs:
+                rules = rules_for(config)
+                assess_risk(files, ["alice"], current_time=when, **rules.risk_kwargs())
+            return time.perf_counter() - start
+
+        uncached = score(CompiledRules.compile)
+        clear_cache()
+        cached = score(compile_rules)
+        info = cache_info()
+
+    print(f"{count} PRs under {len(configs)} configs")
+    print(f"  compiled per PR: {uncached * 1000:.0f} ms ({uncached / count * 1e6:.1f} us/PR)")
+    print(f"  compiled cache:  {cached * 1000:.0f} ms ({cached / count * 1e6:.1f} us/PR)")
+    print(f"  hit rate {info.hit_rate:.2%}, saving {(uncached - cached) / count * 1e6:.1f} us/PR")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
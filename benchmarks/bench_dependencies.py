@@ -0,0 +1,93 @@
+"""
+Benchmark parsing and diffing large lockfiles.
+
+Writes synthetic package-lock.json and poetry.lock files with the given number of
+packages, then times a cold diff (both versions parsed), a diff whose old version is
+cached, and a fully cached diff, with the peak memory of each parse.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dependencies [packages]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src.dependencies import PARSERS, clear_cache, diff_manifest
+
+
+def package_lock(path: str, count: int, rng: random.Random, bump: float) -> None:
+    packages = {"": {"name": "app", "version": "1.0.0"}}
+    for i in range(count):
+        major = 1 + (rng.random() < bump)
+        packages[f"node_modules/pkg-{i}"] = {
+            "version": f"{major}.{i % 20}.{i % 7}",
+            "resolved": f"https://registry.npmjs.org/pkg-{i}/-/pkg-{i}-{major}.0.0.tgz",
+            "integrity": "sha512-" + "a" * 86 + "==",
+            "dependencies": {f"pkg-{(i + j) % count}": "^1.0.0" for j in range(1, 4)},
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"name": "app", "lockfileVersion": 3, "packages": packages}, f, indent=2)
+
+
+def poetry_lock(path: str, count: int, rng: random.Random, bump: float) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            major = 1 + (rng.random() < bump)
+            f.write(
+                f'[[package]]\nname = "pkg-{i}"\nversion = "{major}.{i % 20}.{i % 7}"\n'
+                f'description = "Package {i}"\noptional = false\npython-versions = ">=3.8"\n'
+                f'files = [\n    {{file = "pkg-{i}.whl", hash = "sha256:{"b" * 64}"}},\n]\n\n'
+                f"[package.dependencies]\npkg-{(i + 1) % count} = \">=1.0\"\n\n"
+            )
+        f.write('[metadata]\nlock-version = "2.0"\n')
+
+
+def read_file(path: str):
+    return open(path, encoding="utf-8")
+
+
+def main(count: int = 100000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for name, write in (("package-lock.json", package_lock), ("poetry.lock", poetry_lock)):
+            old, new = os.path.join(directory, "old_" + name), os.path.join(directory, name)
+            write(old, count, random.Random(1), 0.0)
+            write(new, count, random.Random(2), 0.01)
+            size = os.path.getsize(new) / 1024 / 1024
+            print(f"{name}: {count} packages, {size:.1f} MiB")
+
+            start = time.perf_counter()
+            with read_file(new) as f:
+                PARSERS[name](f)
+            elapsed = time.perf_counter() - start
+            # Measured separately, since tracing slows parsing down several times
+            tracemalloc.start()
+            with read_file(new) as f:
+                PARSERS[name](f)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  parse one version: {elapsed * 1000:.0f} ms, peak {peak / 1024 / 1024:.1f} MiB")
+
+            clear_cache()
+            for label, old_sha, new_sha in (
+                ("cold diff", old, new),
+                ("old version cached", old, old + ".unchanged"),
+                ("diff cached", old, new),
+            ):
+                if new_sha.endswith(".unchanged"):
+                    os.link(old, new_sha)
+                start = time.perf_counter()
+                diff = diff_manifest(name, old_sha, new_sha, read_file)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"  {label}: {elapsed * 1000:.1f} ms, {len(diff.changes)} changes, "
+                    f"{len(diff.major_bumps)} major"
+                )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,68 @@
+"""
+Benchmark reading a large PR diff from a local checkout.
+
+Creates a throwaway repository with a base commit and a head commit that changes the
+given number of files, then times iter_changed_files. The REST API path cannot be timed
+offline; for comparison the number of paginated requests it would need is printed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_git_diff [files]
+"""
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.git_diff import iter_changed_files
+
+API_PAGE_SIZE = 100
+API_FILE_LIMIT = 3000
+
+
+def git(repo: str, *args: str) -> None:
+    subprocess.run(["git", "-C", repo, *args], check=True, capture_output=True)
+
+
+def make_repo(repo: str, count: int) -> None:
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "user.name", "Bench")
+    for i in range(count):
+        directory = os.path.join(repo, f"pkg{i % 100}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.py"), "w") as f:
+            f.write("".join(f"line {n}\n" for n in range(20)))
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "base")
+    git(repo, "checkout", "-q", "-b", "head")
+    for i in range(count):
+        with open(os.path.join(repo, f"pkg{i % 100}", f"file{i}.py"), "a") as f:
+            f.write("changed\n")
+    git(repo, "commit", "-q", "-am", "head")
+
+
+def main(count: int = 20000) -> None:
+    with tempfile.TemporaryDirectory() as repo:
+        start = time.perf_counter()
+        make_repo(repo, count)
+        elapsed = time.perf_counter() - start
+        print(f"built fixture repo with {count} changed files in {elapsed:.1f} s")
+
+        start = time.perf_counter()
+        files = list(iter_changed_files(repo, "main", "head"))
+        elapsed = time.perf_counter() - start
+
+    assert len(files) == count
+    print(f"git diff --numstat: {elapsed * 1000:.1f} ms ({elapsed / count * 1e6:.1f} us/file)")
+    pages = math.ceil(min(count, API_FILE_LIMIT) / API_PAGE_SIZE)
+    print(
+        f"REST API: {pages} paginated requests at {API_PAGE_SIZE} files/page, "
+        f"and only the first {min(count, API_FILE_LIMIT)} files are returned"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
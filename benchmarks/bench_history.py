@@ -0,0 +1,85 @@
+"""
+Benchmark HistoryStore queries on a store with millions of file rows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_history [runs] [files_per_run]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+
+from src.history import HistoryStore
+
+TOP_LEVEL = ["infra", "services", "libs", "docs", "web", "tools"]
+
+
+def populate(history: HistoryStore, runs: int, files_per_run: int, rng: random.Random) -> None:
+    start = datetime(2024, 1, 1, tzinfo=UTC)
+    run_rows = []
+    file_rows = []
+    for run_id in range(1, runs + 1):
+        created_at = (start + timedelta(minutes=run_id)).timestamp()
+        # Only reverted runs are marked failed
+        failed = int(rng.random() < 0.1)
+        run_rows.append(
+            (run_id, "owner/repo", "sha", created_at, 90, "success", failed, 1.0, "{}")
+        )
+        for _ in range(files_per_run):
+            path = f"{rng.choice(TOP_LEVEL)}/pkg{rng.randrange(200)}/file{rng.randrange(50)}.py"
+            file_rows.append((run_id, "owner/repo", path, "", created_at, failed))
+
+    with history.connection:
+        history.connection.executemany(
+            "INSERT INTO runs (id, repo, sha, created_at, score, conclusion, reverted, "
+            "duration_ms, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            run_rows,
+        )
+        history.connection.executemany(
+            "INSERT INTO file_hits (run_id, repo, path, rule, created_at, failed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            file_rows,
+        )
+
+
+def timed(label: str, fn, repeat: int = 20) -> None:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:40} {min(timings) * 1000:8.2f} ms")
+
+
+def main(runs: int = 50000, files_per_run: int = 40) -> None:
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        with HistoryStore(os.path.join(directory, "history.db")) as history:
+            start = time.perf_counter()
+            populate(history, runs, files_per_run, rng)
+            elapsed = time.perf_counter() - start
+            print(f"inserted {runs * files_per_run} file rows in {elapsed:.1f} s")
+
+            since = datetime(2024, 1, 1, tzinfo=UTC) + timedelta(minutes=runs - 10000)
+            paths = [f"infra/pkg{i}/file{i % 50}.py" for i in range(100)]
+
+            timed(
+                "path_stats('infra/pkg1/', last 10k runs)",
+                lambda: history.path_stats("owner/repo", "infra/pkg1/", since),
+            )
+            timed(
+                "path_stats('infra/', all time)",
+                lambda: history.path_stats("owner/repo", "infra/"),
+                repeat=3,
+            )
+            timed(
+                "hot_paths(100 paths, last 10k runs)",
+                lambda: history.hot_paths("owner/repo", paths, since),
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,60 @@
+"""
+Benchmark partitioning and scoring a large monorepo PR by project.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_partitions [files] [projects]
+"""
+import random
+import sys
+import time
+from datetime import datetime, UTC
+
+from src.partitions import ProjectRoots, assess_partitions, partition_files
+from src.replay import SnapshotFile
+
+SUBDIRECTORIES = ["src", "src/handlers", "tests", "docs", "config"]
+EXTENSIONS = [".py", ".ts", ".md", ".json", ".env"]
+
+
+def synthetic_files(count: int, projects: int, rng: random.Random) -> list[SnapshotFile]:
+    return [
+        SnapshotFile(
+            f"services/svc_{rng.randrange(projects)}/{rng.choice(SUBDIRECTORIES)}/"
+            f"file_{i}{rng.choice(EXTENSIONS)}",
+            rng.randrange(200),
+            rng.randrange(50),
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(count: int = 50000, projects: int = 300, repeat: int = 3) -> None:
+    files = synthetic_files(count, projects, random.Random(42))
+    roots = ["services/*"] + [f"services/svc_{i}/src/handlers" for i in range(0, projects, 10)]
+    now = datetime(2024, 1, 3, 12, tzinfo=UTC)
+
+    partition = best_of(repeat, lambda: partition_files(files, ProjectRoots(roots)))
+    print(f"partition {count} files into {projects}+ projects: {partition * 1000:.1f} ms")
+
+    for workers in (1, None):
+        elapsed = best_of(
+            repeat,
+            lambda: assess_partitions(
+                files, ProjectRoots(roots), workers=workers, reviewers=["alice"], current_time=now
+            ),
+        )
+        print(f"assess_partitions workers={workers or 'cpus'}: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
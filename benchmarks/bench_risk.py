@@ -0,0 +1,46 @@
+"""
+Benchmark the per-file cost of assess_risk on a large synthetic PR.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_risk [files]
+"""
+import random
+import sys
+import time
+from datetime import datetime, UTC
+
+from src.replay import SnapshotFile
+from src.risk import assess_risk
+
+DIRECTORIES = ["src/api", "src/web", "vendor/lib", "docs", "infra/terraform", "tests"]
+EXTENSIONS = [".py", ".ts", ".md", ".json", ".tf", ".lock", ".snap"]
+
+
+def synthetic_files(count: int, rng: random.Random) -> list[SnapshotFile]:
+    return [
+        SnapshotFile(
+            f"{rng.choice(DIRECTORIES)}/file_{i}{rng.choice(EXTENSIONS)}",
+            rng.randrange(200),
+            rng.randrange(50),
+        )
+        for i in range(count)
+    ]
+
+
+def main(count: int = 50000, repeat: int = 5) -> None:
+    files = synthetic_files(count, random.Random(42))
+    now = datetime(2024, 1, 3, 12, tzinfo=UTC)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assess_risk(changed_files=files, reviewers=["alice"], current_time=now)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"{count} files: best of {repeat} {best * 1000:.1f} ms ({best / count * 1e6:.2f} us/file)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheInfo:
+    """How well a cache is doing."""
+
+    hits: int = 0
+    misses: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A thread-safe cache that drops the least recently used entry once it holds more than
+    maxsize.
+
+    Values are built outside the lock, so a slow build does not hold up other threads.
+    If two threads build the same key at once, both get the first value stored.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_build(self, key: K, build: Callable[[], V]) -> V:
+        """Return the value cached for key, calling build to create it if there is none."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return self._data[key]
+            self._misses += 1
+
+        value = build()
+        with self._lock:
+            value = self._data.setdefault(key, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def info(self) -> CacheInfo:
+        """Return the hit and miss counts and the number of entries."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, len(self._data))
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counts."""
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = 0
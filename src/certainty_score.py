@@ -23,12 +23,17 @@ class Conclusion(str, Enum):
 
 @dataclass
 class CertaintyScore:
-    """Represents the certainty score and related information for a code change."""
+    """
+    Represents the certainty score and related information for a code change.
+
+    rule_hits maps the name of each rule that flagged files to the files it flagged.
+    """
 
     score: int
     reasons: List[str] = field(default_factory=list)
     files: List[str] = field(default_factory=list)
     conclusion: str = Conclusion.NEUTRAL.value
+    rule_hits: Dict[str, List[str]] = field(default_factory=dict)
 
     def __post_init__(self):
         """Validate the data after initialization."""
@@ -46,6 +51,9 @@ class CertaintyScore:
         if not isinstance(self.conclusion, str):
             raise ValueError("Conclusion must be a string")
 
+        if not isinstance(self.rule_hits, dict):
+            raise ValueError("Rule hits must be a dictionary")
+
         if not Conclusion.is_valid(self.conclusion):
             raise ValueError(
                 f"Invalid conclusion: {self.conclusion}. Must be one of: {', '.join([c.value for c in Conclusion])}"
@@ -53,12 +61,15 @@ class CertaintyScore:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert the CertaintyScore to a dictionary."""
-        return {
+        data = {
             "score": self.score,
             "reasons": self.reasons,
             "files": self.files,
             "conclusion": self.conclusion,
         }
+        if self.rule_hits:
+            data["rule_hits"] = self.rule_hits
+        return data
 
     def to_json(self) -> str:
         """Convert the CertaintyScore to a JSON string."""
@@ -72,6 +83,7 @@ class CertaintyScore:
             reasons=data.get("reasons", []),
             files=data.get("files", []),
             conclusion=data.get("conclusion", Conclusion.NEUTRAL.value),
+            rule_hits=data.get("rule_hits", {}),
         )
 
     @classmethod
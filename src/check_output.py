@@ -0,0 +1,199 @@
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.certainty_score import CertaintyScore
+
+# GitHub rejects check run output fields longer than this
+MAX_OUTPUT_SIZE = 65535
+# GitHub accepts at most this many annotations per check run request
+ANNOTATIONS_PER_REQUEST = 50
+# File names listed per directory in the report; the rest are counted
+MAX_NAMES_PER_ROW = 20
+
+RULE_LABELS = {
+    "secret_file": "Suspicious file",
+    "codeowners": "Not owned by a requested reviewer",
+    "churn": "Large change",
+    "hot_path": "Recently reverted",
+    "dependencies": "Dependency changes",
+}
+# Used for flagged files that no rule_hits entry explains, e.g. scores from older runs
+OTHER_RULE = "other"
+
+
+@dataclass
+class CheckOutput:
+    """The output of a check run, split to fit GitHub's limits."""
+
+    title: str
+    summary: str
+    text: str
+    annotations: List[Dict] = field(default_factory=list)
+
+    def annotation_batches(self) -> Iterator[List[Dict]]:
+        """Yield the annotations in batches small enough for one request each."""
+        for start in range(0, len(self.annotations), ANNOTATIONS_PER_REQUEST):
+            yield self.annotations[start : start + ANNOTATIONS_PER_REQUEST]
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _rule_files(certainty_score: CertaintyScore) -> Dict[str, List[str]]:
+    """Return the flagged files by rule, putting any unexplained files under OTHER_RULE."""
+    by_rule = {
+        rule: list(dict.fromkeys(files)) for rule, files in certainty_score.rule_hits.items()
+    }
+    explained = {f for files in by_rule.values() for f in files}
+    other = [f for f in dict.fromkeys(certainty_score.files) if f not in explained]
+    if other:
+        by_rule[OTHER_RULE] = other
+    return by_rule
+
+
+def _fit_prefix(data: Dict, key: str, items: List[str], budget: int) -> None:
+    """Set data[key] to the longest prefix of items that fits, counting the rest."""
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high + 1) // 2
+        data[key] = items[:middle]
+        data[f"{key}_omitted"] = len(items) - middle
+        if _size(json.dumps(data)) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    data[key] = items[:low]
+    data[f"{key}_omitted"] = len(items) - low
+
+
+def render_summary(certainty_score: CertaintyScore, budget: int = MAX_OUTPUT_SIZE) -> str:
+    """
+    Render the machine readable summary, as parsed by CertaintyScore.from_json.
+
+    This is the full to_json() when it fits in budget. Otherwise rule_hits is replaced by
+    per-rule counts, and the reasons and then the file lists are shortened to fit, with
+    'reasons_omitted' and 'files_omitted' saying how many were dropped.
+    """
+    summary = certainty_score.to_json()
+    if _size(summary) <= budget:
+        return summary
+
+    data = certainty_score.to_dict()
+    data.pop("rule_hits", None)
+    data["rule_hit_counts"] = {
+        rule: len(files) for rule, files in certainty_score.rule_hits.items()
+    }
+    # Reasons come first, leaving the files whatever room is left
+    data["files"] = []
+    data["files_omitted"] = len(certainty_score.files)
+    _fit_prefix(data, "reasons", certainty_score.reasons, budget)
+    _fit_prefix(data, "files", certainty_score.files, budget)
+    return json.dumps(data)
+
+
+def _file_rows(files: List[str]) -> Iterator[Tuple[str, int]]:
+    """
+    Yield Markdown table rows of files grouped by directory, with the number of files each
+    names. Large directories name MAX_NAMES_PER_ROW files and count the rest.
+    """
+    by_directory: Dict[str, List[str]] = {}
+    for path in files:
+        directory, _, name = path.rpartition("/")
+        by_directory.setdefault(directory + "/" if directory else "./", []).append(name)
+    for directory in sorted(by_directory):
+        names = by_directory[directory]
+        listed = ", ".join(f"`{name}`" for name in names[:MAX_NAMES_PER_ROW])
+        if len(names) > MAX_NAMES_PER_ROW:
+            listed += f" +{len(names) - MAX_NAMES_PER_ROW} more"
+        shown = min(len(names), MAX_NAMES_PER_ROW)
+        yield f"| `{directory}` | {len(names)} | {listed} |\n", shown
+
+
+def _report_lines(certainty_score: CertaintyScore) -> Iterator[Tuple[str, int]]:
+    """Yield the lines of the Markdown report, with the number of flagged files each lists."""
+    yield (
+        f"## Certainty Score: {certainty_score.score}/100 "
+        f"({certainty_score.conclusion.upper()})\n\n"
+    ), 0
+    yield "### Concerns\n\n", 0
+    for reason in certainty_score.reasons:
+        yield f"- {reason}\n", 0
+    for rule, files in _rule_files(certainty_score).items():
+        label = RULE_LABELS.get(rule, rule.replace("_", " ").capitalize())
+        yield f"\n### {label} ({len(files)})\n\n", 0
+        yield "| Directory | Files | Names |\n|---|---|---|\n", 0
+        yield from _file_rows(files)
+
+
+def render_text(certainty_score: CertaintyScore, budget: int = MAX_OUTPUT_SIZE) -> str:
+    """
+    Render a Markdown report of the score, grouped by rule and directory.
+
+    The report is built line by line, skipping any line that would exceed budget so later
+    rules are still shown, and ends with a note of how many flagged files were not named.
+    """
+    total = sum(len(files) for files in _rule_files(certainty_score).values())
+    # Keep room for the overflow note
+    limit = budget - 200
+    parts = []
+    used = 0
+    shown = 0
+    for line, count in _report_lines(certainty_score):
+        size = _size(line)
+        if used + size > limit:
+            continue
+        parts.append(line)
+        used += size
+        shown += count
+
+    if shown < total:
+        parts.append(
+            f"\n_…and {total - shown} more flagged file(s) not shown. "
+            "See the annotations for the full list._\n"
+        )
+    return "".join(parts)
+
+
+def render_check_output(
+    certainty_score: CertaintyScore,
+    details_text: Optional[str] = None,
+    budget: int = MAX_OUTPUT_SIZE,
+) -> CheckOutput:
+    """
+    Render the full check run output for a score.
+
+    Args:
+        certainty_score: The CertaintyScore to render
+        details_text: Text to use instead of the rendered report
+        budget: Maximum size of the summary and text fields, in bytes
+
+    Returns:
+        A CheckOutput with an annotation per flagged file
+    """
+    level = "failure" if certainty_score.conclusion == "failure" else "warning"
+    rules_by_file: Dict[str, List[str]] = {}
+    for rule, files in _rule_files(certainty_score).items():
+        for path in files:
+            rules_by_file.setdefault(path, []).append(RULE_LABELS.get(rule, "Flagged"))
+
+    annotations = [
+        {
+            "path": path,
+            "start_line": 1,
+            "end_line": 1,
+            "annotation_level": level,
+            "title": "Certainty Score",
+            "message": ", ".join(rules),
+        }
+        for path, rules in rules_by_file.items()
+    ]
+
+    text = render_text(certainty_score, budget) if details_text is None else details_text
+    return CheckOutput(
+        title=f"Certainty Score: {certainty_score.score}",
+        summary=render_summary(certainty_score, budget),
+        text=text[:budget],
+        annotations=annotations,
+    )
@@ -0,0 +1,90 @@
+from typing import Dict, Optional
+
+GENERATED_FILENAMES = frozenset(
+    {
+        "package-lock.json",
+        "npm-shrinkwrap.json",
+        "yarn.lock",
+        "pnpm-lock.yaml",
+        "poetry.lock",
+        "Pipfile.lock",
+        "uv.lock",
+        "Cargo.lock",
+        "Gemfile.lock",
+        "composer.lock",
+        "go.sum",
+    }
+)
+
+GENERATED_DIRECTORIES = ("vendor/", "node_modules/", "third_party/", "__snapshots__/")
+_NESTED_GENERATED_DIRECTORIES = tuple(f"/{d}" for d in GENERATED_DIRECTORIES)
+
+GENERATED_SUFFIXES = (
+    ".min.js",
+    ".min.css",
+    ".map",
+    ".snap",
+    ".pb.go",
+    "_pb2.py",
+    "_pb2_grpc.py",
+    ".generated.ts",
+    ".designer.cs",
+)
+
+DEFAULT_TYPE_WEIGHTS = {
+    ".md": 0.2,
+    ".rst": 0.2,
+    ".txt": 0.2,
+    ".json": 0.5,
+    ".csv": 0.1,
+    ".svg": 0.1,
+}
+
+
+def is_generated(path: str) -> bool:
+    """Check whether a path looks like a lockfile, vendored code or another generated file."""
+    name = path.rsplit("/", 1)[-1]
+    if name in GENERATED_FILENAMES or name.endswith(GENERATED_SUFFIXES):
+        return True
+    return path.startswith(GENERATED_DIRECTORIES) or any(
+        directory in path for directory in _NESTED_GENERATED_DIRECTORIES
+    )
+
+
+def churn_weight(path: str, type_weights: Optional[Dict[str, float]] = None) -> float:
+    """
+    Return how much a changed line in a file counts towards churn.
+
+    Generated files count for nothing, since their size says little about the risk of the
+    change. Other files are weighted by extension, defaulting to 1.
+    """
+    if is_generated(path):
+        return 0.0
+    weights = DEFAULT_TYPE_WEIGHTS if type_weights is None else type_weights
+    name = path.rsplit("/", 1)[-1]
+    if "." not in name:
+        return 1.0
+    return weights.get("." + name.rsplit(".", 1)[1].lower(), 1.0)
+
+
+def parse_type_weights(value: str) -> Dict[str, float]:
+    """
+    Parse file type weights given as comma separated 'extension=weight' pairs.
+
+    The pairs are applied on top of the default weights, e.g. ".md=0,.sql=2".
+
+    Raises:
+        ValueError: If a pair cannot be parsed
+    """
+    weights = dict(DEFAULT_TYPE_WEIGHTS)
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        extension, sep, weight = pair.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid churn weight: {pair}")
+        extension = extension.strip().lower()
+        if not extension.startswith("."):
+            extension = "." + extension
+        weights[extension] = float(weight)
+    return weights
@@ -0,0 +1,161 @@
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.cache import LRUCache
+
+CODEOWNERS_PATHS = [".github/CODEOWNERS", "CODEOWNERS", "docs/CODEOWNERS"]
+
+_GLOB_CHARS = re.compile(r"[*?]")
+
+
+@dataclass
+class OwnerRule:
+    """A single CODEOWNERS line."""
+
+    line: int
+    pattern: str
+    owners: List[str]
+
+    @cached_property
+    def regex(self) -> re.Pattern:
+        """The compiled pattern. Compiled on first use, as most rules never need testing."""
+        return _translate(self.pattern)
+
+
+@dataclass
+class _TrieNode:
+    children: Dict[str, "_TrieNode"] = field(default_factory=dict)
+    rules: List[OwnerRule] = field(default_factory=list)
+
+
+def _translate(pattern: str) -> re.Pattern:
+    """Translate a CODEOWNERS (gitignore style) pattern into a regex over repo paths."""
+    anchored = pattern.startswith("/") or "/" in pattern.rstrip("/")
+    directory = pattern.endswith("/")
+    body = pattern.strip("/")
+
+    regex = ""
+    i = 0
+    while i < len(body):
+        if body.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif body.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif body[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif body[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(body[i])
+            i += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    if directory:
+        suffix = "/.*"
+    elif body.endswith("/*"):
+        suffix = ""
+    else:
+        suffix = "(?:/.*)?"
+    return re.compile(f"{prefix}{regex}{suffix}", re.DOTALL)
+
+
+class CodeOwners:
+    """
+    An index over a CODEOWNERS file that resolves paths to owners.
+
+    Anchored rules are stored on a trie of their literal leading directories, and
+    single segment rules are bucketed by name or extension. Resolving a path only
+    walks its own segments and tests the few rules found along the way, newest line
+    first, rather than every rule in the file.
+    """
+
+    def __init__(self, text: str):
+        self.rules: List[OwnerRule] = []
+        self._root = _TrieNode()
+        self._by_name: Dict[str, List[OwnerRule]] = {}
+        self._by_extension: Dict[str, List[OwnerRule]] = {}
+        self._floating: List[OwnerRule] = []
+
+        for number, raw in enumerate(text.splitlines(), start=1):
+            line = raw.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            pattern, *owners = line.split()
+            rule = OwnerRule(number, pattern, owners)
+            self.rules.append(rule)
+            self._insert(rule)
+
+    def _insert(self, rule: OwnerRule) -> None:
+        pattern = rule.pattern
+        if pattern.startswith("/") or "/" in pattern.rstrip("/"):
+            node = self._root
+            for segment in pattern.strip("/").split("/"):
+                if _GLOB_CHARS.search(segment):
+                    break
+                node = node.children.setdefault(segment, _TrieNode())
+            node.rules.append(rule)
+            return
+
+        name = pattern.rstrip("/")
+        if not _GLOB_CHARS.search(name):
+            self._by_name.setdefault(name, []).append(rule)
+        elif name.startswith("*") and "." in name and not _GLOB_CHARS.search(name[1:]):
+            self._by_extension.setdefault(name.rsplit(".", 1)[1], []).append(rule)
+        else:
+            self._floating.append(rule)
+
+    def _candidates(self, path: str) -> List[OwnerRule]:
+        segments = path.split("/")
+        candidates = list(self._root.rules) + self._floating
+        node = self._root
+        for segment in segments:
+            node = node.children.get(segment) if node else None
+            if node:
+                candidates.extend(node.rules)
+            candidates.extend(self._by_name.get(segment, ()))
+            if "." in segment:
+                candidates.extend(self._by_extension.get(segment.rsplit(".", 1)[1], ()))
+        return candidates
+
+    def match(self, path: str) -> Optional[OwnerRule]:
+        """Return the rule that applies to a path (the last matching line wins), if any."""
+        path = path.lstrip("/")
+        for rule in sorted(self._candidates(path), key=lambda r: r.line, reverse=True):
+            if rule.regex.fullmatch(path):
+                return rule
+        return None
+
+    def owners_for(self, path: str) -> List[str]:
+        """Return the owners of a path, or an empty list if it has none."""
+        rule = self.match(path)
+        return rule.owners if rule else []
+
+
+CACHE_SIZE = 32
+_cache: "LRUCache[Tuple[str, str], CodeOwners]" = LRUCache(CACHE_SIZE)
+
+
+def get_codeowners(repo_name: str, blob_sha: str, load: Callable[[], str]) -> CodeOwners:
+    """
+    Return the CodeOwners index for a CODEOWNERS blob, building it at most once.
+
+    Args:
+        repo_name: The repository name in the format 'owner/repo'
+        blob_sha: The git blob SHA of the CODEOWNERS file
+        load: Called to fetch the file text if the index is not cached
+
+    Returns:
+        The CodeOwners index
+    """
+    return _cache.get_or_build((repo_name, blob_sha), lambda: CodeOwners(load()))
+
+
+def clear_cache() -> None:
+    """Drop all cached CodeOwners indexes."""
+    _cache.clear()
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from typing import Any, Dict, Tuple
+
+from src.cache import CacheInfo, LRUCache
+from src.churn import parse_type_weights
+from src.deploy_window import DeploymentWindow
+from src.risk import SecretGlobs
+
+CACHE_SIZE = 16
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class RiskConfig:
+    """
+    The settings that decide how a pull request is scored, validated when created.
+
+    Equal settings have equal fingerprints, so the rules compiled from them can be shared
+    between every PR scored with those settings.
+    """
+
+    max_files: int = 20
+    secret_globs: Tuple[str, ...] = (".env", ".pem")
+    min_certainty: int = 70
+    check_work_hours: bool = True
+    max_churn: int = 1000
+    max_file_churn: int = 500
+    churn_weights: str = ""
+    timezone: str = "UTC"
+    blocked_hours: str = ""
+    calendars: Tuple[str, ...] = field(default_factory=tuple)
+
+    def __post_init__(self):
+        """Validate the settings. Sequences may be given as comma separated strings."""
+        for name in ("max_files", "min_certainty", "max_churn", "max_file_churn"):
+            value = getattr(self, name)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"{name} must be a non-negative integer, not {value!r}")
+        if self.min_certainty > 100:
+            raise ValueError("min_certainty must be between 0 and 100")
+        if not isinstance(self.check_work_hours, bool):
+            raise ValueError("check_work_hours must be a boolean")
+
+        for name in ("secret_globs", "calendars"):
+            value = getattr(self, name)
+            value = _split(value) if isinstance(value, str) else tuple(value)
+            if not all(isinstance(item, str) and item for item in value):
+                raise ValueError(f"{name} must be non-empty strings")
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_env(cls) -> "RiskConfig":
+        """
+        Read the settings from the action inputs.
+
+        Raises:
+            ValueError: If an input is invalid
+        """
+        return cls(
+            max_files=int(os.getenv("INPUT_MAX_FILE_COUNT", "20")),
+            secret_globs=os.getenv("INPUT_SECRET_FILE_GLOBS", ".env,.pem"),
+            min_certainty=int(os.getenv("INPUT_MIN_CERTAINTY", "70")),
+            check_work_hours=os.getenv("INPUT_CHECK_WORK_HOURS", "true").lower() == "true",
+            max_churn=int(os.getenv("INPUT_MAX_CHURN", "1000")),
+            max_file_churn=int(os.getenv("INPUT_MAX_FILE_CHURN", "500")),
+            churn_weights=os.getenv("INPUT_CHURN_WEIGHTS", ""),
+            timezone=os.getenv("INPUT_TIMEZONE") or "UTC",
+            blocked_hours=os.getenv("INPUT_BLOCKED_HOURS", ""),
+            calendars=os.getenv("INPUT_DEPLOY_CALENDARS", ""),
+        )
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """A stable hash of the settings. Calendars are identified by path, not content."""
+        data = json.dumps(asdict(self), sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class CompiledRules:
+    """The parsed tables and schedules for a RiskConfig, ready to pass to assess_risk."""
+
+    config: RiskConfig
+    churn_weights: Dict[str, float]
+    deploy_window: DeploymentWindow
+    secret_globs: SecretGlobs
+
+    @classmethod
+    def compile(cls, config: RiskConfig) -> "CompiledRules":
+        """
+        Parse the churn weights, build the deployment window, loading any calendars, and
+        build the secret file matcher.
+
+        Raises:
+            ValueError: If the weights, schedule or a calendar is invalid
+        """
+        return cls(
+            config=config,
+            churn_weights=parse_type_weights(config.churn_weights),
+            deploy_window=DeploymentWindow.from_config(
+                timezone=config.timezone,
+                blocked_hours=config.blocked_hours,
+                calendars=list(config.calendars),
+            ),
+            secret_globs=SecretGlobs(config.secret_globs),
+        )
+
+    def risk_kwargs(self) -> Dict[str, Any]:
+        """Return the keyword arguments for assess_risk that come from the config."""
+        return dict(
+            check_work_hours=self.config.check_work_hours,
+            max_files=self.config.max_files,
+            secret_globs=self.secret_globs,
+            min_certainty=self.config.min_certainty,
+            deploy_window=self.deploy_window,
+            max_churn=self.config.max_churn,
+            max_file_churn=self.config.max_file_churn,
+            churn_weights=self.churn_weights,
+        )
+
+
+_cache: "LRUCache[str, CompiledRules]" = LRUCache(CACHE_SIZE)
+
+
+def compile_rules(config: RiskConfig) -> CompiledRules:
+    """
+    Return the CompiledRules for a config, compiling them at most once per fingerprint.
+
+    Safe to call from several threads. Configs that are not used for a while are dropped
+    once more than CACHE_SIZE have been seen.
+    """
+    return _cache.get_or_build(config.fingerprint, lambda: CompiledRules.compile(config))
+
+
+def cache_info() -> CacheInfo:
+    """Return the hit and miss counts of the compiled rules cache."""
+    return _cache.info()
+
+
+def clear_cache() -> None:
+    """Drop all compiled rules and reset the counts, e.g. after a calendar file changes."""
+    _cache.clear()
@@ -0,0 +1,282 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.cache import LRUCache
+
+# Package identifier to version
+Manifest = Dict[str, str]
+
+REQUIREMENTS = "requirements"
+POETRY_LOCK = "poetry.lock"
+PACKAGE_LOCK = "package-lock.json"
+
+# Parsed manifests are kept by blob SHA, since many PRs share the same base version
+MANIFEST_CACHE_SIZE = 8
+DIFF_CACHE_SIZE = 64
+
+_NAME_SEPARATORS = re.compile(r"[-_.]+")
+_COMMENT = re.compile(r"(^|\s)#.*$")
+_REQUIREMENT = re.compile(r"([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*)")
+_TOML_STRING = re.compile(r'^(name|version)\s*=\s*"([^"]*)"')
+_JSON_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*(.*)$')
+_NUMBERS = re.compile(r"\d+")
+
+
+def manifest_kind(path: str) -> Optional[str]:
+    """Return which kind of dependency manifest a path is, or None if it is not one."""
+    name = path.rsplit("/", 1)[-1]
+    if name in (POETRY_LOCK, PACKAGE_LOCK):
+        return name
+    if name.endswith(".txt") and (
+        name.startswith("requirements") or "/requirements/" in f"/{path}"
+    ):
+        return REQUIREMENTS
+    return None
+
+
+def normalise_name(name: str) -> str:
+    """Normalise a Python package name, so 'Foo_Bar' and 'foo-bar' are the same."""
+    return _NAME_SEPARATORS.sub("-", name).lower()
+
+
+def parse_requirements(lines: Iterable[str]) -> Manifest:
+    """
+    Parse a pip requirements file.
+
+    Pinned requirements map to their version and others to their specifier, e.g.
+    'requests>=2'. Options, includes and editable installs are skipped.
+    """
+    packages = {}
+    pending = ""
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.endswith("\\"):
+            pending += line[:-1] + " "
+            continue
+        line, pending = _COMMENT.sub("", pending + line).strip(), ""
+        if not line or line.startswith("-"):
+            continue
+        # Drop environment markers and per-requirement options such as --hash
+        line = line.split(";", 1)[0].split(" -", 1)[0].strip()
+        match = _REQUIREMENT.fullmatch(line)
+        if not match or "://" in line:
+            continue
+        specifier = match[2].replace(" ", "")
+        if specifier.startswith("=="):
+            specifier = specifier.lstrip("=")
+        packages[normalise_name(match[1])] = specifier
+    return packages
+
+
+def parse_poetry_lock(lines: Iterable[str]) -> Manifest:
+    """Parse a poetry.lock file, reading only the name and version of each package."""
+    packages = {}
+    in_package = False
+    name = version = None
+    for line in lines:
+        if line.startswith("["):
+            if name and version:
+                packages[normalise_name(name)] = version
+            in_package = line.strip() == "[[package]]"
+            name = version = None
+        elif in_package and line.startswith(("name", "version")):
+            match = _TOML_STRING.match(line)
+            if match:
+                if match[1] == "name":
+                    name = match[2]
+                else:
+                    version = match[2]
+    if name and version:
+        packages[normalise_name(name)] = version
+    return packages
+
+
+def _package_lock_key(path: str) -> Optional[str]:
+    # 'node_modules/a/node_modules/b' is b as installed under a; workspace folders are skipped
+    if not path.startswith("node_modules/"):
+        return None
+    return path[len("node_modules/") :]
+
+
+def _parse_package_lock_document(data: dict) -> Manifest:
+    packages = {}
+    for path, entry in data.get("packages", {}).items():
+        key = _package_lock_key(path)
+        if key and isinstance(entry, dict) and "version" in entry:
+            packages[key] = entry["version"]
+    if packages:
+        return packages
+    return {
+        name: entry["version"]
+        for name, entry in data.get("dependencies", {}).items()
+        if isinstance(entry, dict) and "version" in entry
+    }
+
+
+def parse_package_lock(lines: Iterable[str]) -> Manifest:
+    """
+    Parse a package-lock.json file (lockfile versions 1 to 3) one line at a time.
+
+    npm writes lockfiles indented, one key per line, so the file is read line by line
+    and never held in memory as a whole. A file on a single line is parsed as JSON.
+    """
+    lines = iter(lines)
+    first = next(lines, "")
+    if first.strip() != "{":
+        return _parse_package_lock_document(json.loads(first + "".join(lines)))
+
+    packages: Manifest = {}
+    dependencies: Manifest = {}
+    indent = 0
+    section = entry = None
+    for line in lines:
+        stripped = line.lstrip()
+        if not stripped.startswith('"'):
+            continue
+        width = len(line) - len(stripped)
+        indent = indent or width
+        depth = width // indent
+        # Most lines are package details; skip them before matching
+        if depth > 3 or (depth == 3 and not (entry and stripped.startswith('"version"'))):
+            continue
+        match = _JSON_KEY.match(stripped)
+        if not match:
+            continue
+        key, value = match[1], match[2]
+        if depth == 1:
+            section = key if key in ("packages", "dependencies") else None
+            entry = None
+            # Lockfile version 2 repeats everything under 'dependencies' for npm 6
+            if section == "dependencies" and packages:
+                section = None
+        elif depth == 2 and section:
+            entry = _package_lock_key(key) if section == "packages" else key
+        elif depth == 3 and entry and key == "version" and value.startswith('"'):
+            version = json.loads(value.rstrip(","))
+            (packages if section == "packages" else dependencies)[entry] = version
+    return packages or dependencies
+
+
+PARSERS: Dict[str, Callable[[Iterable[str]], Manifest]] = {
+    REQUIREMENTS: parse_requirements,
+    POETRY_LOCK: parse_poetry_lock,
+    PACKAGE_LOCK: parse_package_lock,
+}
+
+
+def _version_numbers(version: str) -> Tuple[int, ...]:
+    return tuple(int(n) for n in _NUMBERS.findall(version)[:4])
+
+
+@dataclass
+class PackageChange:
+    """A package that was added, removed or changed version in a manifest."""
+
+    name: str
+    old_version: Optional[str] = None
+    new_version: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        if self.old_version is None:
+            return "added"
+        if self.new_version is None:
+            return "removed"
+        old, new = _version_numbers(self.old_version), _version_numbers(self.new_version)
+        if old and new and old != new:
+            return "upgraded" if new > old else "downgraded"
+        return "changed"
+
+    @property
+    def is_major(self) -> bool:
+        """Whether the change crosses a major version, counting 0.x minor versions as major."""
+        if self.old_version is None or self.new_version is None:
+            return False
+        old, new = _version_numbers(self.old_version), _version_numbers(self.new_version)
+        if not old or not new:
+            return False
+        if old[0] != new[0]:
+            return True
+        return old[0] == 0 and old[1:2] != new[1:2]
+
+    def __str__(self) -> str:
+        if self.kind == "added":
+            return f"{self.name} {self.new_version} (added)"
+        if self.kind == "removed":
+            return f"{self.name} {self.old_version} (removed)"
+        return f"{self.name} {self.old_version} -> {self.new_version}"
+
+
+@dataclass
+class DependencyDiff:
+    """The package changes in one manifest file."""
+
+    path: str
+    changes: List[PackageChange] = field(default_factory=list)
+
+    @property
+    def major_bumps(self) -> List[PackageChange]:
+        return [c for c in self.changes if c.is_major]
+
+
+def diff_manifests(old: Manifest, new: Manifest) -> List[PackageChange]:
+    """Compare two parsed manifests, returning the changes sorted by package."""
+    changes = []
+    for name in sorted(old.keys() | new.keys()):
+        old_version, new_version = old.get(name), new.get(name)
+        if old_version != new_version:
+            changes.append(PackageChange(name, old_version, new_version))
+    return changes
+
+
+_manifests: "LRUCache[Tuple[str, str], Manifest]" = LRUCache(MANIFEST_CACHE_SIZE)
+_diffs: "LRUCache[Tuple[str, Optional[str], Optional[str]], List[PackageChange]]" = LRUCache(
+    DIFF_CACHE_SIZE
+)
+
+
+def _load(kind: str, blob_sha: Optional[str], read: Callable[[str], Iterable[str]]) -> Manifest:
+    if blob_sha is None:
+        return {}
+    return _manifests.get_or_build((kind, blob_sha), lambda: PARSERS[kind](read(blob_sha)))
+
+
+def diff_manifest(
+    path: str,
+    old_sha: Optional[str],
+    new_sha: Optional[str],
+    read: Callable[[str], Iterable[str]],
+) -> DependencyDiff:
+    """
+    Diff two versions of a dependency manifest, identified by their git blob SHAs.
+
+    Each version is parsed at most once while cached, and so is each pair of versions.
+
+    Args:
+        path: Path of the manifest in the new version
+        old_sha: Blob SHA of the old version, or None if the file was added
+        new_sha: Blob SHA of the new version, or None if the file was removed
+        read: Called with a blob SHA to stream the blob's lines
+
+    Returns:
+        A DependencyDiff of the package changes
+
+    Raises:
+        ValueError: If the path is not a supported manifest
+    """
+    kind = manifest_kind(path)
+    if kind is None:
+        raise ValueError(f"Not a dependency manifest: {path}")
+    changes = _diffs.get_or_build(
+        (kind, old_sha, new_sha),
+        lambda: diff_manifests(_load(kind, old_sha, read), _load(kind, new_sha, read)),
+    )
+    return DependencyDiff(path, changes)
+
+
+def clear_cache() -> None:
+    """Drop all cached manifests and diffs."""
+    _manifests.clear()
+    _diffs.clear()
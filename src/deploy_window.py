@@ -0,0 +1,461 @@
+import heapq
+import logging
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, UTC
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+MINUTES_PER_DAY = 24 * 60
+# Recurring calendar events without an end are expanded this far past today
+RECURRENCE_HORIZON = timedelta(days=5 * 366)
+
+FRIDAY_AFTERNOON = "Deploying late on Friday"
+
+_WEEKLY_RE = re.compile(
+    r"^(?P<first>[a-z]{3})(?:-(?P<last>[a-z]{3}))?"
+    r"(?:\s+(?P<start>\d{1,2}:\d{2})-(?P<end>\d{1,2}:\d{2}))?$"
+)
+_DURATION_RE = re.compile(
+    r"^\+?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+_RRULE_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "WKST"}
+
+
+@dataclass
+class WeeklyRule:
+    """A recurring blocked period, in minutes from Monday 00:00 local time."""
+
+    start: int
+    end: int
+    reason: str
+
+
+@dataclass
+class BlockedPeriod:
+    """A one-off blocked period such as a holiday or a release freeze."""
+
+    start: datetime
+    end: datetime
+    reason: str
+
+
+DEFAULT_WEEKLY_RULES = [
+    WeeklyRule(4 * MINUTES_PER_DAY + 16 * 60, 5 * MINUTES_PER_DAY, FRIDAY_AFTERNOON)
+]
+
+
+def _parse_minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    result = int(hours) * 60 + int(minutes)
+    if result > MINUTES_PER_DAY or int(minutes) > 59:
+        raise ValueError(f"Invalid time of day: {value}")
+    return result
+
+
+def parse_weekly_rules(spec: str) -> List[WeeklyRule]:
+    """
+    Parse a comma separated weekly schedule of blocked hours.
+
+    Each entry is a day or day range, optionally followed by a time range, e.g.
+    "fri 16:00-24:00, sat, sun" or "mon-thu 18:00-24:00".
+
+    Args:
+        spec: The schedule to parse
+
+    Returns:
+        A list of WeeklyRule objects
+
+    Raises:
+        ValueError: If an entry cannot be parsed
+    """
+    rules = []
+    for entry in spec.split(","):
+        entry = " ".join(entry.lower().split())
+        if not entry:
+            continue
+        match = _WEEKLY_RE.match(entry)
+        if not match or match["first"] not in WEEKDAYS or (
+            match["last"] and match["last"] not in WEEKDAYS
+        ):
+            raise ValueError(f"Invalid blocked hours entry: {entry}")
+
+        first = WEEKDAYS.index(match["first"])
+        last = WEEKDAYS.index(match["last"]) if match["last"] else first
+        start = _parse_minutes(match["start"]) if match["start"] else 0
+        end = _parse_minutes(match["end"]) if match["end"] else MINUTES_PER_DAY
+        if end <= start:
+            raise ValueError(f"Invalid blocked hours entry: {entry}")
+
+        day = first
+        while True:
+            offset = day * MINUTES_PER_DAY
+            rules.append(
+                WeeklyRule(
+                    offset + start, offset + end, f"Deploying during blocked hours ({entry})"
+                )
+            )
+            if day == last:
+                break
+            day = (day + 1) % 7
+    return rules
+
+
+def _unfold_ics(text: str) -> Iterable[str]:
+    line = None
+    for raw in text.splitlines():
+        if raw[:1] in (" ", "\t") and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def _parse_ics_value(params: str, value: str, tz: ZoneInfo) -> datetime | date:
+    if "VALUE=DATE" in params.upper() and "VALUE=DATE-TIME" not in params.upper():
+        return datetime.strptime(value, "%Y%m%d").date()
+    if len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date()
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=UTC)
+    match = re.search(r"TZID=([^;:]+)", params)
+    zone = ZoneInfo(match[1]) if match else tz
+    return datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=zone)
+
+
+def _parse_ics_duration(value: str) -> timedelta:
+    match = _DURATION_RE.match(value)
+    if not match or value in ("P", "+P") or value.endswith("T"):
+        raise ValueError(f"Invalid calendar duration: {value}")
+    parts = {name: int(amount) for name, amount in match.groupdict().items() if amount}
+    return timedelta(**parts)
+
+
+def _on_or_before(value: datetime | date, until: datetime | date) -> bool:
+    if isinstance(value, datetime) and not isinstance(until, datetime):
+        return value.date() <= until
+    if isinstance(until, datetime) and not isinstance(value, datetime):
+        return value <= until.date()
+    return value <= until
+
+
+def _recurrences(
+    start: datetime | date, rrule: str, tz: ZoneInfo, horizon: date
+) -> List[datetime | date]:
+    """
+    Return the start of each occurrence of a recurring event.
+
+    Daily, weekly and yearly rules with an interval, count or end are supported. Other
+    rules, e.g. with BYDAY, are logged and only the first occurrence is kept.
+    """
+    parts = dict(part.split("=", 1) for part in rrule.split(";") if "=" in part)
+    freq = parts.get("FREQ")
+    if freq not in ("DAILY", "WEEKLY", "YEARLY") or set(parts) - _RRULE_PARTS:
+        logger.warning(f"Unsupported calendar recurrence {rrule}, using the first occurrence")
+        return [start]
+
+    interval = int(parts.get("INTERVAL", "1"))
+    count = int(parts["COUNT"]) if "COUNT" in parts else None
+    until = _parse_ics_value("", parts["UNTIL"], tz) if "UNTIL" in parts else None
+    occurrences = []
+    n = 0
+    while count is None or len(occurrences) < count:
+        if freq == "YEARLY":
+            try:
+                occurrence = start.replace(year=start.year + n * interval)
+            except ValueError:
+                # 29 February only happens in leap years
+                n += 1
+                continue
+        else:
+            step = timedelta(days=1) if freq == "DAILY" else timedelta(weeks=1)
+            occurrence = start + step * n * interval
+        if until is not None and not _on_or_before(occurrence, until):
+            break
+        if not _on_or_before(occurrence, horizon):
+            break
+        occurrences.append(occurrence)
+        n += 1
+    return occurrences
+
+
+def load_ics(text: str, tz: ZoneInfo) -> List[BlockedPeriod]:
+    """
+    Read the events from an iCalendar (.ics) file as blocked periods.
+
+    All day events are treated as holidays in the timezone tz, events with a start
+    time are treated as freezes. An event ends at DTEND, or after DURATION, and simple
+    RRULE recurrences such as yearly holidays are expanded, see _recurrences.
+    """
+    periods = []
+    event: Optional[Dict] = None
+    horizon = date.today() + RECURRENCE_HORIZON
+    for line in _unfold_ics(text):
+        if line == "BEGIN:VEVENT":
+            event = {}
+            continue
+        if line == "END:VEVENT":
+            if event and "DTSTART" in event:
+                start = event["DTSTART"]
+                end = event.get("DTEND")
+                if end is None and "DURATION" in event:
+                    end = start + event["DURATION"]
+                length = None if end is None else end - start
+                starts = [start]
+                if "RRULE" in event:
+                    starts = _recurrences(start, event["RRULE"], tz, horizon)
+                for occurrence in starts:
+                    periods.append(
+                        _to_period(
+                            occurrence,
+                            None if length is None else occurrence + length,
+                            event.get("SUMMARY", ""),
+                            tz,
+                            freeze=isinstance(start, datetime),
+                        )
+                    )
+            event = None
+            continue
+        if event is None or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        name, _, params = key.partition(";")
+        if name in ("DTSTART", "DTEND"):
+            event[name] = _parse_ics_value(params, value.strip(), tz)
+        elif name == "DURATION":
+            event[name] = _parse_ics_duration(value.strip())
+        elif name in ("SUMMARY", "RRULE"):
+            event[name] = value.strip()
+    return periods
+
+
+def load_yaml(text: str, tz: ZoneInfo) -> List[BlockedPeriod]:
+    """
+    Read blocked periods from a calendar file in YAML.
+
+    Only the following shape is supported, so that no YAML library is needed::
+
+        holidays:
+          - date: 2024-12-25
+            name: Christmas Day
+        freezes:
+          - start: 2024-12-20T17:00
+            end: 2025-01-02
+            name: Year end freeze
+
+    Dates without a time are whole days in the timezone tz, so an end date is inclusive.
+    """
+    items = []
+    section = None
+    item = None
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].rstrip()
+        if not line.strip():
+            continue
+        if not raw[0].isspace():
+            section = line.rstrip(":").strip()
+            if section not in ("holidays", "freezes"):
+                raise ValueError(f"Unknown calendar section: {section}")
+            continue
+        content = line.strip()
+        if content.startswith("- "):
+            item = {"section": section}
+            items.append(item)
+            content = content[2:].strip()
+        if item is None or ":" not in content:
+            raise ValueError(f"Invalid calendar line: {raw}")
+        key, value = content.split(":", 1)
+        item[key.strip()] = value.strip().strip("'\"")
+
+    periods = []
+    for item in items:
+        start = _parse_yaml_value(item.get("date") or item.get("start"), tz)
+        end = _parse_yaml_value(item.get("end"), tz) if item.get("end") else None
+        if end is not None and not isinstance(end, datetime):
+            end += timedelta(days=1)
+        periods.append(
+            _to_period(start, end, item.get("name", ""), tz, freeze=item["section"] == "freezes")
+        )
+    return periods
+
+
+def _parse_yaml_value(value: Optional[str], tz: ZoneInfo) -> datetime | date:
+    if not value:
+        raise ValueError("Calendar entries need a date or start")
+    if "T" in value or " " in value:
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+    return date.fromisoformat(value)
+
+
+def _to_period(
+    start: datetime | date,
+    end: Optional[datetime | date],
+    name: str,
+    tz: ZoneInfo,
+    freeze: bool,
+) -> BlockedPeriod:
+    reason = "Deploying during a release freeze" if freeze else "Deploying on a holiday"
+    if name:
+        reason = f"{reason} ({name})"
+    if end is None:
+        end = start if isinstance(start, datetime) else start + timedelta(days=1)
+    period = BlockedPeriod(_to_utc(start, tz), _to_utc(end, tz), reason)
+    if period.end <= period.start:
+        logger.warning(f"Ignoring calendar entry that does not last any time: {reason}")
+    return period
+
+
+def _to_utc(value: datetime | date, tz: ZoneInfo) -> datetime:
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time(0), tzinfo=tz)
+    return value.astimezone(UTC)
+
+
+def load_calendar(path: str, tz: ZoneInfo) -> List[BlockedPeriod]:
+    """Load holidays and freezes from a local .ics, .yml or .yaml file."""
+    with open(path, encoding="utf-8") as calendar:
+        text = calendar.read()
+    if path.lower().endswith(".ics"):
+        return load_ics(text, tz)
+    if path.lower().endswith((".yml", ".yaml")):
+        return load_yaml(text, tz)
+    raise ValueError(f"Unsupported calendar file: {path}")
+
+
+class _Latest:
+    """Orders a heap so the latest value comes first; works for minutes and datetimes."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "_Latest") -> bool:
+        return self.value > other.value
+
+    def __eq__(self, other) -> bool:
+        return self.value == other.value
+
+
+def _merge(
+    intervals: List[Tuple[object, object, str]],
+) -> Tuple[list, list, List[str]]:
+    """
+    Split overlapping intervals into non-overlapping segments, as parallel start, end and
+    reason lists.
+
+    Where intervals overlap, the one that started last gives the reason, so a holiday
+    inside a freeze reports the holiday. Touching segments with the same reason are joined.
+    """
+    intervals = sorted(
+        ((start, end, reason) for start, end, reason in intervals if end > start),
+        key=lambda i: i[0],
+    )
+    bounds = sorted({b for start, end, _ in intervals for b in (start, end)})
+    starts, ends, reasons = [], [], []
+    # Intervals covering the current segment, latest start first
+    active: list = []
+    following = 0
+    for segment_start, segment_end in zip(bounds, bounds[1:]):
+        while following < len(intervals) and intervals[following][0] <= segment_start:
+            start, end, reason = intervals[following]
+            heapq.heappush(active, (_Latest(start), following, end, reason))
+            following += 1
+        while active and active[0][2] <= segment_start:
+            heapq.heappop(active)
+        if not active:
+            continue
+        reason = active[0][3]
+        if ends and ends[-1] == segment_start and reasons[-1] == reason:
+            ends[-1] = segment_end
+        else:
+            starts.append(segment_start)
+            ends.append(segment_end)
+            reasons.append(reason)
+    return starts, ends, reasons
+
+
+class DeploymentWindow:
+    """
+    The times at which deploying is considered risky.
+
+    Weekly rules are evaluated in the window's timezone; holidays and freezes are fixed
+    periods. Both are compiled into sorted, merged interval lists when the window is
+    created, so each lookup is a binary search.
+    """
+
+    def __init__(
+        self,
+        timezone: str = "UTC",
+        weekly: Optional[List[WeeklyRule]] = None,
+        periods: Optional[List[BlockedPeriod]] = None,
+    ):
+        self.tz = ZoneInfo(timezone)
+        self._weekly_starts, self._weekly_ends, self._weekly_reasons = _merge(
+            [(r.start, r.end, r.reason) for r in weekly or []]
+        )
+        self._starts, self._ends, self._reasons = _merge(
+            [(p.start, p.end, p.reason) for p in periods or []]
+        )
+
+    @classmethod
+    def from_config(
+        cls,
+        timezone: str = "UTC",
+        blocked_hours: str = "",
+        calendars: Optional[List[str]] = None,
+    ) -> "DeploymentWindow":
+        """
+        Build a window from the action inputs.
+
+        Args:
+            timezone: IANA timezone name the weekly schedule and holidays are in
+            blocked_hours: Weekly schedule, see parse_weekly_rules. Defaults to Friday
+                from 16:00.
+            calendars: Paths to .ics or .yaml files of holidays and freezes
+
+        Raises:
+            ValueError: If the schedule or a calendar file is invalid
+        """
+        tz = ZoneInfo(timezone)
+        periods = []
+        for path in calendars or []:
+            periods.extend(load_calendar(path, tz))
+        weekly = parse_weekly_rules(blocked_hours) if blocked_hours else DEFAULT_WEEKLY_RULES
+        return cls(timezone, weekly, periods)
+
+    def check(self, when: datetime) -> Optional[str]:
+        """
+        Return the reason deploying at a given time is risky, or None if it is not.
+
+        Naive datetimes are taken to be UTC.
+        """
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=UTC)
+
+        i = bisect_right(self._starts, when) - 1
+        if i >= 0 and when < self._ends[i]:
+            return self._reasons[i]
+
+        local = when.astimezone(self.tz)
+        minute = local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+        i = bisect_right(self._weekly_starts, minute) - 1
+        if i >= 0 and minute < self._weekly_ends[i]:
+            return self._weekly_reasons[i]
+        return None
+
+    def check_many(self, timestamps: Iterable[datetime]) -> List[Optional[str]]:
+        """Return the result of check for each timestamp."""
+        return [self.check(when) for when in timestamps]
+
+
+DEFAULT_DEPLOY_WINDOW = DeploymentWindow(weekly=DEFAULT_WEEKLY_RULES)
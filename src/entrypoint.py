@@ -1,29 +1,179 @@
+import hashlib
+import json
 import logging
 import os
+import subprocess
 import sys
+import time
+from datetime import datetime, timedelta, UTC
+from functools import partial
+from typing import List, Optional
+
+from github import GithubException
 
 from src.certainty_score import CertaintyScore
-from src.github_gateway import GitHubGateway
+from src.check_output import MAX_OUTPUT_SIZE, render_text
+from src.config import CompiledRules, RiskConfig, compile_rules
+from src.dependencies import DependencyDiff, diff_manifest, manifest_kind
+from src.git_diff import LocalFile, blob_sha, iter_blob_lines, iter_changed_files, merge_base
+from src.github_gateway import CHECK_RUN_NAME, GitHubGateway
+from src.history import HistoryStore
+from src.outputs import write_outputs, write_step_summary
+from src.partitions import PartitionedScore, ProjectRoots, assess_partitions, parse_project_roots
+from src.profiling import RunProfile
+from src.replay import PRSnapshot, record_snapshot
 from src.risk import assess_risk
 
 
-def create_and_display_output(certainty_score: CertaintyScore):
-    os.environ['GITHUB_OUTPUT'] = f"certainty_score={certainty_score.score}\nsummary={certainty_score.to_json()}"
+def create_and_display_output(
+    certainty_score: CertaintyScore,
+    step_summary: bool = False,
+    partitioned: Optional[PartitionedScore] = None,
+):
+    outputs = {
+        "certainty_score": certainty_score.score,
+        "conclusion": certainty_score.conclusion,
+        "summary": certainty_score.to_json(),
+    }
+    if partitioned:
+        outputs["partitions"] = json.dumps(
+            {
+                project: {"score": score.score, "conclusion": score.conclusion}
+                for project, score in partitioned.partitions.items()
+            }
+        )
+    write_outputs(outputs)
+    if step_summary:
+        write_step_summary(render_text(certainty_score))
     print(certainty_score.to_json())
 
 
+def get_changed_files(pr, diff_source: str, repo_path: str) -> list:
+    """Read the PR's changed files from the local checkout if asked to, else from the API."""
+    if diff_source == "git":
+        try:
+            return list(iter_changed_files(repo_path, pr.base.sha, pr.head.sha))
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.getLogger(__name__).warning(
+                f"Could not read the diff from the local checkout, using the API instead. {e}"
+            )
+    return list(pr.get_files())
+
+
+def get_dependency_diffs(
+    gg: GitHubGateway, repo: str, pr, changed_files: list, repo_path: str
+) -> List[DependencyDiff]:
+    """
+    Diff the dependency manifests the PR changes.
+
+    Files read from the local checkout are diffed with git, and the rest through the API.
+    A failure is logged and treated as no dependency changes.
+    """
+    manifests = [f for f in changed_files if manifest_kind(f.filename)]
+    if not manifests:
+        return []
+    base, head = pr.base.sha, pr.head.sha
+    try:
+        if isinstance(manifests[0], LocalFile):
+            base = merge_base(repo_path, base, head)
+            blob_shas = [
+                (
+                    blob_sha(repo_path, base, f.previous_filename or f.filename),
+                    blob_sha(repo_path, head, f.filename),
+                )
+                for f in manifests
+            ]
+            read = partial(iter_blob_lines, repo_path)
+        else:
+            base = gg.get_merge_base(repo, base, head)
+            blob_shas = [
+                (
+                    gg.get_blob_sha(repo, f.previous_filename or f.filename, base),
+                    None if f.status == "removed" else f.sha,
+                )
+                for f in manifests
+            ]
+            read = partial(gg.iter_blob_lines, repo)
+
+        return [
+            diff_manifest(f.filename, old_sha, new_sha, read)
+            for f, (old_sha, new_sha) in zip(manifests, blob_shas)
+        ]
+    except (OSError, ValueError, subprocess.CalledProcessError, GithubException) as e:
+        logging.getLogger(__name__).warning(f"Could not diff the dependency manifests. {e}")
+        return []
+
+
+def config_fingerprint(pr, rules: CompiledRules, now: Optional[datetime] = None) -> str:
+    """
+    Identify everything a score depends on apart from the commit: the action inputs, the
+    requested reviewers and the base commit CODEOWNERS is read from, which can change
+    without a new commit, and the deploy window's verdict now, which changes with time.
+    """
+    inputs = {
+        name: value
+        for name, value in os.environ.items()
+        if name.startswith("INPUT_") and name != "INPUT_GITHUB_TOKEN"
+    }
+    state = {
+        "inputs": inputs,
+        "reviewers": sorted(getattr(r, "login", str(r)) for r in pr.requested_reviewers),
+        "teams": sorted(team.slug for team in pr.requested_teams),
+        "base": pr.base.sha,
+        "blocked": (
+            rules.deploy_window.check(now or datetime.now(UTC))
+            if rules.config.check_work_hours
+            else None
+        ),
+    }
+    digest = hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def profile_text(certainty_score: CertaintyScore, profile: RunProfile) -> str:
+    """Render the check run report with the profile's headline numbers after it."""
+    headline = profile.headline()
+    budget = MAX_OUTPUT_SIZE - len(headline.encode("utf-8")) - 1
+    return f"{render_text(certainty_score, budget)}\n{headline}"
+
+
 def main():
+    if os.getenv("INPUT_PROFILE", "false").lower() != "true":
+        run()
+        return
+
+    profile_dir = os.getenv("INPUT_PROFILE_DIR") or os.path.join(
+        os.getenv("GITHUB_WORKSPACE", "."), "safe-deploy-check-profile"
+    )
+    profile = RunProfile()
+    try:
+        with profile:
+            run(profile)
+    finally:
+        paths = profile.write(profile_dir)
+        print(f"Profile written to {', '.join(paths)}")
+
+
+def run(profile: Optional[RunProfile] = None):
     error = False
     logger = logging.getLogger(__name__)
 
     repo = os.getenv("GITHUB_REPOSITORY")
     sha = os.getenv("GITHUB_SHA")
 
-    max_files = int(os.getenv("INPUT_MAX_FILE_COUNT", "20"))
-    secret_globs = os.getenv("INPUT_SECRET_FILE_GLOBS", ".env,.pem").split(",")
-    min_certainty = int(os.getenv("INPUT_MIN_CERTAINTY", "70"))
+    rules = compile_rules(RiskConfig.from_env())
     block_on_failure = os.getenv("INPUT_BLOCK_ON_FAILURE", "true").lower() == "true"
-    check_work_hours = os.getenv("INPUT_CHECK_WORK_HOURS", "true").lower() == "true"
+    check_codeowners = os.getenv("INPUT_CHECK_CODEOWNERS", "true").lower() == "true"
+    check_dependencies = os.getenv("INPUT_CHECK_DEPENDENCIES", "true").lower() == "true"
+    step_summary = os.getenv("INPUT_STEP_SUMMARY", "true").lower() == "true"
+    record_path = os.getenv("INPUT_RECORD_PATH")
+    reuse_results = os.getenv("INPUT_REUSE_RESULTS", "true").lower() == "true"
+    project_roots = parse_project_roots(os.getenv("INPUT_PROJECT_ROOTS", ""))
+    partition_check_runs = os.getenv("INPUT_PARTITION_CHECK_RUNS", "false").lower() == "true"
+    diff_source = os.getenv("INPUT_DIFF_SOURCE", "api").lower()
+    repo_path = os.getenv("GITHUB_WORKSPACE", ".")
+    history_db = os.getenv("INPUT_HISTORY_DB")
+    history_days = int(os.getenv("INPUT_HISTORY_DAYS", "90"))
 
     # Get the pull request (assumes PR trigger)
     ref = os.environ.get("GITHUB_REF")
@@ -38,30 +188,100 @@ def main():
 
     check_id = None
     certainty_score = None
+    partitioned = None
     try:
-        changed_files = list(pr.get_files())
-        reviewers = pr.requested_reviewers
-
-        # Create Check Run
-        check_id = gg.create_check_run(repo, sha)
-
-        # Evaluate Risk
-        certainty_score = assess_risk(
-            changed_files=changed_files,
-            reviewers=reviewers,
-            check_work_hours=check_work_hours,
-            max_files=max_files,
-            secret_globs=secret_globs,
-            min_certainty=min_certainty,
-        )
+        reused = None
+        if reuse_results:
+            check_id, reused = gg.claim_check_run(repo, sha, config_fingerprint(pr, rules))
 
-        gg.update_check_run_with_score(repo, check_id, certainty_score)
+        if reused:
+            certainty_score = reused
+        else:
+            changed_files = get_changed_files(pr, diff_source, repo_path)
+            reviewers = pr.requested_reviewers
+            org = repo.split("/")[0]
+            reviewer_teams = [f"{org}/{team.slug}" for team in pr.requested_teams]
+            codeowners = gg.get_codeowners(repo, pr.base.sha) if check_codeowners else None
+            dependency_diffs = None
+            if check_dependencies:
+                dependency_diffs = get_dependency_diffs(gg, repo, pr, changed_files, repo_path)
 
-        #Update the output
-        create_and_display_output(certainty_score)
+            history = HistoryStore(history_db) if history_db else None
+            hot_paths = None
+            if history:
+                since = datetime.now(UTC) - timedelta(days=history_days)
+                hot_paths = history.hot_paths(
+                    repo,
+                    [f.filename for f in changed_files],
+                    since=since,
+                    exclude_pull_request=pr.number,
+                )
+
+            # Create Check Run
+            if not check_id:
+                check_id = gg.create_check_run(repo, sha)
 
-        # Verify check data
-        gg.get_check_run_certainty_score(repo, sha)
+            # Evaluate Risk
+            started = time.perf_counter()
+            risk_kwargs = dict(
+                reviewers=reviewers,
+                codeowners=codeowners,
+                reviewer_teams=reviewer_teams,
+                hot_paths=hot_paths,
+                dependency_diffs=dependency_diffs,
+                **rules.risk_kwargs(),
+            )
+            if project_roots:
+                partitioned = assess_partitions(
+                    changed_files, ProjectRoots(project_roots), **risk_kwargs
+                )
+                certainty_score = partitioned.aggregate
+            else:
+                certainty_score = assess_risk(changed_files=changed_files, **risk_kwargs)
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            details_text = profile_text(certainty_score, profile) if profile else None
+            gg.update_check_run_with_score(repo, check_id, certainty_score, details_text)
+
+            if partitioned and partition_check_runs:
+                for project, score in partitioned.partitions.items():
+                    partition_id = gg.create_check_run(
+                        repo, sha, name=f"{CHECK_RUN_NAME} ({project})"
+                    )
+                    gg.update_check_run_with_score(repo, partition_id, score)
+
+            if record_path:
+                record_snapshot(
+                    record_path,
+                    PRSnapshot.capture(
+                        repo,
+                        sha,
+                        changed_files,
+                        reviewers,
+                        certainty_score,
+                        reviewer_teams=reviewer_teams,
+                        codeowners=codeowners,
+                        hot_paths=hot_paths,
+                        dependency_diffs=dependency_diffs,
+                        deploy_window=rules.deploy_window,
+                        risk_config=rules.config,
+                    ),
+                )
+
+            if history:
+                with history:
+                    history.record_run(
+                        repo,
+                        sha,
+                        certainty_score,
+                        [f.filename for f in changed_files],
+                        duration_ms=duration_ms,
+                        reverted=pr.title.startswith("Revert "),
+                        pull_request=pr.number,
+                    )
+
+        #Update the output
+        create_and_display_output(certainty_score, step_summary, partitioned)
 
     except Exception as e:
         logger.error(f"There was an error running the deploy risk assessment. {e}")
@@ -73,6 +293,7 @@ def main():
                 check_id,
                 certainty_score,
                 "There was an error running the deploy risk assessment.",
+                reusable=False,
             )
         error = True
 
@@ -0,0 +1,130 @@
+import io
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Iterator, List, Optional
+
+_READ_SIZE = 64 * 1024
+
+
+@dataclass
+class LocalFile:
+    """A changed file from a local checkout, shaped like the github.File fields we use."""
+
+    filename: str
+    additions: int = 0
+    deletions: int = 0
+    previous_filename: Optional[str] = None
+
+    @property
+    def changes(self) -> int:
+        return self.additions + self.deletions
+
+
+def _tokens(stream: IO[bytes]) -> Iterator[str]:
+    """Split a stream on NUL bytes without reading it all into memory."""
+    pending = b""
+    while chunk := stream.read(_READ_SIZE):
+        pending += chunk
+        *complete, pending = pending.split(b"\0")
+        for token in complete:
+            yield token.decode("utf-8", errors="surrogateescape")
+    if pending:
+        yield pending.decode("utf-8", errors="surrogateescape")
+
+
+def _count(value: str) -> int:
+    # Binary files are reported as "-"
+    return 0 if value == "-" else int(value)
+
+
+def parse_numstat(stream: IO[bytes]) -> Iterator[LocalFile]:
+    """
+    Parse the output of 'git diff --numstat -z'.
+
+    Each record is 'added<TAB>deleted<TAB>path<NUL>', or for a rename
+    'added<TAB>deleted<TAB><NUL>old path<NUL>new path<NUL>'.
+    """
+    tokens = _tokens(stream)
+    for token in tokens:
+        if not token:
+            continue
+        added, deleted, path = token.split("\t", 2)
+        previous = None
+        if not path:
+            previous = next(tokens)
+            path = next(tokens)
+        yield LocalFile(path, _count(added), _count(deleted), previous)
+
+
+def iter_changed_files(repo_path: str, base: str, head: str = "HEAD") -> Iterator[LocalFile]:
+    """
+    Stream the files changed between the merge base of base and head, and head.
+
+    This is the same comparison GitHub shows for a pull request. Both commits must be
+    present in the local clone (e.g. actions/checkout with fetch-depth: 0).
+
+    Args:
+        repo_path: Path to the local clone
+        base: The base commit or ref
+        head: The head commit or ref
+
+    Returns:
+        An iterator of LocalFile objects
+
+    Raises:
+        subprocess.CalledProcessError: If git fails, raised once the output is exhausted
+    """
+    command = _git(repo_path, "diff", "--numstat", "-z", "-M", f"{base}...{head}")
+    # stderr goes to a file rather than a pipe so a chatty git can never block on it
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            yield from parse_numstat(process.stdout)
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+
+
+def _git(repo_path: str, *args: str) -> List[str]:
+    return ["git", "-c", "safe.directory=*", "-C", repo_path, *args]
+
+
+def merge_base(repo_path: str, base: str, head: str = "HEAD") -> str:
+    """Return the commit that a diff of base...head compares head against."""
+    command = _git(repo_path, "merge-base", base, head)
+    return subprocess.run(command, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def blob_sha(repo_path: str, commit: str, path: str) -> Optional[str]:
+    """Return the SHA of a file's blob at a commit, or None if the file does not exist there."""
+    command = _git(repo_path, "rev-parse", "--verify", "--quiet", f"{commit}:{path}")
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def iter_blob_lines(repo_path: str, sha: str) -> Iterator[str]:
+    """
+    Stream the lines of a blob without reading it all into memory.
+
+    Raises:
+        subprocess.CalledProcessError: If git fails, raised once the output is exhausted
+    """
+    command = _git(repo_path, "cat-file", "blob", sha)
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            with io.TextIOWrapper(process.stdout, encoding="utf-8", errors="replace") as text:
+                yield from text
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+
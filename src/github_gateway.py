@@ -1,29 +1,91 @@
+import base64
+import io
 import logging
 import os
-from datetime import datetime, UTC
-from typing import Optional
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from github import Auth, Github, PullRequest, Repository
+from github import Auth, Github, GithubException, GithubRetry, PullRequest, Repository
 
 from src.certainty_score import CertaintyScore
+from src.check_output import render_check_output
+from src.codeowners import CODEOWNERS_PATHS, CodeOwners, get_codeowners
 
 logger = logging.getLogger(__name__)
 
+CHECK_RUN_NAME = "Certainty Score"
+# Replaces the config fingerprint on check runs that ended in an error, so they are not reused
+ERROR_EXTERNAL_ID = "error"
+DEFAULT_API_URL = "https://api.github.com"
+
+
+@dataclass
+class TransportConfig:
+    """
+    How the gateway connects to the GitHub API.
+
+    The client keeps one HTTP session, so every gateway method and any threads sharing
+    the gateway reuse the same keep-alive connections, up to pool_size per host.
+    """
+
+    base_url: str = DEFAULT_API_URL
+    timeout: int = 15
+    retries: int = 10
+    pool_size: int = 10
+    # PyGithub spaces requests out to stay clear of GitHub's secondary rate limits
+    seconds_between_requests: Optional[float] = 0.25
+
+    def __post_init__(self):
+        if self.timeout <= 0:
+            raise ValueError("Timeout must be positive")
+        if self.retries < 0:
+            raise ValueError("Retries must not be negative")
+        if self.pool_size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """
+        Read the transport settings from the action inputs.
+
+        The base URL comes from GITHUB_API_URL, which the runner sets to the API of the
+        GitHub Enterprise Server instance the workflow runs on.
+        """
+        return cls(
+            base_url=os.getenv("GITHUB_API_URL") or DEFAULT_API_URL,
+            timeout=int(os.getenv("INPUT_API_TIMEOUT") or 15),
+            retries=int(os.getenv("INPUT_API_RETRIES") or 10),
+            pool_size=int(os.getenv("INPUT_API_POOL_SIZE") or 10),
+        )
+
 
 class GitHubGateway:
     """A gateway class for interacting with the GitHub API."""
 
-    def __init__(self, github_token: Optional[str] = None):
+    def __init__(
+        self, github_token: Optional[str] = None, transport: Optional[TransportConfig] = None
+    ):
         """
         Initialize the GitHub gateway.
 
         Args:
             github_token: GitHub API token. If None, it will be retrieved from environment variables.
+            transport: Connection settings. If None, they are read from environment variables.
         """
         self.github_token = github_token or os.getenv("INPUT_GITHUB_TOKEN")
         if not self.github_token:
             raise ValueError("GitHub token is required but not provided")
-        self.client = Github(auth=Auth.Token(self.github_token))
+        self.transport = transport or TransportConfig.from_env()
+        self.client = Github(
+            auth=Auth.Token(self.github_token),
+            base_url=self.transport.base_url.rstrip("/"),
+            timeout=self.transport.timeout,
+            retry=GithubRetry(total=self.transport.retries),
+            pool_size=self.transport.pool_size,
+            seconds_between_requests=self.transport.seconds_between_requests,
+        )
 
     def get_repo(self, repo_name: str) -> Repository.Repository:
         """
@@ -62,7 +124,7 @@ class GitHubGateway:
             check_runs = commit.get_check_runs()
 
             for check in check_runs:
-                if check.name == "Certainty Score":
+                if check.name == CHECK_RUN_NAME:
                     try:
                         return CertaintyScore.from_json(check.output.summary)
                     except ValueError:
@@ -99,13 +161,103 @@ class GitHubGateway:
         repo = self.get_repo(repo_name)
         return repo.get_pull(int(pr_number))
 
-    def create_check_run(self, repo_name: str, sha: str) -> int:
+    def get_codeowners(self, repo_name: str, ref: str) -> Optional[CodeOwners]:
+        """
+        Get the CODEOWNERS index for a repository at a ref.
+
+        The file is looked up in the same locations GitHub uses, and downloaded on every
+        call. The parsed index is cached by blob SHA, so an unchanged file is only parsed
+        once.
+
+        Args:
+            repo_name: The repository name in the format 'owner/repo'
+            ref: The branch, tag or commit to read CODEOWNERS from
+
+        Returns:
+            A CodeOwners index if the repository has a CODEOWNERS file, None otherwise
+        """
+        repo = self.get_repo(repo_name)
+        for path in CODEOWNERS_PATHS:
+            try:
+                contents = repo.get_contents(path, ref=ref)
+            except GithubException as e:
+                if e.status == 404:
+                    continue
+                raise
+            return get_codeowners(
+                repo_name,
+                contents.sha,
+                lambda: contents.decoded_content.decode("utf-8", errors="replace"),
+            )
+        return None
+
+    def get_merge_base(self, repo_name: str, base: str, head: str) -> str:
+        """Return the commit a pull request's changes are compared against."""
+        return self.get_repo(repo_name).compare(base, head).merge_base_commit.sha
+
+    def get_blob_sha(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        """
+        Return the SHA of a file's blob at a ref, or None if the file does not exist there.
+
+        The SHA is read from a listing of the file's directory, which does not include the
+        content, so the file is only downloaded if its blob is read.
+        """
+        directory, _, name = path.rpartition("/")
+        try:
+            entries = self.get_repo(repo_name).get_contents(directory, ref=ref)
+        except GithubException as e:
+            if e.status == 404:
+                return None
+            raise
+        if not isinstance(entries, list):
+            return None
+        for entry in entries:
+            if entry.name == name and entry.type == "file":
+                return entry.sha
+        return None
+
+    def iter_blob_lines(self, repo_name: str, sha: str) -> Iterator[str]:
+        """
+        Iterate over the lines of a blob.
+
+        The blobs API returns the whole blob base64 encoded, so unlike the local checkout
+        the blob is held in memory, but it is decoded into lines as they are read.
+        """
+        blob = self.get_repo(repo_name).get_git_blob(sha)
+        data = io.BytesIO(base64.b64decode(blob.content))
+        with io.TextIOWrapper(data, encoding="utf-8", errors="replace") as text:
+            yield from text
+
+    def rate_limit(self) -> Tuple[int, int, float]:
+        """
+        Return the requests left in the token's rate limit, the whole limit, and when it
+        resets in epoch seconds.
+
+        Read from the headers of the last response, so it costs no requests once one has
+        been made. Once the reset time has passed those headers are stale, so the limit is
+        fetched again, which does not count against it. Pass to FairScheduler to share the
+        limit between repositories.
+        """
+        if self.client.rate_limiting_resettime <= time.time():
+            self.client.get_rate_limit()
+        remaining, limit = self.client.rate_limiting
+        return remaining, limit, float(self.client.rate_limiting_resettime)
+
+    def create_check_run(
+        self,
+        repo_name: str,
+        sha: str,
+        external_id: Optional[str] = None,
+        name: str = CHECK_RUN_NAME,
+    ) -> int:
         """
         Create a new check run and return its ID.
 
         Args:
             repo_name: The repository name in the format 'owner/repo'
             sha: The commit SHA
+            external_id: Optional ID to store on the check run, e.g. a config fingerprint
+            name: The name of the check run
 
         Returns:
             The ID of the created check run
@@ -117,29 +269,170 @@ class GitHubGateway:
             raise ValueError("Commit SHA is required")
 
         repo = self.get_repo(repo_name)
+        kwargs = {"external_id": external_id} if external_id else {}
         check_run = repo.create_check_run(
-            name="Certainty Score",
+            name=name,
             head_sha=sha,
             status="in_progress",
             started_at=datetime.now(UTC),
+            **kwargs,
         )
         return check_run.id
 
+    def _find_check_runs(self, repo, sha: str, fingerprint: str) -> List:
+        """List this commit's certainty check runs that were created for fingerprint."""
+        # The API lists only the most recent run by default, but the election needs them all
+        check_runs = repo.get_commit(sha).get_check_runs(
+            check_name=CHECK_RUN_NAME, filter="all"
+        )
+        return [c for c in check_runs if c.external_id == fingerprint]
+
+    @staticmethod
+    def _parse_score(check_run) -> Optional[CertaintyScore]:
+        try:
+            return CertaintyScore.from_json(check_run.output.summary)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"Failed to parse Certainty Score from check run {check_run.id}")
+            return None
+
+    def _wait_for(
+        self,
+        repo,
+        check_id: int,
+        fingerprint: str,
+        poll_interval: float,
+        max_polls: int,
+        sleep: Callable[[float], None],
+    ) -> Optional[CertaintyScore]:
+        """
+        Poll a check run until it completes, returning its score.
+
+        Returns None on timeout, or if the run failed and gave up its fingerprint.
+        """
+        for _ in range(max_polls):
+            check_run = repo.get_check_run(check_id)
+            if check_run.status == "completed":
+                if check_run.external_id != fingerprint:
+                    logger.info(f"Check run {check_id} ended in an error")
+                    return None
+                return self._parse_score(check_run)
+            sleep(poll_interval)
+        logger.warning(f"Timed out waiting for check run {check_id}")
+        return None
+
+    def claim_check_run(
+        self,
+        repo_name: str,
+        sha: str,
+        fingerprint: str,
+        poll_interval: float = 5.0,
+        max_polls: int = 24,
+        max_age: timedelta = timedelta(hours=1),
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Tuple[Optional[int], Optional[CertaintyScore]]:
+        """
+        Make sure each commit and config is only scored once across concurrent runs.
+
+        Check runs are tagged with the config fingerprint, and the check run itself acts as
+        the lock: if a recent completed run exists its score is reused; if another run is in
+        progress its result is awaited with bounded polling. When two runs start at once,
+        both create a check run and the one with the lowest ID does the work, while the other
+        waits for it and copies its result onto its own check run. Runs that ended in an
+        error are retagged ERROR_EXTERNAL_ID, so they are never reused and a re-run scores
+        the commit again.
+
+        Args:
+            repo_name: The repository name in the format 'owner/repo'
+            sha: The commit SHA
+            fingerprint: Identifies the config and PR state the score depends on
+            poll_interval: Seconds between polls while waiting for another run
+            max_polls: Polls before giving up waiting and scoring independently
+            max_age: Completed runs older than this are not reused
+            sleep: Called to wait between polls
+
+        Returns:
+            (check_id, None) if the caller should score the commit and complete check_id,
+            or (None, certainty_score) if an existing result was reused
+        """
+        if not sha:
+            raise ValueError("Commit SHA is required")
+
+        repo = self.get_repo(repo_name)
+        oldest = datetime.now(UTC) - max_age
+
+        def completed_score(check_runs) -> Optional[CertaintyScore]:
+            for check_run in sorted(check_runs, key=lambda c: c.id, reverse=True):
+                if check_run.status == "completed" and (
+                    check_run.completed_at is None or check_run.completed_at >= oldest
+                ):
+                    score = self._parse_score(check_run)
+                    if score:
+                        return score
+            return None
+
+        def in_progress(check_runs) -> List[int]:
+            # Runs that started long ago have most likely crashed and will never complete
+            return [
+                c.id
+                for c in check_runs
+                if c.status != "completed"
+                and (c.started_at is None or c.started_at >= oldest)
+                and c.id not in abandoned
+            ]
+
+        abandoned = set()
+        existing = self._find_check_runs(repo, sha, fingerprint)
+        score = completed_score(existing)
+        if score:
+            logger.info("Reusing the certainty score of an earlier run")
+            return None, score
+
+        running = in_progress(existing)
+        if running:
+            score = self._wait_for(repo, min(running), fingerprint, poll_interval, max_polls, sleep)
+            if score:
+                logger.info(f"Reusing the certainty score of check run {min(running)}")
+                return None, score
+            abandoned.update(running)
+
+        check_id = self.create_check_run(repo_name, sha, external_id=fingerprint)
+
+        # Another run may have created its check run at the same time; the lowest ID wins
+        existing = self._find_check_runs(repo, sha, fingerprint)
+        score = completed_score(existing)
+        if not score:
+            leaders = [i for i in in_progress(existing) if i < check_id]
+            if not leaders:
+                return check_id, None
+            score = self._wait_for(repo, min(leaders), fingerprint, poll_interval, max_polls, sleep)
+            if not score:
+                return check_id, None
+
+        logger.info("Reusing the certainty score of a concurrent run")
+        self.update_check_run_with_score(repo_name, check_id, score)
+        return None, score
+
     def update_check_run_with_score(
         self,
         repo_name: str,
         check_id: int,
         certainty_score: CertaintyScore,
         details_text: Optional[str] = None,
+        reusable: bool = True,
     ) -> None:
         """
         Update the status of an existing check run.
 
+        The summary holds the score as JSON and the text a Markdown report, both kept within
+        GitHub's size limits. Every flagged file is also added as an annotation.
+
         Args:
             repo_name: The repository name in the format 'owner/repo'
             check_id: The ID of the check run to update
             certainty_score: The CertaintyScore object
             details_text: Optional Additional details to include in the check run
+            reusable: False if the score comes from an error rather than a completed
+                scoring, so claim_check_run must not reuse it
 
         Raises:
             ValueError: If any required parameter is invalid
@@ -148,25 +441,36 @@ class GitHubGateway:
             raise ValueError("Check run ID is required")
 
         conclusion = certainty_score.conclusion
-
-        summary = certainty_score.to_json()
-
-        if details_text is None:
-            details_text = certainty_score.get_summary()
+        output = render_check_output(certainty_score, details_text)
+        batches = list(output.annotation_batches())
 
         repo = self.get_repo(repo_name)
         check_run = repo.get_check_run(check_id)
 
+        first_output = {
+            "title": output.title,
+            "summary": output.summary,
+            "text": output.text,
+        }
+        if batches:
+            first_output["annotations"] = batches[0]
+        kwargs = {} if reusable else {"external_id": ERROR_EXTERNAL_ID}
         check_run.edit(
             status="completed",
             conclusion=conclusion,
             completed_at=datetime.now(UTC),
-            output={
-                "title": f"Certainty Score: {certainty_score.score}",
-                "summary": summary,
-                "text": details_text,
-            },
+            output=first_output,
+            **kwargs,
         )
+        # Annotations are appended by each update, at most 50 per request
+        for batch in batches[1:]:
+            check_run.edit(
+                output={
+                    "title": output.title,
+                    "summary": output.summary,
+                    "annotations": batch,
+                }
+            )
         logger.info(
             f"Check run updated with score {certainty_score.score} (conclusion: {conclusion})"
         )
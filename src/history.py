@@ -0,0 +1,269 @@
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.certainty_score import CertaintyScore
+
+logger = logging.getLogger(__name__)
+
+# Rule name recorded for changed files that no rule flagged
+RULE_CHANGED = ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    score INTEGER NOT NULL,
+    conclusion TEXT NOT NULL,
+    reverted INTEGER NOT NULL,
+    duration_ms REAL,
+    result TEXT NOT NULL,
+    pull_request INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_repo_time ON runs (repo, created_at);
+
+CREATE TABLE IF NOT EXISTS file_hits (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    repo TEXT NOT NULL,
+    path TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    failed INTEGER NOT NULL,
+    pull_request INTEGER
+);
+CREATE INDEX IF NOT EXISTS file_hits_repo_path_time ON file_hits (repo, path, created_at);
+CREATE INDEX IF NOT EXISTS file_hits_failed
+    ON file_hits (repo, path, created_at) WHERE failed = 1;
+"""
+
+# SQLite's default limit on host parameters is 999 on older builds
+_MAX_PARAMS = 500
+# Columns added since the first schema, with their definitions, for stores created before
+_ADDED_COLUMNS = {("runs", "pull_request"): "INTEGER", ("file_hits", "pull_request"): "INTEGER"}
+# Stored as SQLite's user_version. Version 1 stopped marking runs with a failure conclusion
+# as failed.
+_SCHEMA_VERSION = 1
+
+
+@dataclass
+class PathStats:
+    """How changes under a path prefix have fared."""
+
+    runs: int = 0
+    reverted_runs: int = 0
+    changes: int = 0
+    rule_hits: Dict[str, int] = field(default_factory=dict)
+
+
+class HistoryStore:
+    """
+    A local SQLite store of past runs and the files each one changed.
+
+    Every changed file is recorded once per run, plus once per rule that flagged it. The
+    repository, time, pull request and whether the run's PR was a revert are copied onto
+    each file row (as 'failed'), so path queries are served from a single index without
+    joins.
+
+    Only reverts make paths hot. This check's own failure conclusion does not, since a
+    PR that fails for any reason, including touching hot paths, would otherwise make its
+    files hot for the next PR.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open or create a history store.
+
+        Args:
+            path: Path to the SQLite database file, or ':memory:'
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+        self._add_columns()
+        self._migrate()
+
+    def _add_columns(self) -> None:
+        for (table, column), definition in _ADDED_COLUMNS.items():
+            columns = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                with self.connection:
+                    self.connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                    )
+
+    def _migrate(self) -> None:
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= _SCHEMA_VERSION:
+            return
+        with self.connection:
+            # Runs recorded as failed only because of their conclusion are not hot
+            self.connection.execute(
+                "UPDATE file_hits SET failed = 0 WHERE failed = 1 "
+                "AND run_id IN (SELECT id FROM runs WHERE reverted = 0)"
+            )
+            self.connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record_run(
+        self,
+        repo_name: str,
+        sha: str,
+        certainty_score: CertaintyScore,
+        changed_files: Iterable[str],
+        duration_ms: Optional[float] = None,
+        reverted: bool = False,
+        created_at: Optional[datetime] = None,
+        pull_request: Optional[int] = None,
+    ) -> int:
+        """
+        Record a scored run.
+
+        Args:
+            repo_name: The repository name in the format 'owner/repo'
+            sha: The commit SHA that was scored
+            certainty_score: The resulting CertaintyScore
+            changed_files: The paths of all files the PR changed
+            duration_ms: How long scoring took
+            reverted: Whether the PR reverts an earlier change
+            created_at: When the run happened. Defaults to now.
+            pull_request: The number of the PR that was scored
+
+        Returns:
+            The ID of the recorded run
+        """
+        timestamp = (created_at or datetime.now(UTC)).timestamp()
+        failed = int(reverted)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (repo, sha, created_at, score, conclusion, reverted, "
+                "duration_ms, result, pull_request) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    repo_name,
+                    sha,
+                    timestamp,
+                    certainty_score.score,
+                    certainty_score.conclusion,
+                    int(reverted),
+                    duration_ms,
+                    certainty_score.to_json(),
+                    pull_request,
+                ),
+            )
+            run_id = cursor.lastrowid
+            rows = [
+                (run_id, repo_name, path, RULE_CHANGED, timestamp, failed, pull_request)
+                for path in dict.fromkeys(changed_files)
+            ]
+            rows.extend(
+                (run_id, repo_name, path, rule, timestamp, failed, pull_request)
+                for rule, paths in certainty_score.rule_hits.items()
+                for path in dict.fromkeys(paths)
+            )
+            self.connection.executemany(
+                "INSERT INTO file_hits (run_id, repo, path, rule, created_at, failed, "
+                "pull_request) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return run_id
+
+    def path_stats(
+        self,
+        repo_name: str,
+        prefix: str = "",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> PathStats:
+        """
+        Summarise runs that changed files under a path prefix, e.g. 'infra/'.
+
+        Args:
+            repo_name: The repository name in the format 'owner/repo'
+            prefix: Path prefix to match. An empty prefix matches every path.
+            since: Only count runs at or after this time
+            until: Only count runs before this time
+
+        Returns:
+            A PathStats summary
+        """
+        # A range on path rather than LIKE, so the (repo, path, created_at) index is used
+        where = "repo = ? AND path >= ? AND path < ? AND created_at >= ? AND created_at < ?"
+        params = (
+            repo_name,
+            prefix,
+            prefix + "\U0010ffff",
+            since.timestamp() if since else float("-inf"),
+            until.timestamp() if until else float("inf"),
+        )
+        runs, reverted_runs, changes = self.connection.execute(
+            "SELECT COUNT(DISTINCT run_id), "
+            "COUNT(DISTINCT CASE WHEN failed THEN run_id END), "
+            f"SUM(rule = '') FROM file_hits WHERE {where}",
+            params,
+        ).fetchone()
+        rule_hits = dict(
+            self.connection.execute(
+                f"SELECT rule, COUNT(*) FROM file_hits WHERE {where} AND rule != '' "
+                "GROUP BY rule",
+                params,
+            ).fetchall()
+        )
+        return PathStats(runs, reverted_runs, changes or 0, rule_hits)
+
+    def hot_paths(
+        self,
+        repo_name: str,
+        paths: Iterable[str],
+        since: Optional[datetime] = None,
+        exclude_pull_request: Optional[int] = None,
+    ) -> Set[str]:
+        """
+        Return which of the given paths were changed by a run whose PR was a revert.
+
+        Args:
+            repo_name: The repository name in the format 'owner/repo'
+            paths: The paths to look up, e.g. the files changed by a PR
+            since: Only consider runs at or after this time
+            exclude_pull_request: Ignore runs of this PR, so a revert is not scored as
+                riskier on its next push because of its own earlier run
+
+        Returns:
+            The subset of paths that are hot
+        """
+        paths = list(dict.fromkeys(paths))
+        since_ts = since.timestamp() if since else float("-inf")
+        exclude, exclude_params = "", ()
+        if exclude_pull_request is not None:
+            exclude = " AND (pull_request IS NULL OR pull_request != ?)"
+            exclude_params = (exclude_pull_request,)
+        hot = set()
+        for start in range(0, len(paths), _MAX_PARAMS):
+            batch = paths[start : start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                "SELECT DISTINCT path FROM file_hits INDEXED BY file_hits_failed "
+                f"WHERE repo = ? AND path IN ({placeholders}) AND created_at >= ? "
+                f"AND failed = 1{exclude}",
+                (repo_name, *batch, since_ts, *exclude_params),
+            )
+            hot.update(row[0] for row in rows)
+        return hot
+
+    def recent_runs(self, repo_name: str, limit: int = 20) -> List[CertaintyScore]:
+        """Return the most recent recorded scores for a repository, newest first."""
+        rows = self.connection.execute(
+            "SELECT result FROM runs WHERE repo = ? ORDER BY created_at DESC LIMIT ?",
+            (repo_name, limit),
+        )
+        return [CertaintyScore.from_json(row[0]) for row in rows]
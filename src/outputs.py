@@ -0,0 +1,62 @@
+import os
+import uuid
+from typing import Any, Dict, Optional
+
+
+def format_outputs(outputs: Dict[str, Any]) -> str:
+    """
+    Format step outputs in the GITHUB_OUTPUT file syntax.
+
+    Every value is written with a heredoc style delimiter, so values may span lines. The
+    delimiter is random, so it cannot appear in the value.
+    """
+    lines = []
+    for name, value in outputs.items():
+        delimiter = f"ghadelimiter_{uuid.uuid4()}"
+        value = str(value)
+        if delimiter in value:
+            raise ValueError(f"Output {name} contains its delimiter")
+        lines.append(f"{name}<<{delimiter}\n{value}\n{delimiter}\n")
+    return "".join(lines)
+
+
+def _append(path: str, content: str) -> None:
+    # One buffered write, so concurrent steps appending to the same file cannot interleave
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(content)
+
+
+def write_outputs(outputs: Dict[str, Any], path: Optional[str] = None) -> bool:
+    """
+    Append step outputs to the file named by GITHUB_OUTPUT.
+
+    Args:
+        outputs: Mapping of output name to value
+        path: File to append to. Defaults to $GITHUB_OUTPUT.
+
+    Returns:
+        True if the outputs were written, False if there is no output file
+    """
+    path = path or os.getenv("GITHUB_OUTPUT")
+    if not path:
+        return False
+    _append(path, format_outputs(outputs))
+    return True
+
+
+def write_step_summary(markdown: str, path: Optional[str] = None) -> bool:
+    """
+    Append Markdown to the job summary file named by GITHUB_STEP_SUMMARY.
+
+    Args:
+        markdown: The Markdown to add
+        path: File to append to. Defaults to $GITHUB_STEP_SUMMARY.
+
+    Returns:
+        True if the summary was written, False if there is no summary file
+    """
+    path = path or os.getenv("GITHUB_STEP_SUMMARY")
+    if not path:
+        return False
+    _append(path, markdown if markdown.endswith("\n") else markdown + "\n")
+    return True
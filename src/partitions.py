@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.certainty_score import CertaintyScore
+from src.replay import SnapshotFile
+from src.risk import NO_RISKS, assess_risk
+
+# The partition of files that are not under any project root
+ROOT_PROJECT = "."
+# A project root segment that matches any single directory, e.g. 'packages/*'
+WILDCARD = "*"
+# Below this many files, starting worker processes costs more than scoring in-process
+PARALLEL_MIN_FILES = 5000
+
+_ROOT = object()
+
+
+def parse_project_roots(value: str) -> List[str]:
+    """Parse a comma or newline separated list of project roots, e.g. 'services/api, packages/*'."""
+    roots = []
+    for item in value.replace("\n", ",").split(","):
+        root = item.strip().strip("/")
+        if root:
+            roots.append(root)
+    return roots
+
+
+class ProjectRoots:
+    """
+    A prefix trie of project root directories.
+
+    Each file belongs to the project with the longest root that contains it. A '*' segment
+    matches any one directory, so 'packages/*' makes every package its own project.
+    """
+
+    def __init__(self, roots: Iterable[str]):
+        self.roots = list(dict.fromkeys(roots))
+        self._trie: Dict[Any, Any] = {}
+        for root in self.roots:
+            node = self._trie
+            for segment in root.strip("/").split("/"):
+                node = node.setdefault(segment, {})
+            node[_ROOT] = True
+        self._by_directory: Dict[str, str] = {}
+
+    def project_for(self, path: str) -> str:
+        """Return the root directory of the project containing path, or ROOT_PROJECT."""
+        directory = path.rpartition("/")[0]
+        project = self._by_directory.get(directory)
+        if project is None:
+            project = self._by_directory[directory] = self._match(directory)
+        return project
+
+    def _match(self, directory: str) -> str:
+        if not directory:
+            return ROOT_PROJECT
+        segments = directory.split("/")
+        nodes = [self._trie]
+        depth = 0
+        for i, segment in enumerate(segments):
+            nodes = [
+                child
+                for node in nodes
+                for child in (node.get(segment), node.get(WILDCARD))
+                if child is not None
+            ]
+            if not nodes:
+                break
+            if any(_ROOT in node for node in nodes):
+                depth = i + 1
+        return "/".join(segments[:depth]) if depth else ROOT_PROJECT
+
+
+def partition_files(changed_files: Iterable, roots: ProjectRoots) -> Dict[str, List]:
+    """Group changed files by project in a single pass, keeping their order."""
+    partitions: Dict[str, List] = {}
+    for f in changed_files:
+        partitions.setdefault(roots.project_for(f.filename), []).append(f)
+    return partitions
+
+
+@dataclass
+class PartitionedScore:
+    """A CertaintyScore per project, and one for the whole pull request."""
+
+    aggregate: CertaintyScore
+    partitions: Dict[str, CertaintyScore] = field(default_factory=dict)
+
+
+def aggregate_scores(partitions: Dict[str, CertaintyScore]) -> CertaintyScore:
+    """
+    Combine per-project scores into one for the whole pull request.
+
+    The pull request is as risky as its riskiest project: it gets the lowest score and
+    fails if any project fails. Reasons that apply to every project, such as a missing
+    reviewer, are listed once; the rest are prefixed with their project.
+    """
+    scores = list(partitions.values())
+    common = [
+        reason for reason in scores[0].reasons if all(reason in s.reasons for s in scores[1:])
+    ]
+    reasons = list(common)
+    files: List[str] = []
+    rule_hits: Dict[str, List[str]] = {}
+    for project, score in partitions.items():
+        reasons.extend(
+            f"{project}: {reason}"
+            for reason in score.reasons
+            if reason not in common and reason != NO_RISKS
+        )
+        files.extend(score.files)
+        for rule, hits in score.rule_hits.items():
+            rule_hits.setdefault(rule, []).extend(hits)
+
+    failed = any(s.conclusion == "failure" for s in scores)
+    return CertaintyScore(
+        min(s.score for s in scores),
+        reasons,
+        files,
+        "failure" if failed else "success",
+        rule_hits,
+    )
+
+
+def _snapshot_file(f) -> SnapshotFile:
+    return SnapshotFile(f.filename, getattr(f, "additions", 0), getattr(f, "deletions", 0))
+
+
+def _assess_chunk(
+    partitions: List[Tuple[str, List]], risk_kwargs: Dict[str, Any]
+) -> List[Tuple[str, CertaintyScore]]:
+    """Score a chunk of partitions. Runs in a worker process when scoring in parallel."""
+    return [
+        (project, assess_risk(changed_files=files, **risk_kwargs))
+        for project, files in partitions
+    ]
+
+
+def assess_partitions(
+    changed_files: List,
+    roots: ProjectRoots,
+    workers: Optional[int] = None,
+    **risk_kwargs,
+) -> PartitionedScore:
+    """
+    Score each project of a monorepo separately.
+
+    Args:
+        changed_files: The changed files, as passed to assess_risk
+        roots: The project roots to partition the files by
+        workers: Number of worker processes. Defaults to the number of CPUs. Small pull
+            requests, and any with 1 worker, are scored in the current process.
+        **risk_kwargs: Keyword arguments for assess_risk, applied to every project
+
+    Returns:
+        A PartitionedScore with a score per project that has changed files
+    """
+    risk_kwargs.setdefault("current_time", datetime.now(UTC))
+    partitions = sorted(partition_files(changed_files, roots).items()) or [(ROOT_PROJECT, [])]
+    workers = min(workers or os.cpu_count() or 1, len(partitions))
+
+    if workers == 1 or len(changed_files) < PARALLEL_MIN_FILES:
+        scores = _assess_chunk(partitions, risk_kwargs)
+    else:
+        # API objects do not pickle, so workers get the fields the rules use
+        risk_kwargs["reviewers"] = [
+            getattr(r, "login", r) for r in risk_kwargs.get("reviewers") or []
+        ]
+        partitions = [
+            (project, [_snapshot_file(f) for f in files]) for project, files in partitions
+        ]
+        # A few chunks per worker, so one large project does not hold up the rest
+        chunk_count = workers * 4
+        chunks = [partitions[i::chunk_count] for i in range(chunk_count)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_assess_chunk, chunk, risk_kwargs) for chunk in chunks if chunk
+            ]
+            by_project = dict(score for future in futures for score in future.result())
+        scores = [(project, by_project[project]) for project, _ in partitions]
+
+    scores_by_project = dict(scores)
+    return PartitionedScore(aggregate_scores(scores_by_project), scores_by_project)
@@ -0,0 +1,198 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+# Frames kept per allocation. More frames give better tracebacks but slow tracing down.
+TRACEMALLOC_FRAMES = 10
+PROFILE_FILE = "profile.prof"
+ALLOCATIONS_FILE = "allocations.txt"
+COLLAPSED_FILE = "profile.collapsed"
+
+_Function = Tuple[str, int, str]
+
+
+def _label(function: _Function) -> str:
+    filename, line, name = function
+    if filename == "~":
+        # Built in functions, e.g. '<built-in method time.sleep>'
+        return name.strip("<>")
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def collapse_stacks(
+    stats: pstats.Stats, max_depth: int = 64, min_seconds: float = 1e-6
+) -> Dict[str, float]:
+    """
+    Convert cProfile stats into collapsed stacks, as read by flamegraph.pl and speedscope.
+
+    cProfile only records caller and callee pairs, not whole stacks, so each function's
+    time is split between the stacks it was called from in proportion to the time each
+    caller spent in it. The result is an estimate, but a good one for most programs.
+
+    Stacks deeper than max_depth, or with less than min_seconds in them, are cut short.
+
+    Returns:
+        Mapping of 'outer;...;inner' stacks to the seconds spent in the innermost function
+    """
+    callees: Dict[_Function, Dict[_Function, float]] = {}
+    roots = []
+    for function, (_, _, _, cumulative, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = edge_cumulative
+        if not callers:
+            roots.append((function, cumulative))
+
+    collapsed: Dict[str, float] = {}
+
+    def walk(function: _Function, seconds: float, stack: List[_Function]) -> None:
+        stack = stack + [function]
+        cumulative = stats.stats[function][3] or seconds
+        scale = seconds / cumulative if cumulative else 0
+        inner = 0.0
+        if len(stack) < max_depth:
+            for callee, edge_seconds in callees.get(function, {}).items():
+                if callee in stack:
+                    # Recursion is already counted in the outer call
+                    continue
+                share = edge_seconds * scale
+                if share >= min_seconds:
+                    walk(callee, share, stack)
+                    inner += share
+        own = seconds - inner
+        if own > 0:
+            key = ";".join(_label(f) for f in stack)
+            collapsed[key] = collapsed.get(key, 0.0) + own
+
+    for function, cumulative in roots:
+        walk(function, cumulative, [])
+    return collapsed
+
+
+class RunProfile:
+    """
+    CPU and memory profile of a run, using cProfile and tracemalloc.
+
+    Use as a context manager around the code to profile, then write() the results.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started = None
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def __enter__(self) -> "RunProfile":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        if self.started is None:
+            return
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self.started = None
+        self.snapshot = tracemalloc.take_snapshot()
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def stats(self) -> pstats.Stats:
+        """Return the stats so far. Profiling carries on if it is running."""
+        running = self.started is not None
+        stats = pstats.Stats(self.profiler)
+        if running:
+            self.profiler.enable()
+        return stats
+
+    def headline(self, top: int = 5) -> str:
+        """Render the total time, peak memory and hottest functions so far as Markdown."""
+        if self.started is not None:
+            elapsed = time.perf_counter() - self.started
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        else:
+            elapsed, peak_memory = self.elapsed, self.peak_memory
+
+        stats = self.stats()
+        hottest = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        lines = [
+            "### Profile\n\n",
+            f"Total time {elapsed:.2f} s, peak traced memory {_format_bytes(peak_memory)}\n\n",
+            "| Function | Calls | Own time | Total time |\n|---|---|---|---|\n",
+        ]
+        for function, (_, calls, own, cumulative, _) in hottest:
+            lines.append(
+                f"| `{_label(function)}` | {calls} | {own:.3f} s | {cumulative:.3f} s |\n"
+            )
+        return "".join(lines)
+
+    def allocation_report(self, top: int = 25) -> str:
+        """Render the source lines that allocated the most memory still held at the end."""
+        if self.snapshot is None:
+            raise ValueError("The profile has not been stopped")
+        snapshot = self.snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]
+        )
+        statistics = snapshot.statistics("lineno")
+        lines = [
+            f"Peak traced memory: {_format_bytes(self.peak_memory)}\n",
+            f"Held at the end: {_format_bytes(sum(s.size for s in statistics))}\n\n",
+        ]
+        for index, stat in enumerate(statistics[:top], 1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"#{index}: {frame.filename}:{frame.lineno}: "
+                f"{_format_bytes(stat.size)} in {stat.count} blocks\n"
+            )
+        return "".join(lines)
+
+    def write(self, directory: str) -> List[str]:
+        """
+        Write the profile to a directory, e.g. to upload as a workflow artifact.
+
+        Writes the cProfile stats (for pstats or snakeviz), the top allocations, and
+        collapsed stacks in microseconds (for flamegraph.pl or speedscope).
+
+        Returns:
+            The paths written
+        """
+        self.stop()
+        os.makedirs(directory, exist_ok=True)
+        stats = self.stats()
+
+        profile_path = os.path.join(directory, PROFILE_FILE)
+        stats.dump_stats(profile_path)
+
+        allocations_path = os.path.join(directory, ALLOCATIONS_FILE)
+        with open(allocations_path, "w", encoding="utf-8") as f:
+            f.write(self.allocation_report())
+
+        collapsed_path = os.path.join(directory, COLLAPSED_FILE)
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, seconds in collapse_stacks(stats).items():
+                microseconds = round(seconds * 1e6)
+                if microseconds:
+                    f.write(f"{stack} {microseconds}\n")
+
+        return [profile_path, allocations_path, collapsed_path]
@@ -0,0 +1,414 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, fields, replace
+from datetime import datetime, UTC
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.certainty_score import CertaintyScore
+from src.config import RiskConfig, compile_rules
+from src.dependencies import DependencyDiff, PackageChange
+from src.risk import assess_risk
+
+logger = logging.getLogger(__name__)
+
+# The RiskConfig fields a replay config can override
+SETTINGS = frozenset(f.name for f in fields(RiskConfig))
+
+# The settings the deploy window's verdict depends on
+WINDOW_SETTINGS = ("check_work_hours", "timezone", "blocked_hours", "calendars")
+
+
+@dataclass
+class SnapshotFile:
+    """The subset of a changed file that the risk rules look at."""
+
+    filename: str
+    additions: int = 0
+    deletions: int = 0
+
+
+class _RecordedOwners:
+    """Stands in for CodeOwners on replay, answering from the owners recorded per file."""
+
+    def __init__(self, files: List[str], owners: List[List[str]]):
+        self._owners = dict(zip(files, owners))
+
+    def owners_for(self, path: str) -> List[str]:
+        return self._owners.get(path, [])
+
+
+class _RecordedWindow:
+    """Stands in for DeploymentWindow on replay, giving the recorded verdict."""
+
+    def __init__(self, reason: Optional[str]):
+        self.reason = reason
+
+    def check(self, when: datetime) -> Optional[str]:
+        return self.reason
+
+
+@dataclass
+class PRSnapshot:
+    """
+    The inputs that assess_risk saw for one pull request, plus what it concluded.
+
+    additions and deletions hold the line counts for each entry in files, and owners the
+    CODEOWNERS owners of each. risk_config holds the RiskConfig fields the PR was scored
+    with, and fingerprint that config's fingerprint. Inputs that come from the repository
+    or its history are recorded as they were seen: owners, hot_paths, dependency_diffs (as
+    package changes per manifest) and blocked_reason, the deploy window's verdict at
+    timestamp ("" if it was not blocked). None means the input was not recorded, e.g.
+    because the rule was turned off.
+    """
+
+    repo: str
+    sha: str
+    files: List[str]
+    reviewers: List[str]
+    timestamp: datetime
+    score: int = 0
+    conclusion: str = ""
+    additions: List[int] = field(default_factory=list)
+    deletions: List[int] = field(default_factory=list)
+    reviewer_teams: List[str] = field(default_factory=list)
+    owners: Optional[List[List[str]]] = None
+    hot_paths: Optional[List[str]] = None
+    dependency_diffs: Optional[Dict[str, List[List[Optional[str]]]]] = None
+    blocked_reason: Optional[str] = None
+    risk_config: Optional[Dict[str, Any]] = None
+    fingerprint: Optional[str] = None
+
+    def to_json(self) -> str:
+        """Serialise the snapshot as a single compact JSON line."""
+        data = {
+            "repo": self.repo,
+            "sha": self.sha,
+            "files": self.files,
+            "reviewers": self.reviewers,
+            "timestamp": self.timestamp.isoformat(),
+            "score": self.score,
+            "conclusion": self.conclusion,
+            "additions": self.additions,
+            "deletions": self.deletions,
+            "reviewer_teams": self.reviewer_teams,
+        }
+        for name in (
+            "owners",
+            "hot_paths",
+            "dependency_diffs",
+            "blocked_reason",
+            "risk_config",
+            "fingerprint",
+        ):
+            if getattr(self, name) is not None:
+                data[name] = getattr(self, name)
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "PRSnapshot":
+        """Create a PRSnapshot from a line written by to_json."""
+        data = json.loads(line)
+        return cls(
+            repo=data.get("repo", ""),
+            sha=data.get("sha", ""),
+            files=data.get("files", []),
+            reviewers=data.get("reviewers", []),
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            score=data.get("score", 0),
+            conclusion=data.get("conclusion", ""),
+            additions=data.get("additions", []),
+            deletions=data.get("deletions", []),
+            reviewer_teams=data.get("reviewer_teams", []),
+            owners=data.get("owners"),
+            hot_paths=data.get("hot_paths"),
+            dependency_diffs=data.get("dependency_diffs"),
+            blocked_reason=data.get("blocked_reason"),
+            risk_config=data.get("risk_config"),
+            fingerprint=data.get("fingerprint"),
+        )
+
+    @classmethod
+    def capture(
+        cls,
+        repo: str,
+        sha: str,
+        changed_files,
+        reviewers,
+        certainty_score: CertaintyScore,
+        timestamp: Optional[datetime] = None,
+        reviewer_teams: Optional[List[str]] = None,
+        codeowners=None,
+        hot_paths: Optional[Iterable[str]] = None,
+        dependency_diffs: Optional[List[DependencyDiff]] = None,
+        deploy_window=None,
+        risk_config: Optional[RiskConfig] = None,
+    ) -> "PRSnapshot":
+        """
+        Build a snapshot from the objects passed to and returned by assess_risk.
+
+        The deploy window's verdict is only recorded when risk_config checks work hours.
+        """
+        files = [f.filename for f in changed_files]
+        timestamp = timestamp or datetime.now(UTC)
+        if risk_config is not None and not risk_config.check_work_hours:
+            deploy_window = None
+        return cls(
+            repo=repo,
+            sha=sha,
+            files=files,
+            reviewers=[getattr(r, "login", str(r)) for r in reviewers or []],
+            timestamp=timestamp,
+            score=certainty_score.score,
+            conclusion=certainty_score.conclusion,
+            additions=[getattr(f, "additions", 0) for f in changed_files],
+            deletions=[getattr(f, "deletions", 0) for f in changed_files],
+            reviewer_teams=list(reviewer_teams or []),
+            owners=[codeowners.owners_for(f) for f in files] if codeowners else None,
+            hot_paths=sorted(hot_paths) if hot_paths is not None else None,
+            dependency_diffs=(
+                {
+                    d.path: [[c.name, c.old_version, c.new_version] for c in d.changes]
+                    for d in dependency_diffs
+                }
+                if dependency_diffs is not None
+                else None
+            ),
+            blocked_reason=(deploy_window.check(timestamp) or "") if deploy_window else None,
+            risk_config=asdict(risk_config) if risk_config is not None else None,
+            fingerprint=risk_config.fingerprint if risk_config is not None else None,
+        )
+
+    def recorded_config(self) -> RiskConfig:
+        """Return the RiskConfig the PR was scored with, or the defaults if not recorded."""
+        return RiskConfig(**self.risk_config) if self.risk_config is not None else RiskConfig()
+
+    def recorded_inputs(self) -> Dict[str, Any]:
+        """Return the recorded repository and history inputs as assess_risk arguments."""
+        inputs: Dict[str, Any] = {"reviewer_teams": self.reviewer_teams}
+        if self.owners is not None:
+            inputs["codeowners"] = _RecordedOwners(self.files, self.owners)
+        if self.hot_paths is not None:
+            inputs["hot_paths"] = set(self.hot_paths)
+        if self.dependency_diffs is not None:
+            inputs["dependency_diffs"] = [
+                DependencyDiff(path, [PackageChange(*change) for change in changes])
+                for path, changes in self.dependency_diffs.items()
+            ]
+        return inputs
+
+    def assess(self, config: Dict[str, Any]) -> CertaintyScore:
+        """
+        Re-score this snapshot with the recorded settings and inputs, overridden by config.
+
+        Keys of config that are RiskConfig fields override the recorded RiskConfig, which is
+        then compiled with compile_rules. Other keys are passed to assess_risk as they are.
+        The recorded deploy window verdict is used unless config changes the window settings.
+
+        Raises:
+            ValueError: If a setting in config is invalid
+        """
+        recorded = self.recorded_config()
+        risk_config = replace(recorded, **{k: v for k, v in config.items() if k in SETTINGS})
+        use_verdict = self.blocked_reason is not None and all(
+            getattr(risk_config, name) == getattr(recorded, name) for name in WINDOW_SETTINGS
+        )
+        if use_verdict:
+            # The calendars are not read, so they need not exist where the replay runs
+            risk_config = replace(risk_config, calendars=())
+
+        kwargs = {**self.recorded_inputs(), **compile_rules(risk_config).risk_kwargs()}
+        if use_verdict:
+            kwargs["deploy_window"] = _RecordedWindow(self.blocked_reason or None)
+        kwargs.update((k, v) for k, v in config.items() if k not in SETTINGS)
+
+        additions = self.additions or [0] * len(self.files)
+        deletions = self.deletions or [0] * len(self.files)
+        return assess_risk(
+            changed_files=[
+                SnapshotFile(name, added, deleted)
+                for name, added, deleted in zip(self.files, additions, deletions)
+            ],
+            reviewers=self.reviewers,
+            current_time=self.timestamp,
+            **kwargs,
+        )
+
+
+@dataclass
+class ReplayResult:
+    """Aggregated outcome of replaying a corpus under one configuration."""
+
+    name: str
+    total: int = 0
+    failures: int = 0
+    flipped: int = 0
+    flipped_to_failure: int = 0
+    flipped_to_success: int = 0
+    examples: List[str] = field(default_factory=list)
+
+    def merge(self, other: "ReplayResult", max_examples: int = 10) -> None:
+        """Fold the counts from another partial result into this one."""
+        self.total += other.total
+        self.failures += other.failures
+        self.flipped += other.flipped
+        self.flipped_to_failure += other.flipped_to_failure
+        self.flipped_to_success += other.flipped_to_success
+        room = max_examples - len(self.examples)
+        if room > 0:
+            self.examples.extend(other.examples[:room])
+
+    def get_summary(self) -> str:
+        """Generate a one line human-readable summary."""
+        return (
+            f"{self.name}: {self.flipped}/{self.total} flipped "
+            f"({self.flipped_to_failure} to failure, {self.flipped_to_success} to success), "
+            f"{self.failures} failing"
+        )
+
+
+def record_snapshot(path: str, snapshot: PRSnapshot) -> None:
+    """
+    Append a snapshot to the store at path.
+
+    The store is a JSON Lines file and is only ever appended to, so concurrent writers
+    and interrupted runs can at worst leave a partial last line, which is skipped on read.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as store:
+        store.write(snapshot.to_json() + "\n")
+
+
+def iter_snapshots(path: str) -> Iterator[PRSnapshot]:
+    """Stream the snapshots in the store at path one at a time."""
+    for line in _iter_lines(path):
+        try:
+            yield PRSnapshot.from_json(line)
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Skipping unreadable snapshot: {e}")
+
+
+def _iter_lines(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8") as store:
+        for line in store:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _replay_chunk(lines: List[str], configs: Dict[str, Dict[str, Any]]) -> List[ReplayResult]:
+    """Score one chunk of raw snapshot lines under every config. Runs in a worker process."""
+    results = {name: ReplayResult(name) for name in configs}
+    for line in lines:
+        try:
+            snapshot = PRSnapshot.from_json(line)
+        except (ValueError, KeyError):
+            continue
+        for name, config in configs.items():
+            result = results[name]
+            conclusion = snapshot.assess(config).conclusion
+            result.total += 1
+            if conclusion == "failure":
+                result.failures += 1
+            if snapshot.conclusion and conclusion != snapshot.conclusion:
+                result.flipped += 1
+                if conclusion == "failure":
+                    result.flipped_to_failure += 1
+                else:
+                    result.flipped_to_success += 1
+                if len(result.examples) < 10:
+                    result.examples.append(f"{snapshot.repo}@{snapshot.sha}")
+    return list(results.values())
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(lines)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def replay(
+    path: str,
+    configs: Dict[str, Dict[str, Any]],
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+) -> Dict[str, ReplayResult]:
+    """
+    Re-score every snapshot in a store under alternative configurations.
+
+    The store is read in chunks of chunk_size lines, and only a bounded number of chunks
+    are in flight at once, so memory use does not grow with the size of the corpus.
+
+    Args:
+        path: Path to a store written by record_snapshot
+        configs: Mapping of config name to the settings to change, see PRSnapshot.assess
+            (e.g. {"strict": {"max_files": 10, "min_certainty": 80}})
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            With 1, everything runs in the current process.
+        chunk_size: Number of snapshots sent to a worker at a time
+
+    Returns:
+        A ReplayResult per config name, counting conclusions that differ from the recorded one
+
+    Raises:
+        ValueError: If there are no configs or a setting in one is invalid
+    """
+    if not configs:
+        raise ValueError("At least one config is required")
+    for name, config in configs.items():
+        try:
+            replace(RiskConfig(), **{k: v for k, v in config.items() if k in SETTINGS})
+        except ValueError as e:
+            raise ValueError(f"Invalid config {name!r}: {e}") from e
+    workers = workers or os.cpu_count() or 1
+    results = {name: ReplayResult(name) for name in configs}
+    chunks = _chunks(_iter_lines(path), chunk_size)
+
+    if workers == 1:
+        for chunk in chunks:
+            for partial in _replay_chunk(chunk, configs):
+                results[partial.name].merge(partial)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for partial in future.result():
+                        results[partial.name].merge(partial)
+            pending.add(executor.submit(_replay_chunk, chunk, configs))
+        for future in pending:
+            for partial in future.result():
+                results[partial.name].merge(partial)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay recorded PR snapshots under alternative risk configs."
+    )
+    parser.add_argument("store", help="Snapshot store written with INPUT_RECORD_PATH")
+    parser.add_argument(
+        "configs",
+        help='JSON file mapping config names to the settings to change, e.g. {"strict": {"max_files": 10}}',
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with open(args.configs, encoding="utf-8") as config_file:
+        configs = json.load(config_file)
+
+    for result in replay(args.store, configs, args.workers, args.chunk_size).values():
+        print(result.get_summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,40 @@
+from dataclasses import dataclass
 from datetime import datetime, UTC
 
 from github.File import File
 
 from src.certainty_score import CertaintyScore
+from src.churn import churn_weight
+from src.codeowners import CodeOwners
+from src.dependencies import DependencyDiff
+from src.deploy_window import DEFAULT_DEPLOY_WINDOW, DeploymentWindow
+
+# Names of the rules that flag individual files, as used in CertaintyScore.rule_hits
+RULE_SECRET_FILE = "secret_file"
+RULE_CODEOWNERS = "codeowners"
+RULE_CHURN = "churn"
+RULE_HOT_PATH = "hot_path"
+RULE_DEPENDENCIES = "dependencies"
+
+# Major version bumps listed in a reason before the rest are counted
+MAX_LISTED_BUMPS = 5
+
+# The only reason given when no rule raised the risk
+NO_RISKS = "All good. No major risks detected."
+
+
+@dataclass(frozen=True)
+class SecretGlobs:
+    """File name endings that mark a file as holding secrets, checked together."""
+
+    patterns: tuple[str, ...]
+
+    def count(self, filename: str) -> int:
+        """Return how many of the patterns filename ends with."""
+        # Most files match none, which a single endswith over the tuple rules out
+        if not filename.endswith(self.patterns):
+            return 0
+        return sum(filename.endswith(pattern) for pattern in self.patterns)
 
 
 def assess_risk(
@@ -13,6 +45,14 @@ def assess_risk(
     secret_globs=None,
     current_time=None,
     min_certainty=70,
+    deploy_window: DeploymentWindow = None,
+    codeowners: CodeOwners = None,
+    reviewer_teams=None,
+    max_churn=1000,
+    max_file_churn=500,
+    churn_weights=None,
+    hot_paths=None,
+    dependency_diffs: list[DependencyDiff] = None,
 ) -> CertaintyScore:
     """
     Assess the risk of a code change based on various factors.
@@ -34,7 +74,7 @@ def assess_risk(
     max_files: int, optional
         The maximum number of files allowed to be changed to avoid increasing the risk score.
         Default is 20.
-    secret_globs: list[str] or None, optional
+    secret_globs: list[str], SecretGlobs or None, optional
         A list of file patterns that are considered sensitive. Files matching these patterns
         increase the risk score. Default is ['.env', '.pem', 'secrets.py'].
     current_time
@@ -42,11 +82,35 @@ def assess_risk(
         UTC is used.
     min_certainty: int, optional
         The minimum certainty percentage required to consider the changes low risk. Default is 70.
+    deploy_window: DeploymentWindow or None, optional
+        The times at which deploying is risky, used when check_work_hours is set. Default is
+        Friday from 16:00 UTC.
+    codeowners: CodeOwners or None, optional
+        The CODEOWNERS index for the repository. When given, changed files that have owners but
+        none of them is a requested reviewer or team increase the risk score.
+    reviewer_teams: list[str] or None, optional
+        The teams requested to review, as 'org/team-slug'.
+    max_churn: int, optional
+        The maximum weighted number of lines added and deleted across all files. Default is 1000.
+    max_file_churn: int, optional
+        The maximum weighted number of lines added and deleted in a single file. Default is 500.
+    churn_weights: dict[str, float] or None, optional
+        How much a changed line counts towards churn, by file extension (e.g. {'.md': 0.2}).
+        Generated files such as lockfiles and vendored code never count. Default is
+        src.churn.DEFAULT_TYPE_WEIGHTS.
+    hot_paths: set[str] or None, optional
+        Paths that were recently changed by a revert, e.g. from
+        src.history.HistoryStore.hot_paths. Changing them again increases the risk score.
+    dependency_diffs: list[DependencyDiff] or None, optional
+        The package changes in dependency manifests, e.g. from src.dependencies.diff_manifest.
+        Manifests that are not among changed_files are ignored. Changing dependencies
+        increases the risk score, and major version bumps increase it further.
 
     Returns:
     CertaintyScore
         An object containing the certainty score, reasons contributing to the risk score, list of
-        filenames considered sensitive, and a conclusion ("success" or "failure").
+        filenames flagged by the rules (and which rule flagged each), and a conclusion ("success"
+        or "failure").
 
     Raises:
     ValueError
@@ -55,6 +119,8 @@ def assess_risk(
     reasons = []
     filenames = []
     secret_globs = secret_globs or [".env", ".pem", "secrets.py"]
+    if not isinstance(secret_globs, SecretGlobs):
+        secret_globs = SecretGlobs(tuple(secret_globs))
     current_time = current_time or datetime.now(UTC)
 
     # File count check
@@ -62,20 +128,85 @@ def assess_risk(
         risk += 2
         reasons.append(f"{len(changed_files)} files changed (max is {max_files})")
 
-    # Secret file detection
+    reviewer_handles = _reviewer_handles(reviewers, reviewer_teams)
+    unowned = []
+    churned = []
+    hot = []
+    total_churn = 0.0
+
     for f in changed_files:
-        for pattern in secret_globs:
-            if f.filename.endswith(pattern):
-                risk += 3
-                filenames.append(f.filename)
+        # Secret file detection
+        matches = secret_globs.count(f.filename)
+        if matches:
+            risk += 3 * matches
+            filenames.extend([f.filename] * matches)
+
+        # Code owner coverage
+        if codeowners is not None:
+            owners = codeowners.owners_for(f.filename)
+            if owners and reviewer_handles.isdisjoint(o.lower() for o in owners):
+                unowned.append(f.filename)
+
+        # Churn
+        lines = getattr(f, "additions", 0) + getattr(f, "deletions", 0)
+        if lines:
+            file_churn = lines * churn_weight(f.filename, churn_weights)
+            total_churn += file_churn
+            if file_churn > max_file_churn:
+                churned.append(f.filename)
+
+        # Recently reverted paths
+        if hot_paths and f.filename in hot_paths:
+            hot.append(f.filename)
+
+    rule_hits = {}
     if len(filenames) > 0:
         reasons.append("Suspicious file(s)")
+        rule_hits[RULE_SECRET_FILE] = list(dict.fromkeys(filenames))
+    if unowned:
+        risk += 1
+        reasons.append(f"{len(unowned)} file(s) not owned by a requested reviewer")
+        filenames.extend(unowned)
+        rule_hits[RULE_CODEOWNERS] = unowned
+    if total_churn > max_churn:
+        risk += 2
+        reasons.append(f"{round(total_churn)} weighted lines changed (max is {max_churn})")
+    if churned:
+        risk += 1
+        reasons.append(f"{len(churned)} file(s) with large changes (max is {max_file_churn} lines)")
+        filenames.extend(churned)
+        rule_hits[RULE_CHURN] = churned
+    if hot:
+        risk += 1
+        reasons.append(f"{len(hot)} file(s) recently reverted")
+        filenames.extend(hot)
+        rule_hits[RULE_HOT_PATH] = hot
+
+    # Dependency changes
+    if dependency_diffs:
+        changed = {f.filename for f in changed_files}
+        diffs = [d for d in dependency_diffs if d.changes and d.path in changed]
+        if diffs:
+            risk += 1
+            count = sum(len(d.changes) for d in diffs)
+            reasons.append(f"{count} dependency change(s) in {len(diffs)} manifest(s)")
+            manifests = [d.path for d in diffs]
+            filenames.extend(manifests)
+            rule_hits[RULE_DEPENDENCIES] = manifests
+            bumps = [str(c) for d in diffs for c in d.major_bumps]
+            if bumps:
+                risk += 1
+                listed = ", ".join(bumps[:MAX_LISTED_BUMPS])
+                if len(bumps) > MAX_LISTED_BUMPS:
+                    listed += f" and {len(bumps) - MAX_LISTED_BUMPS} more"
+                reasons.append(f"{len(bumps)} major version bump(s): {listed}")
 
     # Deployment time
     if check_work_hours:
-        if current_time.weekday() == 4 and current_time.hour >= 16:  # Friday 4PM+
+        blocked_reason = (deploy_window or DEFAULT_DEPLOY_WINDOW).check(current_time)
+        if blocked_reason:
             risk += 2
-            reasons.append("Deploying late on Friday")
+            reasons.append(blocked_reason)
 
     # Reviewer check
     if not reviewers:
@@ -85,6 +216,17 @@ def assess_risk(
     certainty = max(0, 10 - risk) * 10
     conclusion = "success" if certainty >= min_certainty else "failure"
     if len(reasons) < 1:
-        reasons = ["All good. No major risks detected."]
+        reasons = [NO_RISKS]
+
+    return CertaintyScore(certainty, reasons, filenames, conclusion, rule_hits)
+
 
-    return CertaintyScore(certainty, reasons, filenames, conclusion)
+def _reviewer_handles(reviewers, reviewer_teams) -> set[str]:
+    """Normalise reviewers and teams to lower case CODEOWNERS style '@handles'."""
+    handles = set()
+    for reviewer in reviewers or []:
+        login = getattr(reviewer, "login", reviewer)
+        handles.add(f"@{str(login).lstrip('@').lower()}")
+    for team in reviewer_teams or []:
+        handles.add(f"@{team.lstrip('@').lower()}")
+    return handles
@@ -0,0 +1,268 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Job priorities. Higher priorities are always dispatched first.
+PRIORITY_NORMAL = 0
+PRIORITY_RELEASE = 10
+
+RELEASE_BRANCH_PREFIXES = ("release/", "release-", "hotfix/")
+
+# GitHub's primary rate limit resets every hour
+WINDOW_SECONDS = 3600
+
+
+def branch_priority(branch: str) -> int:
+    """Return the priority for work on a PR into a branch: release branches go first."""
+    if branch.startswith(RELEASE_BRANCH_PREFIXES):
+        return PRIORITY_RELEASE
+    return PRIORITY_NORMAL
+
+
+@dataclass(order=True)
+class _Job:
+    # Ordered within a repo's queue by priority, then submission order
+    sort_key: Tuple[int, int]
+    func: Callable[[], Any] = field(compare=False)
+    cost: int = field(compare=False)
+    submitted_at: float = field(compare=False)
+    future: Future = field(compare=False)
+
+
+@dataclass
+class QueueMetrics:
+    """Queue depth and wait times for one repository."""
+
+    depth: int = 0
+    dispatched: int = 0
+    requests: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.dispatched if self.dispatched else 0.0
+
+
+@dataclass
+class _Tenant:
+    weight: float
+    budget: Optional[int]
+    queue: List[_Job] = field(default_factory=list)
+    # Virtual time at which the tenant's last dispatched job finished
+    finish: float = 0.0
+    window: int = -1
+    used: int = 0
+    metrics: QueueMetrics = field(default_factory=QueueMetrics)
+
+
+class FairScheduler:
+    """
+    Share one token's API rate limit fairly between repositories.
+
+    Pending work is queued per repository. Among the repositories whose next job has the
+    highest priority, the one that has had the least of its weighted share goes next
+    (start-time fair queuing), so a monorepo with thousands of queued requests cannot
+    starve a small repository. Each repository can also have a budget of requests per
+    rate limit window, and no job is started without enough of the shared limit left.
+
+    Jobs run on the thread that calls run() or run_next(); submit() may be called from
+    any thread.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        budgets: Optional[Dict[str, int]] = None,
+        default_budget: Optional[int] = None,
+        rate_limit: Optional[Callable[[], Tuple[int, int, float]]] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        window_seconds: float = WINDOW_SECONDS,
+    ):
+        """
+        Create a scheduler.
+
+        Args:
+            weights: Share of the rate limit per repository, relative to the default of 1
+            budgets: Maximum requests per window per repository
+            default_budget: Budget for repositories not in budgets. Defaults to no budget.
+            rate_limit: Returns the remaining requests of the shared limit, the whole limit
+                and when it resets, e.g. GitHubGateway.rate_limit. Also used to charge jobs
+                for the requests they actually made.
+            clock: Returns the current time in seconds, on the same scale as the reset time
+            sleep: Called to wait for budgets or the rate limit to reset
+            window_seconds: Length of a budget window
+        """
+        self.weights = weights or {}
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.rate_limit = rate_limit
+        self.clock = clock
+        self.sleep = sleep
+        self.window_seconds = window_seconds
+        self._tenants: Dict[str, _Tenant] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _tenant(self, repo_name: str) -> _Tenant:
+        tenant = self._tenants.get(repo_name)
+        if tenant is None:
+            budget = self.budgets.get(repo_name, self.default_budget)
+            tenant = _Tenant(self.weights.get(repo_name, 1.0), budget)
+            self._tenants[repo_name] = tenant
+        return tenant
+
+    def submit(
+        self,
+        repo_name: str,
+        func: Callable[[], Any],
+        cost: int = 1,
+        priority: int = PRIORITY_NORMAL,
+    ) -> Future:
+        """
+        Queue API work for a repository.
+
+        Args:
+            repo_name: The repository the work is for, in the format 'owner/repo'
+            func: The work to do. It is called with no arguments.
+            cost: Estimated number of API requests func makes
+            priority: Jobs with a higher priority are dispatched first, see branch_priority
+
+        Returns:
+            A Future for the result of func
+        """
+        if cost < 1:
+            raise ValueError("Cost must be at least 1")
+        future: Future = Future()
+        with self._lock:
+            tenant = self._tenant(repo_name)
+            job = _Job((-priority, next(self._sequence)), func, cost, self.clock(), future)
+            heapq.heappush(tenant.queue, job)
+            tenant.metrics.depth += 1
+        return future
+
+    def _window(self, now: float) -> int:
+        return int(now // self.window_seconds)
+
+    def _within_budget(self, tenant: _Tenant, job: _Job, window: int) -> bool:
+        if tenant.window != window:
+            tenant.window, tenant.used = window, 0
+        if tenant.budget is None or tenant.used == 0:
+            # A job larger than the whole budget still runs, alone in its window
+            return True
+        return tenant.used + job.cost <= tenant.budget
+
+    def _pick(
+        self, now: float, remaining: Optional[int], limit: Optional[int]
+    ) -> Optional[Tuple[_Tenant, _Job]]:
+        """Return the next job to run, removing it from its queue, or None if none can run."""
+        window = self._window(now)
+        best = None
+        for tenant in self._tenants.values():
+            if not tenant.queue:
+                continue
+            job = tenant.queue[0]
+            if not self._within_budget(tenant, job, window):
+                continue
+            # Start-time fair queuing: the job that starts earliest in virtual time goes next
+            start = max(self._virtual_time, tenant.finish)
+            finish = start + job.cost / tenant.weight
+            key = (job.sort_key[0], start, finish, job.sort_key[1])
+            if best is None or key < best[0]:
+                best = (key, tenant)
+        if best is None:
+            return None
+
+        (_, start, finish, _), tenant = best
+        if remaining is not None and remaining < min(tenant.queue[0].cost, limit):
+            # Nothing runs until the shared limit resets, so smaller jobs cannot jump ahead.
+            # A job larger than the whole limit runs alone, straight after a reset.
+            return None
+        self._virtual_time = start
+        tenant.finish = finish
+        job = heapq.heappop(tenant.queue)
+        tenant.metrics.depth -= 1
+        return tenant, job
+
+    def pending(self) -> int:
+        """Return the number of queued jobs."""
+        with self._lock:
+            return sum(len(t.queue) for t in self._tenants.values())
+
+    def run_next(self) -> bool:
+        """
+        Run the next job if one can run now.
+
+        Returns:
+            True if a job ran, False if every queue is empty, over budget, or the shared
+            rate limit does not have enough requests left
+        """
+        now = self.clock()
+        remaining = limit = None
+        if self.rate_limit:
+            remaining, limit, reset_at = self.rate_limit()
+            if reset_at <= now:
+                # The counts are from before the last reset, so the whole limit is back
+                remaining = limit
+
+        with self._lock:
+            picked = self._pick(now, remaining, limit)
+            if picked is None:
+                return False
+            tenant, job = picked
+            wait = now - job.submitted_at
+            tenant.metrics.dispatched += 1
+            tenant.metrics.total_wait += wait
+            tenant.metrics.max_wait = max(tenant.metrics.max_wait, wait)
+
+        used = 0
+        if job.future.set_running_or_notify_cancel():
+            used = job.cost
+            try:
+                job.future.set_result(job.func())
+            except Exception as e:
+                job.future.set_exception(e)
+
+        if remaining is not None:
+            after, _, _ = self.rate_limit()
+            # The limit may have reset while the job ran; then charge the estimate
+            if 0 <= remaining - after:
+                used = remaining - after
+        with self._lock:
+            tenant.used += used
+            tenant.metrics.requests += used
+        return True
+
+    def _next_reset(self) -> float:
+        now = self.clock()
+        resets = [(self._window(now) + 1) * self.window_seconds]
+        if self.rate_limit:
+            _, _, reset_at = self.rate_limit()
+            if reset_at > now:
+                resets.append(reset_at)
+        return min(resets) - now
+
+    def run(self) -> None:
+        """Run jobs until every queue is empty, waiting for budgets and limits to reset."""
+        while self.pending():
+            if not self.run_next():
+                wait = max(self._next_reset(), 0.0)
+                logger.info(f"Waiting {wait:.0f}s for the rate limit or budgets to reset")
+                self.sleep(wait)
+
+    def metrics(self) -> Dict[str, QueueMetrics]:
+        """Return a snapshot of the queue depth and wait times of each repository."""
+        with self._lock:
+            return {
+                repo_name: QueueMetrics(**vars(tenant.metrics))
+                for repo_name, tenant in self._tenants.items()
+            }
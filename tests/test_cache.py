@@ -0,0 +1,74 @@
+import threading
+
+from src.cache import LRUCache
+
+
+def test_get_or_build_caches():
+    cache = LRUCache(4)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_build("a", build)
+    assert cache.get_or_build("a", build) is first
+    assert len(calls) == 1
+    info = cache.info()
+    assert (info.hits, info.misses, info.size) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.get_or_build("a", lambda: 1)
+    cache.get_or_build("b", lambda: 2)
+    cache.get_or_build("a", lambda: 1)
+    cache.get_or_build("c", lambda: 3)
+
+    assert cache.get_or_build("a", lambda: "rebuilt") == 1
+    assert cache.get_or_build("b", lambda: "rebuilt") == "rebuilt"
+    assert cache.info().size == 2
+
+
+def test_failed_build_is_not_cached():
+    cache = LRUCache(2)
+
+    def fail():
+        raise ValueError("bad")
+
+    try:
+        cache.get_or_build("a", fail)
+    except ValueError:
+        pass
+    assert cache.get_or_build("a", lambda: 1) == 1
+
+
+def test_clear_resets_counts():
+    cache = LRUCache(2)
+    cache.get_or_build("a", lambda: 1)
+    cache.get_or_build("a", lambda: 1)
+    cache.clear()
+    info = cache.info()
+    assert (info.hits, info.misses, info.size) == (0, 0, 0)
+
+
+def test_threads_get_the_first_value():
+    cache = LRUCache(2)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def build():
+        barrier.wait()
+        return object()
+
+    def worker():
+        results.append(cache.get_or_build("a", build))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(r is results[0] for r in results)
+    assert cache.info().size == 1
@@ -75,6 +75,17 @@ class TestCertaintyScore:
         }
         assert score.to_dict() == expected
 
+    def test_validation_rule_hits_type(self):
+        with pytest.raises(ValueError, match="Rule hits must be a dictionary"):
+            CertaintyScore(80, [], [], "success", [])
+
+    def test_to_dict_with_rule_hits(self):
+        score = CertaintyScore(
+            70, ["Suspicious file(s)"], ["a.env"], "success", {"secret_file": ["a.env"]}
+        )
+        assert score.to_dict()["rule_hits"] == {"secret_file": ["a.env"]}
+        assert CertaintyScore.from_json(score.to_json()) == score
+
     def test_to_json(self):
         score = CertaintyScore(
             82, ["No reviewers", "Changed env file"], ["config/.env"]
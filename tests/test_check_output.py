@@ -0,0 +1,129 @@
+import json
+
+from src.certainty_score import CertaintyScore
+from src.check_output import (
+    ANNOTATIONS_PER_REQUEST,
+    MAX_NAMES_PER_ROW,
+    render_check_output,
+    render_summary,
+    render_text,
+)
+
+
+def large_score(count=5000):
+    files = [f"services/svc{i % 40}/config/file{i}.env" for i in range(count)]
+    return CertaintyScore(
+        0,
+        ["Suspicious file(s)"],
+        files,
+        "failure",
+        {"secret_file": files},
+    )
+
+
+def test_render_summary_fits_unchanged(test_score):
+    assert render_summary(test_score) == test_score.to_json()
+
+
+def test_render_summary_truncates_and_parses():
+    score = large_score()
+    summary = render_summary(score, budget=10000)
+
+    assert len(summary.encode()) <= 10000
+    parsed = CertaintyScore.from_json(summary)
+    assert parsed.score == 0
+    assert parsed.conclusion == "failure"
+    assert parsed.files == score.files[: len(parsed.files)]
+    assert 0 < len(parsed.files) < len(score.files)
+
+
+def test_render_summary_truncates_reasons():
+    reasons = [f"services/svc{i}: 12 files changed (max is 20)" for i in range(2000)]
+    score = CertaintyScore(0, reasons, ["services/svc0/.env"], "failure")
+    summary = render_summary(score, budget=10000)
+
+    assert len(summary.encode()) <= 10000
+    data = json.loads(summary)
+    assert data["reasons"] == reasons[: len(data["reasons"])]
+    assert 0 < len(data["reasons"]) < len(reasons)
+    assert data["reasons_omitted"] == len(reasons) - len(data["reasons"])
+    assert len(data["files"]) + data["files_omitted"] == 1
+
+
+def test_render_text_groups_by_rule_and_directory():
+    score = CertaintyScore(
+        40,
+        ["Suspicious file(s)", "1 file(s) with large changes (max is 500 lines)"],
+        ["a/.env", "a/b/.env", "big.py", "legacy.py"],
+        "failure",
+        {"secret_file": ["a/.env", "a/b/.env"], "churn": ["big.py"]},
+    )
+    text = render_text(score)
+
+    assert text.startswith("## Certainty Score: 40/100 (FAILURE)")
+    assert "- Suspicious file(s)\n" in text
+    assert "### Suspicious file (2)" in text
+    assert "| `a/` | 1 | `.env` |" in text
+    assert "| `a/b/` | 1 | `.env` |" in text
+    assert "### Large change (1)" in text
+    assert "| `./` | 1 | `big.py` |" in text
+    # Flagged files without a rule entry are still listed
+    assert "### Other (1)" in text
+    assert "not shown" not in text
+
+
+def test_render_text_respects_budget():
+    text = render_text(large_score(), budget=5000)
+
+    assert len(text.encode()) <= 5000
+    assert "more flagged file(s) not shown" in text
+
+
+def test_render_text_caps_names_per_directory():
+    files = [f"config/file{i}.env" for i in range(5000)]
+    hot = ["src/app.py"]
+    score = CertaintyScore(
+        0, ["Suspicious file(s)"], files + hot, "failure", {"secret_file": files, "hot_path": hot}
+    )
+    text = render_text(score)
+
+    assert "| `config/` | 5000 | `file0.env`, " in text
+    assert f" +{5000 - MAX_NAMES_PER_ROW} more |" in text
+    assert "`file19.env`" in text and "`file20.env`" not in text
+    # A later rule is still shown
+    assert "| `src/` | 1 | `app.py` |" in text
+    assert f"…and {5000 - MAX_NAMES_PER_ROW} more flagged file(s)" in text
+
+
+def test_render_text_skips_lines_that_do_not_fit():
+    files = [f"d{i}/{'x' * 200}.env" for i in range(400)]
+    score = CertaintyScore(
+        0, [], files + ["big.py"], "failure", {"secret_file": files, "churn": ["big.py"]}
+    )
+    text = render_text(score, budget=5000)
+
+    assert len(text.encode()) <= 5000
+    assert "| `./` | 1 | `big.py` |" in text
+
+
+def test_render_check_output_annotations():
+    output = render_check_output(large_score(120))
+
+    assert len(output.annotations) == 120
+    assert output.annotations[0] == {
+        "path": "services/svc0/config/file0.env",
+        "start_line": 1,
+        "end_line": 1,
+        "annotation_level": "failure",
+        "title": "Certainty Score",
+        "message": "Suspicious file",
+    }
+    batches = list(output.annotation_batches())
+    assert [len(b) for b in batches] == [ANNOTATIONS_PER_REQUEST, ANNOTATIONS_PER_REQUEST, 20]
+
+
+def test_render_check_output_details_text(test_score):
+    output = render_check_output(test_score, "There was an error")
+    assert output.text == "There was an error"
+    assert output.title == "Certainty Score: 82"
+    assert output.annotations[0]["annotation_level"] == "warning"
@@ -0,0 +1,49 @@
+import pytest
+
+from src.churn import DEFAULT_TYPE_WEIGHTS, churn_weight, is_generated, parse_type_weights
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "package-lock.json",
+        "web/yarn.lock",
+        "poetry.lock",
+        "vendor/github.com/lib/pq/conn.go",
+        "services/api/node_modules/left-pad/index.js",
+        "static/app.min.js",
+        "tests/__snapshots__/view.test.js.snap",
+        "proto/service_pb2.py",
+    ],
+)
+def test_is_generated(path):
+    assert is_generated(path)
+
+
+@pytest.mark.parametrize(
+    "path", ["main.py", "src/vendors.py", "docs/lock.md", "myvendor/x.go"]
+)
+def test_is_not_generated(path):
+    assert not is_generated(path)
+
+
+def test_churn_weight():
+    assert churn_weight("go.sum") == 0
+    assert churn_weight("README.md") == 0.2
+    assert churn_weight("docs/GUIDE.MD") == 0.2
+    assert churn_weight("src/main.py") == 1
+    assert churn_weight("Makefile") == 1
+    assert churn_weight("README.md", {}) == 1
+
+
+def test_parse_type_weights():
+    weights = parse_type_weights(".md=0, sql=2.5")
+    assert weights[".md"] == 0
+    assert weights[".sql"] == 2.5
+    assert weights[".txt"] == DEFAULT_TYPE_WEIGHTS[".txt"]
+    assert parse_type_weights("") == DEFAULT_TYPE_WEIGHTS
+
+
+def test_parse_type_weights_invalid():
+    with pytest.raises(ValueError, match="Invalid churn weight"):
+        parse_type_weights(".md")
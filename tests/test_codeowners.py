@@ -0,0 +1,90 @@
+import pytest
+
+from src.codeowners import CodeOwners, clear_cache, get_codeowners
+
+CODEOWNERS = """# Default owners
+*       @org/everyone
+
+*.js    @js-owner    # inline comment
+/docs/  @docs-owner
+apps/   @apps-owner
+/build/logs/ @doctocat
+docs/*  @docs-direct
+/scripts/**/deploy.sh @org/release
+Makefile @build-owner
+/src/api/ @org/api @api-lead
+"""
+
+
+@pytest.fixture
+def codeowners():
+    return CodeOwners(CODEOWNERS)
+
+
+@pytest.mark.parametrize(
+    "path, owners",
+    [
+        ("README.md", ["@org/everyone"]),
+        ("web/app.js", ["@js-owner"]),
+        ("docs/guide/intro.md", ["@docs-owner"]),
+        ("docs/intro.md", ["@docs-direct"]),
+        ("services/apps/main.py", ["@apps-owner"]),
+        ("build/logs/today.log", ["@doctocat"]),
+        ("scripts/deploy.sh", ["@org/release"]),
+        ("scripts/prod/eu/deploy.sh", ["@org/release"]),
+        ("tools/Makefile", ["@build-owner"]),
+        ("src/api/handler.js", ["@org/api", "@api-lead"]),
+        ("src/apiclient/handler.py", ["@org/everyone"]),
+    ],
+)
+def test_owners_for(codeowners, path, owners):
+    assert codeowners.owners_for(path) == owners
+
+
+def test_no_match():
+    codeowners = CodeOwners("/docs/ @docs-owner\n")
+    assert codeowners.owners_for("src/main.py") == []
+    assert codeowners.match("src/main.py") is None
+
+
+def test_last_match_wins():
+    codeowners = CodeOwners("/src/ @first\n*.py @second\n/src/legacy/ @third\n")
+    assert codeowners.owners_for("src/main.py") == ["@second"]
+    assert codeowners.owners_for("src/legacy/main.py") == ["@third"]
+
+
+def test_rule_without_owners():
+    codeowners = CodeOwners("* @everyone\n/vendor/\n")
+    assert codeowners.owners_for("vendor/lib.py") == []
+
+
+def test_matches_naive_scan(codeowners):
+    paths = [
+        f"{top}/{mid}/{name}"
+        for top in ("docs", "apps", "src", "scripts", "build")
+        for mid in ("api", "logs", "apps", "x")
+        for name in ("a.js", "deploy.sh", "Makefile", "b.py")
+    ]
+    for path in paths:
+        expected = None
+        for rule in codeowners.rules:
+            if rule.regex.fullmatch(path):
+                expected = rule
+        assert codeowners.match(path) is expected, path
+
+
+def test_get_codeowners_caches_by_sha():
+    clear_cache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return CODEOWNERS
+
+    first = get_codeowners("owner/repo", "sha1", load)
+    second = get_codeowners("owner/repo", "sha1", load)
+    third = get_codeowners("owner/repo", "sha2", load)
+
+    assert first is second
+    assert third is not first
+    assert len(loads) == 2
@@ -0,0 +1,131 @@
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src import config
+from src.churn import DEFAULT_TYPE_WEIGHTS
+from src.config import CompiledRules, RiskConfig, cache_info, clear_cache, compile_rules
+from src.risk import SecretGlobs
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def test_from_env():
+    env = {
+        "INPUT_MAX_FILE_COUNT": "5",
+        "INPUT_SECRET_FILE_GLOBS": ".env, .pem,",
+        "INPUT_MIN_CERTAINTY": "80",
+        "INPUT_CHECK_WORK_HOURS": "false",
+        "INPUT_CHURN_WEIGHTS": ".sql=2",
+        "INPUT_TIMEZONE": "Europe/London",
+        "INPUT_DEPLOY_CALENDARS": "a.ics,b.yaml",
+    }
+    with patch.dict(os.environ, env, clear=True):
+        risk_config = RiskConfig.from_env()
+
+    assert risk_config == RiskConfig(
+        max_files=5,
+        secret_globs=(".env", ".pem"),
+        min_certainty=80,
+        check_work_hours=False,
+        churn_weights=".sql=2",
+        timezone="Europe/London",
+        calendars=("a.ics", "b.yaml"),
+    )
+
+
+def test_from_env_defaults():
+    with patch.dict(os.environ, {}, clear=True):
+        assert RiskConfig.from_env() == RiskConfig()
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        ({"max_files": -1}, "max_files must be a non-negative integer"),
+        ({"max_churn": "10"}, "max_churn must be a non-negative integer"),
+        ({"min_certainty": 101}, "min_certainty must be between 0 and 100"),
+        ({"check_work_hours": "yes"}, "check_work_hours must be a boolean"),
+        ({"secret_globs": [".env", ""]}, "secret_globs must be non-empty strings"),
+    ],
+)
+def test_invalid(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        RiskConfig(**kwargs)
+
+
+def test_fingerprint():
+    assert RiskConfig().fingerprint == RiskConfig(secret_globs=[".env", ".pem"]).fingerprint
+    assert RiskConfig().fingerprint == RiskConfig(secret_globs=".env,.pem").fingerprint
+    assert RiskConfig().fingerprint != RiskConfig(max_files=21).fingerprint
+    assert len(RiskConfig().fingerprint) == 32
+
+
+def test_risk_kwargs():
+    kwargs = CompiledRules.compile(RiskConfig(max_files=5)).risk_kwargs()
+
+    assert kwargs["max_files"] == 5
+    assert kwargs["secret_globs"] == SecretGlobs((".env", ".pem"))
+    assert kwargs["churn_weights"] == DEFAULT_TYPE_WEIGHTS
+    assert kwargs["deploy_window"].tz.key == "UTC"
+
+
+def test_compile_rules_is_cached():
+    first = compile_rules(RiskConfig(max_files=5))
+    second = compile_rules(RiskConfig(max_files=5))
+    other = compile_rules(RiskConfig(max_files=6))
+
+    assert first is second
+    assert other is not first
+    info = cache_info()
+    assert (info.hits, info.misses, info.size) == (1, 2, 2)
+    assert info.hit_rate == pytest.approx(1 / 3)
+
+
+def test_compile_rules_evicts_least_recently_used():
+    with patch.object(config._cache, "maxsize", 2):
+        first = compile_rules(RiskConfig(max_files=1))
+        compile_rules(RiskConfig(max_files=2))
+        compile_rules(RiskConfig(max_files=1))
+        compile_rules(RiskConfig(max_files=3))
+
+        assert compile_rules(RiskConfig(max_files=1)) is first
+        assert cache_info().size == 2
+        compile_rules(RiskConfig(max_files=2))
+        assert cache_info().misses == 4
+
+
+def test_compile_rules_invalid():
+    with pytest.raises(ValueError):
+        compile_rules(RiskConfig(churn_weights="md"))
+    assert cache_info().size == 0
+
+
+def test_compile_rules_threads():
+    configs = [RiskConfig(max_files=i % 3) for i in range(300)]
+    results = [None] * len(configs)
+    barrier = threading.Barrier(8)
+
+    def worker(start):
+        barrier.wait()
+        for i in range(start, len(configs), 8):
+            results[i] = compile_rules(configs[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i, rules in enumerate(results):
+        assert rules is results[i % 3]
+    info = cache_info()
+    assert info.hits + info.misses == 300
+    assert info.size == 3
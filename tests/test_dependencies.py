@@ -0,0 +1,214 @@
+import io
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from src.dependencies import (
+    PackageChange,
+    clear_cache,
+    diff_manifest,
+    diff_manifests,
+    manifest_kind,
+    parse_package_lock,
+    parse_poetry_lock,
+    parse_requirements,
+)
+
+REQUIREMENTS = """\
+# Runtime dependencies
+Django==4.2.1  # LTS
+requests[socks]>=2.31 ; python_version >= "3.8"
+zope.interface == 6.0
+cryptography==41.0.3 \\
+    --hash=sha256:aaa \\
+    --hash=sha256:bbb
+-r base.txt
+-e git+https://github.com/example/pkg.git#egg=pkg
+--index-url https://pypi.example.com/simple
+mypkg @ https://example.com/mypkg.tar.gz
+"""
+
+POETRY_LOCK = """\
+# This file is automatically @generated by Poetry and should not be changed by hand.
+
+[[package]]
+name = "Django"
+version = "4.2.1"
+description = "A high-level Python web framework."
+optional = false
+
+[package.dependencies]
+asgiref = ">=3.6.0,<4"
+version = "not a package version"
+
+[[package]]
+name = "asgiref"
+version = "3.7.2"
+
+[metadata]
+lock-version = "2.0"
+content-hash = "abc"
+"""
+
+
+def package_lock(packages, indent=2):
+    data = {
+        "name": "app",
+        "version": "1.0.0",
+        "lockfileVersion": 3,
+        "requires": True,
+        "packages": {"": {"name": "app", "version": "1.0.0"}, **packages},
+    }
+    return json.dumps(data, indent=indent) + "\n"
+
+
+def lines(text):
+    return io.StringIO(text)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.mark.parametrize(
+    "path, kind",
+    [
+        ("requirements.txt", "requirements"),
+        ("services/api/requirements-dev.txt", "requirements"),
+        ("requirements/base.txt", "requirements"),
+        ("poetry.lock", "poetry.lock"),
+        ("web/package-lock.json", "package-lock.json"),
+        ("package.json", None),
+        ("docs/notes.txt", None),
+    ],
+)
+def test_manifest_kind(path, kind):
+    assert manifest_kind(path) == kind
+
+
+def test_parse_requirements():
+    assert parse_requirements(lines(REQUIREMENTS)) == {
+        "django": "4.2.1",
+        "requests": ">=2.31",
+        "zope-interface": "6.0",
+        "cryptography": "41.0.3",
+    }
+
+
+def test_parse_poetry_lock():
+    assert parse_poetry_lock(lines(POETRY_LOCK)) == {"django": "4.2.1", "asgiref": "3.7.2"}
+
+
+@pytest.mark.parametrize("indent", [2, 4, "\t"])
+def test_parse_package_lock(indent):
+    text = package_lock(
+        {
+            "node_modules/react": {"version": "18.2.0", "dependencies": {"loose-envify": "^1"}},
+            "node_modules/@babel/core": {"version": "7.22.0"},
+            "node_modules/a/node_modules/b": {"version": "2.0.0"},
+            "packages/workspace": {"version": "0.1.0"},
+            "node_modules/linked": {"resolved": "packages/workspace", "link": True},
+        },
+        indent,
+    )
+    assert parse_package_lock(lines(text)) == {
+        "react": "18.2.0",
+        "@babel/core": "7.22.0",
+        "a/node_modules/b": "2.0.0",
+    }
+
+
+def test_parse_package_lock_version_1():
+    data = {
+        "name": "app",
+        "lockfileVersion": 1,
+        "dependencies": {
+            "react": {"version": "17.0.2", "dependencies": {"nested": {"version": "1.0.0"}}},
+            "lodash": {"version": "4.17.21"},
+        },
+    }
+    expected = {"react": "17.0.2", "lodash": "4.17.21"}
+    assert parse_package_lock(lines(json.dumps(data, indent=2))) == expected
+    # Minified lockfiles are parsed as a whole
+    assert parse_package_lock(lines(json.dumps(data))) == expected
+
+
+def test_parse_package_lock_version_2_ignores_legacy_section():
+    data = {
+        "lockfileVersion": 2,
+        "packages": {"node_modules/react": {"version": "18.2.0"}},
+        "dependencies": {"react": {"version": "18.2.0"}, "legacy-only": {"version": "1.0.0"}},
+    }
+    assert parse_package_lock(lines(json.dumps(data, indent=2))) == {"react": "18.2.0"}
+
+
+@pytest.mark.parametrize(
+    "old, new, kind, major",
+    [
+        (None, "1.0", "added", False),
+        ("1.0", None, "removed", False),
+        ("1.2.3", "1.3.0", "upgraded", False),
+        ("1.9.0", "2.0.0", "upgraded", True),
+        ("2.0.0", "1.9.0", "downgraded", True),
+        ("0.1.5", "0.2.0", "upgraded", True),
+        ("0.1.5", "0.1.6", "upgraded", False),
+        ("1.0.0", "v1.0.0-beta", "changed", False),
+        (">=2", "<3", "upgraded", True),
+        ("latest", "next", "changed", False),
+    ],
+)
+def test_package_change(old, new, kind, major):
+    change = PackageChange("pkg", old, new)
+    assert change.kind == kind
+    assert change.is_major is major
+
+
+def test_diff_manifests():
+    old = {"django": "3.2", "six": "1.16.0", "requests": "2.31.0"}
+    new = {"django": "4.2", "requests": "2.31.0", "attrs": "23.1.0"}
+
+    assert diff_manifests(old, new) == [
+        PackageChange("attrs", None, "23.1.0"),
+        PackageChange("django", "3.2", "4.2"),
+        PackageChange("six", "1.16.0", None),
+    ]
+
+
+def test_diff_manifest_caches_by_blob_sha():
+    blobs = {
+        "old": "django==3.2\nsix==1.16.0\n",
+        "new": "django==4.2\n",
+        "newer": "django==4.2\nattrs==23.1.0\n",
+    }
+    read = Mock(side_effect=lambda sha: lines(blobs[sha]))
+
+    diff = diff_manifest("requirements.txt", "old", "new", read)
+    assert [str(c) for c in diff.changes] == ["django 3.2 -> 4.2", "six 1.16.0 (removed)"]
+    assert [str(c) for c in diff.major_bumps] == ["django 3.2 -> 4.2"]
+
+    again = diff_manifest("api/requirements.txt", "old", "new", read)
+    assert again.path == "api/requirements.txt"
+    assert again.changes == diff.changes
+    assert read.call_count == 2
+
+    # The old version is shared with the first diff, so only the newer one is read
+    diff_manifest("requirements.txt", "old", "newer", read)
+    assert [c.args[0] for c in read.call_args_list] == ["old", "new", "newer"]
+
+
+def test_diff_manifest_added_file():
+    read = Mock(return_value=lines("flask==3.0.0\n"))
+
+    diff = diff_manifest("requirements.txt", None, "new", read)
+
+    assert diff.changes == [PackageChange("flask", None, "3.0.0")]
+    read.assert_called_once_with("new")
+
+
+def test_diff_manifest_not_a_manifest():
+    with pytest.raises(ValueError, match="Not a dependency manifest"):
+        diff_manifest("app.py", "a", "b", Mock())
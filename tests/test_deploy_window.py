@@ -0,0 +1,227 @@
+from datetime import date, datetime, timedelta, UTC
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src.deploy_window import (
+    DEFAULT_DEPLOY_WINDOW,
+    RECURRENCE_HORIZON,
+    BlockedPeriod,
+    DeploymentWindow,
+    load_ics,
+    load_yaml,
+    parse_weekly_rules,
+)
+
+LONDON = ZoneInfo("Europe/London")
+UTC_ZONE = ZoneInfo("UTC")
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+DTSTART;VALUE=DATE:20241225
+DTEND;VALUE=DATE:20241227
+SUMMARY:Christmas
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20240610T120000Z
+DTEND:20240610T
+ 150000Z
+SUMMARY:Release freeze
+END:VEVENT
+END:VCALENDAR
+"""
+
+YAML = """# Company calendar
+holidays:
+  - date: 2024-05-27
+    name: Spring bank holiday
+  - date: 2024-12-24
+    end: 2024-12-26
+freezes:
+  - start: 2024-11-28T18:00
+    end: "2024-12-02T09:00"
+    name: Black Friday
+"""
+
+
+class TestParseWeeklyRules:
+
+    def test_single_day_with_hours(self):
+        rules = parse_weekly_rules("fri 16:00-24:00")
+        assert len(rules) == 1
+        assert rules[0].start == 4 * 1440 + 16 * 60
+        assert rules[0].end == 5 * 1440
+
+    def test_day_range_and_whole_days(self):
+        rules = parse_weekly_rules("Mon-Wed 18:00-24:00, sat, sun")
+        assert [r.start // 1440 for r in rules] == [0, 1, 2, 5, 6]
+
+    @pytest.mark.parametrize(
+        "spec", ["someday", "fri 16:00", "fri 17:00-16:00", "fri 16:75-17:00"]
+    )
+    def test_invalid(self, spec):
+        with pytest.raises(ValueError):
+            parse_weekly_rules(spec)
+
+
+class TestCalendars:
+
+    def test_load_ics(self):
+        periods = load_ics(ICS, LONDON)
+        assert len(periods) == 2
+        assert periods[0].reason == "Deploying on a holiday (Christmas)"
+        assert periods[0].start == datetime(2024, 12, 25, tzinfo=UTC)
+        assert periods[0].end == datetime(2024, 12, 27, tzinfo=UTC)
+        assert periods[1].reason == "Deploying during a release freeze (Release freeze)"
+        assert periods[1].end == datetime(2024, 6, 10, 15, tzinfo=UTC)
+
+    def test_load_ics_duration(self):
+        periods = load_ics(
+            "BEGIN:VEVENT\nDTSTART:20240610T120000Z\nDURATION:PT2H30M\n"
+            "SUMMARY:Migration\nEND:VEVENT\n"
+            "BEGIN:VEVENT\nDTSTART;VALUE=DATE:20241225\nDURATION:P2D\nEND:VEVENT\n",
+            LONDON,
+        )
+        assert periods[0].end == datetime(2024, 6, 10, 14, 30, tzinfo=UTC)
+        assert periods[1].end - periods[1].start == timedelta(days=2)
+
+    def test_load_ics_yearly_recurrence(self):
+        periods = load_ics(
+            "BEGIN:VEVENT\nDTSTART;VALUE=DATE:20221225\nRRULE:FREQ=YEARLY;COUNT=3\n"
+            "SUMMARY:Christmas\nEND:VEVENT\n",
+            UTC_ZONE,
+        )
+        assert [p.start.date() for p in periods] == [
+            date(2022, 12, 25), date(2023, 12, 25), date(2024, 12, 25)
+        ]
+        assert all(p.end - p.start == timedelta(days=1) for p in periods)
+
+    def test_load_ics_recurrence_until(self):
+        periods = load_ics(
+            "BEGIN:VEVENT\nDTSTART:20240101T180000Z\nDTEND:20240101T200000Z\n"
+            "RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL=20240201\nEND:VEVENT\n",
+            UTC_ZONE,
+        )
+        assert [p.start.day for p in periods] == [1, 15, 29]
+
+    def test_load_ics_recurrence_without_end_stops_at_horizon(self):
+        periods = load_ics(
+            "BEGIN:VEVENT\nDTSTART;VALUE=DATE:20200101\nRRULE:FREQ=YEARLY\nEND:VEVENT\n",
+            UTC_ZONE,
+        )
+        assert periods[-1].start.date() <= date.today() + RECURRENCE_HORIZON
+        assert periods[-1].start.year >= date.today().year + 4
+
+    def test_load_ics_unsupported_recurrence(self, caplog):
+        periods = load_ics(
+            "BEGIN:VEVENT\nDTSTART;VALUE=DATE:20240101\nRRULE:FREQ=MONTHLY;BYDAY=1MO\n"
+            "END:VEVENT\n",
+            UTC_ZONE,
+        )
+        assert len(periods) == 1
+        assert "Unsupported calendar recurrence" in caplog.text
+
+    def test_load_ics_warns_about_zero_length_events(self, caplog):
+        load_ics("BEGIN:VEVENT\nDTSTART:20240610T120000Z\nSUMMARY:Ping\nEND:VEVENT\n", LONDON)
+        assert "does not last any time" in caplog.text
+
+    def test_load_yaml(self):
+        periods = load_yaml(YAML, LONDON)
+        assert [p.reason for p in periods] == [
+            "Deploying on a holiday (Spring bank holiday)",
+            "Deploying on a holiday",
+            "Deploying during a release freeze (Black Friday)",
+        ]
+        # Whole days are in the calendar timezone (BST here)
+        assert periods[0].start == datetime(2024, 5, 26, 23, tzinfo=UTC)
+        # End dates are inclusive
+        assert periods[1].end == datetime(2024, 12, 27, tzinfo=UTC)
+
+    def test_load_yaml_unknown_section(self):
+        with pytest.raises(ValueError, match="Unknown calendar section"):
+            load_yaml("outages:\n  - date: 2024-01-01\n", LONDON)
+
+    def test_from_config_unsupported_file(self, tmp_path):
+        path = tmp_path / "calendar.txt"
+        path.write_text("")
+        with pytest.raises(ValueError, match="Unsupported calendar file"):
+            DeploymentWindow.from_config(calendars=[str(path)])
+
+
+class TestDeploymentWindow:
+
+    def test_default_window(self):
+        assert DEFAULT_DEPLOY_WINDOW.check(datetime(2024, 1, 5, 17, 30)) == (
+            "Deploying late on Friday"
+        )
+        assert DEFAULT_DEPLOY_WINDOW.check(datetime(2024, 1, 5, 15, 59)) is None
+        assert DEFAULT_DEPLOY_WINDOW.check(datetime(2024, 1, 6, 0, 0)) is None
+
+    def test_from_config_defaults_to_friday(self):
+        window = DeploymentWindow.from_config()
+        assert window.check(datetime(2024, 1, 5, 17, tzinfo=UTC)) == "Deploying late on Friday"
+
+    def test_weekly_rules_use_timezone(self):
+        window = DeploymentWindow.from_config("America/New_York", "fri 16:00-24:00")
+        # 20:00 UTC is 15:00 in New York in January
+        assert window.check(datetime(2024, 1, 5, 20, tzinfo=UTC)) is None
+        # 02:00 UTC Saturday is still Friday evening in New York
+        assert window.check(datetime(2024, 1, 6, 2, tzinfo=UTC)) == (
+            "Deploying during blocked hours (fri 16:00-24:00)"
+        )
+
+    def test_periods_take_precedence(self, tmp_path):
+        calendar = tmp_path / "calendar.yaml"
+        calendar.write_text(YAML)
+        window = DeploymentWindow.from_config("Europe/London", "fri", [str(calendar)])
+
+        # Friday 29 Nov is both blocked weekly and in the freeze
+        assert window.check(datetime(2024, 11, 29, 12, tzinfo=UTC)) == (
+            "Deploying during a release freeze (Black Friday)"
+        )
+        assert window.check(datetime(2024, 12, 2, 8, 59, tzinfo=UTC)) is not None
+        assert window.check(datetime(2024, 12, 2, 9, 0, tzinfo=UTC)) is None
+
+    def test_overlapping_periods_keep_their_reasons(self):
+        window = DeploymentWindow(periods=load_ics(ICS, LONDON) + load_yaml(YAML, LONDON))
+        # Christmas started later than the 24-26 December holiday, so it is reported
+        assert window.check(datetime(2024, 12, 26, 12, tzinfo=UTC)) == (
+            "Deploying on a holiday (Christmas)"
+        )
+        assert window.check(datetime(2024, 12, 24, 12, tzinfo=UTC)) == (
+            "Deploying on a holiday"
+        )
+
+    def test_holiday_inside_freeze(self):
+        freeze = BlockedPeriod(
+            datetime(2024, 12, 20, tzinfo=UTC), datetime(2025, 1, 3, tzinfo=UTC), "Freeze"
+        )
+        holiday = BlockedPeriod(
+            datetime(2024, 12, 25, tzinfo=UTC), datetime(2024, 12, 26, tzinfo=UTC), "Holiday"
+        )
+        window = DeploymentWindow(periods=[freeze, holiday])
+
+        assert window.check(datetime(2024, 12, 24, 12, tzinfo=UTC)) == "Freeze"
+        assert window.check(datetime(2024, 12, 25, 12, tzinfo=UTC)) == "Holiday"
+        assert window.check(datetime(2024, 12, 27, 12, tzinfo=UTC)) == "Freeze"
+
+    def test_adjacent_weekly_rules_keep_their_reasons(self):
+        window = DeploymentWindow(weekly=parse_weekly_rules("fri 16:00-24:00, sat, sun"))
+
+        assert window.check(datetime(2024, 1, 5, 17, tzinfo=UTC)) == (
+            "Deploying during blocked hours (fri 16:00-24:00)"
+        )
+        assert window.check(datetime(2024, 1, 6, 12, tzinfo=UTC)) == (
+            "Deploying during blocked hours (sat)"
+        )
+        assert window.check(datetime(2024, 1, 7, 12, tzinfo=UTC)) == (
+            "Deploying during blocked hours (sun)"
+        )
+
+    def test_check_many(self):
+        times = [datetime(2024, 1, day, 17, tzinfo=UTC) for day in range(1, 8)]
+        results = DEFAULT_DEPLOY_WINDOW.check_many(times)
+        assert [r is not None for r in results] == [
+            False, False, False, False, True, False, False
+        ]
@@ -1,9 +1,25 @@
 import os
+from datetime import datetime, UTC
+
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, call, patch, MagicMock
+
+from src.dependencies import PackageChange, clear_cache
+from src.entrypoint import (
+    config_fingerprint,
+    create_and_display_output,
+    get_changed_files,
+    get_dependency_diffs,
+    main,
+)
+from github import GithubException
 
-from src.entrypoint import main
 from src.certainty_score import CertaintyScore
+from src.churn import DEFAULT_TYPE_WEIGHTS
+from src.config import RiskConfig, compile_rules
+from src.history import HistoryStore
+from src.replay import PRSnapshot, SnapshotFile
+from src.risk import SecretGlobs
 
 
 @pytest.fixture
@@ -17,6 +33,8 @@ def setup_env_vars():
     os.environ["INPUT_BLOCK_ON_FAILURE"] = "true"
     os.environ["INPUT_CHECK_WORK_HOURS"] = "false"
     os.environ["GITHUB_REF"] = "refs/pull/123/merge"
+    os.environ["INPUT_REUSE_RESULTS"] = "false"
+    os.environ["INPUT_CHECK_DEPENDENCIES"] = "false"
 
 
 @patch("src.entrypoint.GitHubGateway")
@@ -26,11 +44,13 @@ def test_main_success(mock_assess_risk, mock_github_gateway, setup_env_vars):
     mock_pr = MagicMock()
     mock_pr.get_files.return_value = ["file1.py", "file2.py"]
     mock_pr.requested_reviewers = ["reviewer1", "reviewer2"]
+    mock_team = MagicMock()
+    mock_team.slug = "platform"
+    mock_pr.requested_teams = [mock_team]
 
     mock_gg_instance = MagicMock()
     mock_gg_instance.get_pr_from_ref.return_value = mock_pr
     mock_gg_instance.create_check_run.return_value = "check_id"
-    mock_gg_instance.get_check_run_certainty_score.return_value = None
 
     mock_github_gateway.return_value = mock_gg_instance
 
@@ -56,11 +76,22 @@ def test_main_success(mock_assess_risk, mock_github_gateway, setup_env_vars):
         reviewers=["reviewer1", "reviewer2"],
         check_work_hours=False,
         max_files=5,
-        secret_globs=[".env", ".pem"],
+        secret_globs=SecretGlobs((".env", ".pem")),
         min_certainty=80,
+        deploy_window=ANY,
+        codeowners=mock_gg_instance.get_codeowners.return_value,
+        reviewer_teams=["test_repo/platform"],
+        max_churn=1000,
+        max_file_churn=500,
+        churn_weights=DEFAULT_TYPE_WEIGHTS,
+        hot_paths=None,
+        dependency_diffs=None,
+    )
+    mock_gg_instance.get_codeowners.assert_called_once_with(
+        "test_repo", mock_pr.base.sha
     )
     mock_gg_instance.update_check_run_with_score.assert_called_once_with(
-        "test_repo", "check_id", mock_certainty_score
+        "test_repo", "check_id", mock_certainty_score, None
     )
 
 
@@ -93,7 +124,7 @@ def test_main_failure(mock_assess_risk, mock_github_gateway, setup_env_vars):
         # Assertions
         mock_exit.assert_called_once_with(1)
         mock_gg_instance.update_check_run_with_score.assert_called_once_with(
-            "test_repo", "check_id", mock_certainty_score
+            "test_repo", "check_id", mock_certainty_score, None
         )
 
 
@@ -160,3 +191,376 @@ def test_main_exception_after_create_check(
 
         mock_exit.assert_called_once_with(1)
         mock_gg_instance.update_check_run_with_score.assert_called()
+        # An error result must never be reused by a later run
+        assert mock_gg_instance.update_check_run_with_score.call_args[1] == {"reusable": False}
+
+
+@patch("src.entrypoint.GitHubGateway")
+@patch("src.entrypoint.assess_risk")
+def test_main_records_snapshot(
+    mock_assess_risk, mock_github_gateway, setup_env_vars, tmp_path, monkeypatch
+):
+    """Test main function appends a snapshot when a record path is given."""
+    record_path = tmp_path / "snapshots.jsonl"
+    monkeypatch.setenv("INPUT_RECORD_PATH", str(record_path))
+    monkeypatch.setenv("INPUT_CHECK_CODEOWNERS", "false")
+
+    mock_file = MagicMock()
+    mock_file.filename = "file1.py"
+    mock_file.additions = 3
+    mock_file.deletions = 1
+    mock_pr = MagicMock()
+    mock_pr.get_files.return_value = [mock_file]
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = [MagicMock(slug="web")]
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    mock_gg_instance.create_check_run.return_value = "check_id"
+    mock_github_gateway.return_value = mock_gg_instance
+
+    mock_assess_risk.return_value = CertaintyScore(90, [], [], "success")
+
+    main()
+
+    snapshot = PRSnapshot.from_json(record_path.read_text().strip())
+    assert snapshot.repo == "test_repo"
+    assert snapshot.sha == "test_sha"
+    assert snapshot.files == ["file1.py"]
+    assert snapshot.additions == [3]
+    assert snapshot.deletions == [1]
+    assert snapshot.reviewers == ["reviewer1"]
+    assert snapshot.reviewer_teams == ["test_repo/web"]
+    assert snapshot.conclusion == "success"
+    # Inputs of rules that were turned off are not recorded
+    assert snapshot.owners is None
+    assert snapshot.hot_paths is None
+    assert snapshot.dependency_diffs is None
+    assert snapshot.blocked_reason is None
+    assert snapshot.risk_config["max_files"] == 5
+    assert snapshot.risk_config["check_work_hours"] is False
+    assert snapshot.fingerprint == RiskConfig.from_env().fingerprint
+
+
+@patch("src.entrypoint.GitHubGateway")
+def test_main_records_history(mock_github_gateway, setup_env_vars, tmp_path, monkeypatch):
+    """Test main function records runs and uses them to flag hot paths."""
+    history_db = str(tmp_path / "history.db")
+    monkeypatch.setenv("INPUT_HISTORY_DB", history_db)
+    monkeypatch.setenv("INPUT_CHECK_CODEOWNERS", "false")
+
+    mock_file = MagicMock()
+    mock_file.filename = "infra/main.tf"
+    mock_file.additions = 1
+    mock_file.deletions = 1
+    mock_pr = MagicMock()
+    mock_pr.get_files.return_value = [mock_file]
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = []
+    mock_pr.title = 'Revert "Move infra"'
+    mock_pr.number = 41
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    mock_gg_instance.create_check_run.return_value = "check_id"
+    mock_github_gateway.return_value = mock_gg_instance
+
+    main()
+    first = mock_gg_instance.update_check_run_with_score.call_args[0][2]
+    assert first.score == 100
+
+    # The revert's own next push is not flagged by its own earlier run
+    main()
+    again = mock_gg_instance.update_check_run_with_score.call_args[0][2]
+    assert again.rule_hits == {}
+
+    mock_pr.title = "Change infra again"
+    mock_pr.number = 42
+    main()
+    second = mock_gg_instance.update_check_run_with_score.call_args[0][2]
+    assert second.rule_hits == {"hot_path": ["infra/main.tf"]}
+
+    with HistoryStore(history_db) as history:
+        assert history.path_stats("test_repo", "infra/").runs == 3
+
+
+@patch("src.entrypoint.iter_changed_files")
+def test_get_changed_files_from_git(mock_iter_changed_files):
+    """Test changed files are read from the local checkout when asked to."""
+    mock_pr = MagicMock()
+    mock_iter_changed_files.return_value = iter(["file1.py"])
+
+    assert get_changed_files(mock_pr, "git", "/workspace") == ["file1.py"]
+    mock_iter_changed_files.assert_called_once_with(
+        "/workspace", mock_pr.base.sha, mock_pr.head.sha
+    )
+    mock_pr.get_files.assert_not_called()
+
+
+def test_get_changed_files_falls_back_to_api(tmp_path, caplog):
+    """Test the API is used when the local diff cannot be read."""
+    mock_pr = MagicMock()
+    mock_pr.base.sha = "base"
+    mock_pr.head.sha = "head"
+    mock_pr.get_files.return_value = ["file1.py"]
+
+    assert get_changed_files(mock_pr, "git", str(tmp_path)) == ["file1.py"]
+    assert "using the API instead" in caplog.text
+
+
+def test_create_and_display_output(tmp_path, monkeypatch, capsys):
+    """Test outputs are appended to the GITHUB_OUTPUT and GITHUB_STEP_SUMMARY files."""
+    output_path = tmp_path / "output"
+    summary_path = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output_path))
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary_path))
+    certainty_score = CertaintyScore(85, ["Reason 1"], ["file1.py"], "success")
+
+    create_and_display_output(certainty_score, step_summary=True)
+
+    output = output_path.read_text()
+    assert "certainty_score<<ghadelimiter_" in output
+    assert "\n85\n" in output
+    assert "\nsuccess\n" in output
+    assert f"\n{certainty_score.to_json()}\n" in output
+    assert "## Certainty Score: 85/100 (SUCCESS)" in summary_path.read_text()
+    assert certainty_score.to_json() in capsys.readouterr().out
+
+
+@patch("src.entrypoint.GitHubGateway")
+@patch("src.entrypoint.assess_risk")
+def test_main_reuses_existing_result(
+    mock_assess_risk, mock_github_gateway, setup_env_vars, monkeypatch
+):
+    """Test main function reuses the score of a run for the same commit and config."""
+    monkeypatch.setenv("INPUT_REUSE_RESULTS", "true")
+    mock_pr = MagicMock()
+    mock_pr.requested_reviewers = []
+    mock_pr.requested_teams = []
+    mock_pr.base.sha = "base_sha"
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    existing_score = CertaintyScore(90, [], [], "success")
+    mock_gg_instance.claim_check_run.return_value = (None, existing_score)
+    mock_github_gateway.return_value = mock_gg_instance
+
+    with patch("src.entrypoint.create_and_display_output") as mock_output:
+        main()
+
+    fingerprint = config_fingerprint(mock_pr, compile_rules(RiskConfig.from_env()))
+    mock_gg_instance.claim_check_run.assert_called_once_with("test_repo", "test_sha", fingerprint)
+    mock_pr.get_files.assert_not_called()
+    mock_assess_risk.assert_not_called()
+    mock_gg_instance.create_check_run.assert_not_called()
+    mock_gg_instance.update_check_run_with_score.assert_not_called()
+    mock_output.assert_called_once_with(existing_score, True, None)
+
+
+@patch("src.entrypoint.GitHubGateway")
+@patch("src.entrypoint.assess_risk")
+def test_main_scores_claimed_check_run(
+    mock_assess_risk, mock_github_gateway, setup_env_vars, monkeypatch
+):
+    """Test main function scores and completes the check run it claimed."""
+    monkeypatch.setenv("INPUT_REUSE_RESULTS", "true")
+    mock_pr = MagicMock()
+    mock_pr.get_files.return_value = []
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = []
+    mock_pr.base.sha = "base_sha"
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    mock_gg_instance.claim_check_run.return_value = ("claimed_id", None)
+    mock_github_gateway.return_value = mock_gg_instance
+    mock_assess_risk.return_value = CertaintyScore(90, [], [], "success")
+
+    main()
+
+    mock_gg_instance.create_check_run.assert_not_called()
+    mock_gg_instance.update_check_run_with_score.assert_called_once_with(
+        "test_repo", "claimed_id", mock_assess_risk.return_value, None
+    )
+
+
+def test_config_fingerprint(setup_env_vars, monkeypatch):
+    """Test the fingerprint changes with the inputs and reviewers but not the token."""
+    mock_pr = MagicMock()
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = []
+    mock_pr.base.sha = "base_sha"
+    rules = compile_rules(RiskConfig.from_env())
+
+    fingerprint = config_fingerprint(mock_pr, rules)
+    monkeypatch.setenv("INPUT_GITHUB_TOKEN", "other_token")
+    assert config_fingerprint(mock_pr, rules) == fingerprint
+
+    monkeypatch.setenv("INPUT_MAX_FILE_COUNT", "50")
+    changed_inputs = config_fingerprint(mock_pr, rules)
+    assert changed_inputs != fingerprint
+
+    mock_pr.requested_reviewers = ["reviewer1", "reviewer2"]
+    changed_reviewers = config_fingerprint(mock_pr, rules)
+    assert changed_reviewers != changed_inputs
+
+    mock_pr.base.sha = "new_base_sha"
+    assert config_fingerprint(mock_pr, rules) != changed_reviewers
+
+
+def test_config_fingerprint_deploy_window(setup_env_vars):
+    """Test the fingerprint changes when the deploy window starts blocking."""
+    mock_pr = MagicMock()
+    mock_pr.requested_reviewers = []
+    mock_pr.requested_teams = []
+    mock_pr.base.sha = "base_sha"
+    rules = compile_rules(RiskConfig(check_work_hours=True))
+    before = datetime(2024, 1, 5, 15, 50, tzinfo=UTC)  # Friday, before 16:00
+    after = datetime(2024, 1, 5, 16, 5, tzinfo=UTC)
+    later = datetime(2024, 1, 5, 16, 30, tzinfo=UTC)
+
+    assert config_fingerprint(mock_pr, rules, before) != config_fingerprint(
+        mock_pr, rules, after
+    )
+    assert config_fingerprint(mock_pr, rules, after) == config_fingerprint(
+        mock_pr, rules, later
+    )
+
+    # Without work hours checks the time does not matter
+    rules = compile_rules(RiskConfig(check_work_hours=False))
+    assert config_fingerprint(mock_pr, rules, before) == config_fingerprint(
+        mock_pr, rules, after
+    )
+
+
+@patch("src.entrypoint.GitHubGateway")
+def test_main_scores_partitions(mock_github_gateway, setup_env_vars, monkeypatch, tmp_path):
+    """Test main function scores each project and publishes a check run for each."""
+    monkeypatch.setenv("INPUT_PROJECT_ROOTS", "services/*")
+    monkeypatch.setenv("INPUT_PARTITION_CHECK_RUNS", "true")
+    monkeypatch.setenv("GITHUB_OUTPUT", str(tmp_path / "output"))
+    mock_pr = MagicMock()
+    mock_pr.get_files.return_value = [
+        SnapshotFile("services/api/app.py"),
+        SnapshotFile("services/web/.env"),
+    ]
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = []
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    mock_gg_instance.get_codeowners.return_value = None
+    mock_gg_instance.create_check_run.side_effect = ["check_id", "api_id", "web_id"]
+    mock_github_gateway.return_value = mock_gg_instance
+
+    with pytest.raises(SystemExit):
+        main()
+
+    assert mock_gg_instance.create_check_run.call_args_list[1:] == [
+        call("test_repo", "test_sha", name="Certainty Score (services/api)"),
+        call("test_repo", "test_sha", name="Certainty Score (services/web)"),
+    ]
+    updates = {
+        c[0][1]: c[0][2] for c in mock_gg_instance.update_check_run_with_score.call_args_list
+    }
+    assert updates["api_id"].conclusion == "success"
+    assert updates["web_id"].conclusion == "failure"
+    assert updates["check_id"].reasons == ["services/web: Suspicious file(s)"]
+    assert '"services/web": {"score": 70, "conclusion": "failure"}' in (
+        tmp_path / "output"
+    ).read_text()
+
+
+@patch("src.entrypoint.GitHubGateway")
+@patch("src.entrypoint.assess_risk")
+def test_main_profile(mock_assess_risk, mock_github_gateway, setup_env_vars, monkeypatch, tmp_path):
+    """Test main function writes a profile and adds its headline to the check run."""
+    monkeypatch.setenv("INPUT_PROFILE", "true")
+    monkeypatch.setenv("INPUT_PROFILE_DIR", str(tmp_path / "profile"))
+    mock_pr = MagicMock()
+    mock_pr.get_files.return_value = []
+    mock_pr.requested_reviewers = ["reviewer1"]
+    mock_pr.requested_teams = []
+
+    mock_gg_instance = MagicMock()
+    mock_gg_instance.get_pr_from_ref.return_value = mock_pr
+    mock_gg_instance.create_check_run.return_value = "check_id"
+    mock_github_gateway.return_value = mock_gg_instance
+    mock_assess_risk.return_value = CertaintyScore(90, ["All good"], [], "success")
+
+    main()
+
+    details_text = mock_gg_instance.update_check_run_with_score.call_args[0][3]
+    assert details_text.startswith("## Certainty Score: 90/100 (SUCCESS)")
+    assert "### Profile" in details_text
+    assert sorted(os.listdir(tmp_path / "profile")) == [
+        "allocations.txt",
+        "profile.collapsed",
+        "profile.prof",
+    ]
+
+
+@patch("src.entrypoint.RunProfile")
+@patch("src.entrypoint.run")
+def test_main_without_profile(mock_run, mock_run_profile, setup_env_vars, monkeypatch):
+    """Test main function does no profiling work unless asked to."""
+    monkeypatch.delenv("INPUT_PROFILE", raising=False)
+
+    main()
+
+    mock_run.assert_called_once_with()
+    mock_run_profile.assert_not_called()
+
+
+@patch("src.entrypoint.run", side_effect=SystemExit(1))
+def test_main_profile_written_on_exit(mock_run, setup_env_vars, monkeypatch, tmp_path):
+    """Test the profile is still written when the run exits with a failure."""
+    monkeypatch.setenv("INPUT_PROFILE", "true")
+    monkeypatch.setenv("INPUT_PROFILE_DIR", str(tmp_path))
+
+    with pytest.raises(SystemExit):
+        main()
+
+    assert (tmp_path / "profile.prof").exists()
+
+
+def test_get_dependency_diffs_from_api():
+    """Test manifests are diffed against the merge base through the API."""
+    clear_cache()
+    blobs = {"old_lock": "django==3.2\n", "new_lock": "django==4.2\n"}
+    gg = MagicMock()
+    gg.get_merge_base.return_value = "merge_base"
+    gg.get_blob_sha.return_value = "old_lock"
+    gg.iter_blob_lines.side_effect = lambda repo, sha: iter(blobs[sha].splitlines(True))
+    pr = MagicMock()
+    manifest = MagicMock(
+        filename="requirements.txt", previous_filename=None, status="modified", sha="new_lock"
+    )
+    other = MagicMock(filename="app.py")
+
+    diffs = get_dependency_diffs(gg, "test_repo", pr, [other, manifest], ".")
+
+    gg.get_merge_base.assert_called_once_with("test_repo", pr.base.sha, pr.head.sha)
+    gg.get_blob_sha.assert_called_once_with("test_repo", "requirements.txt", "merge_base")
+    assert len(diffs) == 1
+    assert diffs[0].path == "requirements.txt"
+    assert diffs[0].changes == [PackageChange("django", "3.2", "4.2")]
+
+
+def test_get_dependency_diffs_failure():
+    """Test a failure to read the manifests is treated as no dependency changes."""
+    gg = MagicMock()
+    gg.get_merge_base.side_effect = GithubException(500, "Server Error")
+    manifest = MagicMock(filename="poetry.lock")
+
+    assert get_dependency_diffs(gg, "test_repo", MagicMock(), [manifest], ".") == []
+
+
+def test_get_dependency_diffs_no_manifests():
+    """Test the API is not called when no manifest changed."""
+    gg = MagicMock()
+
+    changed_files = [MagicMock(filename="a.py")]
+
+    assert get_dependency_diffs(gg, "test_repo", MagicMock(), changed_files, ".") == []
+    gg.get_merge_base.assert_not_called()
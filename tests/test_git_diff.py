@@ -0,0 +1,109 @@
+import io
+import shutil
+import subprocess
+
+import pytest
+
+from src.git_diff import (
+    LocalFile,
+    blob_sha,
+    iter_blob_lines,
+    iter_changed_files,
+    merge_base,
+    parse_numstat,
+)
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def fixture_repo(tmp_path):
+    """A repo with a 'main' base commit and a 'feature' branch that changes it."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "user.email", "test@example.com")
+    git(repo, "config", "user.name", "Test")
+
+    (repo / "app.py").write_text("a\nb\nc\n")
+    (repo / "old_name.py").write_text("".join(f"line {i}\n" for i in range(20)))
+    (repo / "removed.txt").write_text("x\ny\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "base")
+
+    git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "app.py").write_text("a\nB\nc\nd\n")
+    git(repo, "mv", "old_name.py", "new name.py")
+    (repo / "removed.txt").unlink()
+    (repo / "config").mkdir()
+    (repo / "config" / ".env").write_text("API_KEY=secret\n")
+    (repo / "logo.bin").write_bytes(b"\0\1\2\3")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "feature")
+
+    # A later commit on main must not show up in the PR diff
+    git(repo, "checkout", "-q", "main")
+    (repo / "main_only.py").write_text("x\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "main moves on")
+    git(repo, "checkout", "-q", "feature")
+    return repo
+
+
+def test_iter_changed_files(fixture_repo):
+    files = {f.filename: f for f in iter_changed_files(str(fixture_repo), "main", "feature")}
+
+    assert set(files) == {"app.py", "new name.py", "removed.txt", "config/.env", "logo.bin"}
+    assert files["app.py"].additions == 2
+    assert files["app.py"].deletions == 1
+    assert files["app.py"].changes == 3
+    assert files["new name.py"].previous_filename == "old_name.py"
+    assert files["new name.py"].changes == 0
+    assert files["removed.txt"].deletions == 2
+    assert files["logo.bin"].changes == 0
+
+
+def test_iter_changed_files_bad_ref(fixture_repo):
+    with pytest.raises(subprocess.CalledProcessError):
+        list(iter_changed_files(str(fixture_repo), "no-such-branch", "feature"))
+
+
+def test_parse_numstat_across_reads(monkeypatch):
+    monkeypatch.setattr("src.git_diff._READ_SIZE", 3)
+    stream = io.BytesIO(b"1\t2\tsrc/a.py\x00-\t-\timg.png\x000\t0\t\x00old.py\x00new.py\x00")
+    assert list(parse_numstat(stream)) == [
+        LocalFile("src/a.py", 1, 2),
+        LocalFile("img.png", 0, 0),
+        LocalFile("new.py", 0, 0, "old.py"),
+    ]
+
+
+def test_merge_base(fixture_repo):
+    base = merge_base(str(fixture_repo), "main", "feature")
+
+    assert base == git(fixture_repo, "rev-parse", "feature~1")
+
+
+def test_blob_sha(fixture_repo):
+    repo = str(fixture_repo)
+
+    assert blob_sha(repo, "feature", "app.py") == git(fixture_repo, "rev-parse", "feature:app.py")
+    assert blob_sha(repo, "feature", "removed.txt") is None
+    assert blob_sha(repo, "no-such-branch", "app.py") is None
+
+
+def test_iter_blob_lines(fixture_repo):
+    sha = blob_sha(str(fixture_repo), "feature", "app.py")
+
+    assert list(iter_blob_lines(str(fixture_repo), sha)) == ["a\n", "B\n", "c\n", "d\n"]
+
+
+def test_iter_blob_lines_missing(fixture_repo):
+    with pytest.raises(subprocess.CalledProcessError):
+        list(iter_blob_lines(str(fixture_repo), "0" * 40))
@@ -1,11 +1,25 @@
+import json
 import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
 
 import pytest
 from unittest.mock import Mock, patch
 
 from github import GithubException
 
-from src.github_gateway import GitHubGateway, get_github_gateway
+from src.certainty_score import CertaintyScore
+from src.github_gateway import (
+    CHECK_RUN_NAME,
+    ERROR_EXTERNAL_ID,
+    GitHubGateway,
+    TransportConfig,
+    get_github_gateway,
+)
 
 
 class TestGitHubGateway:
@@ -130,6 +144,32 @@ class TestGitHubGateway:
         with pytest.raises(ValueError, match="is not a pull request"):
             github_gateway.get_pr_from_ref("owner/repo", "refs/heads/main")
 
+    def test_get_codeowners(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        contents = Mock()
+        contents.sha = "blob_sha"
+        contents.decoded_content = b"* @owner\n"
+        mock_repo.get_contents.side_effect = [
+            GithubException(404, "Not found"),
+            contents,
+        ]
+
+        with patch("src.github_gateway.get_codeowners") as mock_get_codeowners:
+            result = github_gateway.get_codeowners("owner/repo", "base_sha")
+
+        mock_repo.get_contents.assert_any_call(".github/CODEOWNERS", ref="base_sha")
+        mock_repo.get_contents.assert_called_with("CODEOWNERS", ref="base_sha")
+        assert mock_get_codeowners.call_args[0][:2] == ("owner/repo", "blob_sha")
+        assert mock_get_codeowners.call_args[0][2]() == "* @owner\n"
+        assert result == mock_get_codeowners.return_value
+
+    def test_get_codeowners_missing(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.get_contents.side_effect = GithubException(404, "Not found")
+
+        assert github_gateway.get_codeowners("owner/repo", "base_sha") is None
+        assert mock_repo.get_contents.call_count == 3
+
     def test_create_check_run(self, github_gateway, mock_repo):
         github_gateway.get_repo = Mock(return_value=mock_repo)
         mock_check_run = Mock()
@@ -148,6 +188,76 @@ class TestGitHubGateway:
         assert mock_repo.create_check_run.call_args[1]["name"] == "Certainty Score"
         assert result == 12345
 
+    def test_get_merge_base(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.compare.return_value.merge_base_commit.sha = "base_sha"
+
+        assert github_gateway.get_merge_base("owner/repo", "main", "head") == "base_sha"
+        mock_repo.compare.assert_called_once_with("main", "head")
+
+    def test_get_blob_sha(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.get_contents.return_value = [
+            SimpleNamespace(name="poetry.lock", type="dir", sha="tree_sha"),
+            SimpleNamespace(name="poetry.lock", type="file", sha="blob_sha"),
+        ]
+
+        assert github_gateway.get_blob_sha("owner/repo", "app/poetry.lock", "ref") == "blob_sha"
+        # The directory is listed, so the file's content is not downloaded
+        mock_repo.get_contents.assert_called_once_with("app", ref="ref")
+
+    def test_get_blob_sha_not_in_directory(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.get_contents.return_value = [
+            SimpleNamespace(name="setup.py", type="file", sha="blob_sha")
+        ]
+
+        assert github_gateway.get_blob_sha("owner/repo", "poetry.lock", "ref") is None
+        mock_repo.get_contents.assert_called_once_with("", ref="ref")
+
+    def test_get_blob_sha_missing(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.get_contents.side_effect = GithubException(404, "Not Found")
+
+        assert github_gateway.get_blob_sha("owner/repo", "poetry.lock", "ref") is None
+
+    def test_iter_blob_lines(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_repo.get_git_blob.return_value.content = "ZGphbmdvPT00LjIKc2l4PT0x\nLjE2LjAK\n"
+
+        lines = list(github_gateway.iter_blob_lines("owner/repo", "blob_sha"))
+
+        assert lines == ["django==4.2\n", "six==1.16.0\n"]
+        mock_repo.get_git_blob.assert_called_once_with("blob_sha")
+
+    def test_rate_limit(self, github_gateway):
+        reset = int(datetime.now(UTC).timestamp()) + 600
+        github_gateway.client = Mock(rate_limiting=(4200, 5000), rate_limiting_resettime=reset)
+
+        assert github_gateway.rate_limit() == (4200, 5000, float(reset))
+        github_gateway.client.get_rate_limit.assert_not_called()
+
+    def test_rate_limit_refreshes_after_reset(self, github_gateway):
+        github_gateway.client = Mock(rate_limiting=(0, 5000), rate_limiting_resettime=1700000000)
+
+        def get_rate_limit():
+            github_gateway.client.rate_limiting = (5000, 5000)
+            github_gateway.client.rate_limiting_resettime = 1700003600
+
+        github_gateway.client.get_rate_limit.side_effect = get_rate_limit
+
+        assert github_gateway.rate_limit() == (5000, 5000, 1700003600.0)
+
+    def test_create_check_run_with_name(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+
+        github_gateway.create_check_run(
+            "owner/repo", "sha123", external_id="abc", name="Certainty Score (api)"
+        )
+
+        assert mock_repo.create_check_run.call_args[1]["name"] == "Certainty Score (api)"
+        assert mock_repo.create_check_run.call_args[1]["external_id"] == "abc"
+
     def test_create_check_run_invalid_sha(self, github_gateway):
         with pytest.raises(ValueError, match="Commit SHA is required"):
             github_gateway.create_check_run("owner/repo", "")
@@ -174,6 +284,22 @@ class TestGitHubGateway:
             == test_score.to_json()
         )
 
+    def test_update_check_run_batches_annotations(self, github_gateway, mock_repo):
+        github_gateway.get_repo = Mock(return_value=mock_repo)
+        mock_check_run = Mock()
+        mock_repo.get_check_run.return_value = mock_check_run
+        files = [f"config/{i}.env" for i in range(120)]
+        score = CertaintyScore(0, ["Suspicious file(s)"], files, "failure")
+
+        github_gateway.update_check_run_with_score("owner/repo", 12345, score)
+
+        calls = mock_check_run.edit.call_args_list
+        assert len(calls) == 3
+        assert calls[0][1]["status"] == "completed"
+        assert [len(c[1]["output"]["annotations"]) for c in calls] == [50, 50, 20]
+        assert "status" not in calls[1][1]
+        assert CertaintyScore.from_json(calls[2][1]["output"]["summary"]) == score
+
     def test_update_check_run_invalid_id(self, github_gateway, test_score):
         with pytest.raises(ValueError, match="Check run ID is required"):
             github_gateway.update_check_run_with_score(
@@ -181,6 +307,323 @@ class TestGitHubGateway:
             )
 
 
+class FakeCheckRun:
+    def __init__(self, check_id, name, external_id, started_at):
+        self.id = check_id
+        self.name = name
+        self.external_id = external_id
+        self.status = "in_progress"
+        self.started_at = started_at
+        self.completed_at = None
+        self.output = SimpleNamespace(summary=None)
+
+    def edit(
+        self, status=None, conclusion=None, completed_at=None, output=None, external_id=None
+    ):
+        if external_id:
+            self.external_id = external_id
+        if status:
+            self.status = status
+            self.completed_at = completed_at
+        if output:
+            self.output = SimpleNamespace(summary=output["summary"])
+
+
+class FakeRepo:
+    """Just enough of the check runs API to race runs against each other."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.check_runs = {}
+
+    def create_check_run(self, name, head_sha, status, started_at, external_id=None):
+        with self.lock:
+            check_run = FakeCheckRun(len(self.check_runs) + 1, name, external_id, started_at)
+            self.check_runs[check_run.id] = check_run
+            return check_run
+
+    def get_check_run(self, check_id):
+        return self.check_runs[check_id]
+
+    def get_commit(self, sha):
+        def get_check_runs(check_name, filter="latest"):
+            with self.lock:
+                runs = [c for c in self.check_runs.values() if c.name == check_name]
+            # Like the API, only the most recent run is listed unless all are asked for
+            return runs if filter == "all" else runs[-1:]
+
+        return SimpleNamespace(get_check_runs=get_check_runs)
+
+
+class TestClaimCheckRun:
+
+    @pytest.fixture
+    def repo(self, github_gateway):
+        repo = FakeRepo()
+        github_gateway.get_repo = Mock(return_value=repo)
+        return repo
+
+    def completed_run(self, repo, score, fingerprint="abc", age=timedelta(0)):
+        check_run = repo.create_check_run(
+            CHECK_RUN_NAME, "sha", "in_progress", datetime.now(UTC), fingerprint
+        )
+        check_run.edit(
+            status="completed",
+            completed_at=datetime.now(UTC) - age,
+            output={"summary": score.to_json()},
+        )
+        return check_run
+
+    def test_claims_when_no_run_exists(self, github_gateway, repo):
+        check_id, score = github_gateway.claim_check_run("owner/repo", "sha", "abc")
+
+        assert score is None
+        assert repo.check_runs[check_id].external_id == "abc"
+
+    def test_reuses_completed_run(self, github_gateway, repo, test_score):
+        self.completed_run(repo, test_score)
+
+        check_id, score = github_gateway.claim_check_run("owner/repo", "sha", "abc")
+
+        assert check_id is None
+        assert score == test_score
+        assert len(repo.check_runs) == 1
+
+    def test_finds_runs_behind_later_ones(self, github_gateway, repo, test_score):
+        self.completed_run(repo, test_score)
+        # A later run with another config is the only one the API lists by default
+        self.completed_run(repo, test_score, fingerprint="other")
+
+        check_id, score = github_gateway.claim_check_run("owner/repo", "sha", "abc")
+
+        assert check_id is None
+        assert score == test_score
+
+    def test_ignores_other_fingerprints_and_old_runs(
+        self, github_gateway, repo, test_score
+    ):
+        self.completed_run(repo, test_score, fingerprint="other")
+        self.completed_run(repo, test_score, age=timedelta(hours=2))
+
+        check_id, score = github_gateway.claim_check_run("owner/repo", "sha", "abc")
+
+        assert check_id == 3
+        assert score is None
+
+    def test_waits_for_run_in_progress(self, github_gateway, repo, test_score):
+        running = repo.create_check_run(
+            CHECK_RUN_NAME, "sha", "in_progress", datetime.now(UTC), "abc"
+        )
+
+        def sleep(seconds):
+            running.edit(
+                status="completed",
+                completed_at=datetime.now(UTC),
+                output={"summary": test_score.to_json()},
+            )
+
+        check_id, score = github_gateway.claim_check_run(
+            "owner/repo", "sha", "abc", sleep=sleep
+        )
+
+        assert check_id is None
+        assert score == test_score
+        assert len(repo.check_runs) == 1
+
+    def test_scores_after_waiting_too_long(self, github_gateway, repo):
+        repo.create_check_run(CHECK_RUN_NAME, "sha", "in_progress", datetime.now(UTC), "abc")
+        sleep = Mock()
+
+        check_id, score = github_gateway.claim_check_run(
+            "owner/repo", "sha", "abc", max_polls=3, sleep=sleep
+        )
+
+        assert check_id == 2
+        assert score is None
+        assert sleep.call_count == 3
+
+    def test_does_not_reuse_errored_run(self, github_gateway, repo):
+        errored = repo.create_check_run(
+            CHECK_RUN_NAME, "sha", "in_progress", datetime.now(UTC), "abc"
+        )
+        github_gateway.update_check_run_with_score(
+            "owner/repo",
+            errored.id,
+            CertaintyScore(0, ["Unknown error"], [], "failure"),
+            reusable=False,
+        )
+
+        check_id, score = github_gateway.claim_check_run("owner/repo", "sha", "abc")
+
+        assert errored.external_id == ERROR_EXTERNAL_ID
+        assert check_id == 2
+        assert score is None
+
+    def test_scores_when_awaited_run_errors(self, github_gateway, repo):
+        running = repo.create_check_run(
+            CHECK_RUN_NAME, "sha", "in_progress", datetime.now(UTC), "abc"
+        )
+
+        def sleep(seconds):
+            github_gateway.update_check_run_with_score(
+                "owner/repo",
+                running.id,
+                CertaintyScore(0, ["Unknown error"], [], "failure"),
+                reusable=False,
+            )
+
+        check_id, score = github_gateway.claim_check_run(
+            "owner/repo", "sha", "abc", sleep=sleep
+        )
+
+        assert check_id == 2
+        assert score is None
+
+    def test_concurrent_runs_score_once(self, github_gateway, repo, test_score):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        computed = []
+        results = []
+
+        def run():
+            barrier.wait()
+            check_id, score = github_gateway.claim_check_run(
+                "owner/repo", "sha", "abc", poll_interval=0.01, max_polls=500
+            )
+            if check_id:
+                computed.append(check_id)
+                score = test_score
+                github_gateway.update_check_run_with_score("owner/repo", check_id, score)
+            results.append(score)
+
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(computed) == 1
+        assert results == [test_score] * workers
+        assert all(c.status == "completed" for c in repo.check_runs.values())
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so connections are kept alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        owner, name = self.path.strip("/").split("/")[1:3]
+        body = json.dumps(
+            {"id": 1, "name": name, "full_name": f"{owner}/{name}", "url": self.path}
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_github():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def local_gateway(server, pool_size=10):
+    transport = TransportConfig(
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        timeout=5,
+        retries=0,
+        pool_size=pool_size,
+        seconds_between_requests=None,
+    )
+    return GitHubGateway("fake_token", transport)
+
+
+class TestTransport:
+
+    def test_from_env(self):
+        env = {
+            "GITHUB_API_URL": "https://github.example.com/api/v3",
+            "INPUT_API_TIMEOUT": "30",
+            "INPUT_API_RETRIES": "2",
+            "INPUT_API_POOL_SIZE": "4",
+        }
+        with patch.dict(os.environ, env, clear=True):
+            transport = TransportConfig.from_env()
+
+        assert transport == TransportConfig(
+            "https://github.example.com/api/v3", timeout=30, retries=2, pool_size=4
+        )
+
+    def test_from_env_defaults(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert TransportConfig.from_env() == TransportConfig()
+
+    @pytest.mark.parametrize(
+        "kwargs, message",
+        [
+            ({"timeout": 0}, "Timeout must be positive"),
+            ({"retries": -1}, "Retries must not be negative"),
+            ({"pool_size": 0}, "Pool size must be at least 1"),
+        ],
+    )
+    def test_invalid(self, kwargs, message):
+        with pytest.raises(ValueError, match=message):
+            TransportConfig(**kwargs)
+
+    def test_client_uses_transport(self, mock_github):
+        transport = TransportConfig("https://github.example.com/api/v3/", 30, 2, 4, None)
+
+        GitHubGateway("token", transport)
+
+        kwargs = mock_github.call_args[1]
+        assert kwargs["base_url"] == "https://github.example.com/api/v3"
+        assert kwargs["timeout"] == 30
+        assert kwargs["retry"].total == 2
+        assert kwargs["pool_size"] == 4
+        assert kwargs["seconds_between_requests"] is None
+
+    def test_sequential_requests_reuse_one_connection(self, fake_github):
+        gateway = local_gateway(fake_github)
+
+        for i in range(20):
+            assert gateway.get_repo(f"owner/repo{i}").full_name == f"owner/repo{i}"
+
+        assert fake_github.requests == 20
+        assert fake_github.connections == 1
+
+    def test_concurrent_requests_share_the_pool(self, fake_github):
+        gateway = local_gateway(fake_github, pool_size=4)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            repos = executor.map(lambda i: gateway.get_repo(f"owner/repo{i}"), range(100))
+            names = [repo.name for repo in repos]
+
+        assert names == [f"repo{i}" for i in range(100)]
+        assert fake_github.requests == 100
+        assert fake_github.connections <= 4
+
+
 def test_get_github_gateway():
     with patch.dict(os.environ, {"INPUT_GITHUB_TOKEN": "test_token"}):
         with patch("src.github_gateway.GitHubGateway") as mock_gateway_class:
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta, UTC
+
+import sqlite3
+
+import pytest
+
+from src.certainty_score import CertaintyScore
+from src.history import HistoryStore
+
+NOW = datetime(2024, 6, 1, 12, tzinfo=UTC)
+
+
+@pytest.fixture
+def history():
+    with HistoryStore(":memory:") as store:
+        yield store
+
+
+def record(history, files, conclusion="success", rule_hits=None, days_ago=0, **kwargs):
+    score = CertaintyScore(
+        100 if conclusion == "success" else 40, [], [], conclusion, rule_hits or {}
+    )
+    return history.record_run(
+        "owner/repo",
+        "sha",
+        score,
+        files,
+        created_at=NOW - timedelta(days=days_ago),
+        **kwargs,
+    )
+
+
+def test_record_run(history):
+    run_id = record(history, ["a.py"], duration_ms=12.5)
+    assert run_id == 1
+    assert history.recent_runs("owner/repo")[0].score == 100
+    assert history.recent_runs("other/repo") == []
+
+
+def test_path_stats(history):
+    record(history, ["infra/main.tf", "infra/vars.tf", "app.py"])
+    record(
+        history,
+        ["infra/prod/db.tf", "secrets/.env"],
+        conclusion="failure",
+        rule_hits={"secret_file": ["secrets/.env"], "churn": ["infra/prod/db.tf"]},
+        reverted=True,
+    )
+    record(history, ["infrastructure.md"])
+    record(history, ["infra/old.tf"], days_ago=200)
+
+    stats = history.path_stats("owner/repo", "infra/", since=NOW - timedelta(days=90))
+    assert stats.runs == 2
+    assert stats.reverted_runs == 1
+    assert stats.changes == 3
+    assert stats.rule_hits == {"churn": 1}
+
+    assert history.path_stats("owner/repo").runs == 4
+    assert history.path_stats("owner/repo", until=NOW - timedelta(days=1)).runs == 1
+    assert history.path_stats("other/repo").runs == 0
+
+
+def test_hot_paths(history):
+    record(history, ["a.py", "b.py"], reverted=True)
+    record(history, ["c.py"], conclusion="failure", reverted=True)
+    record(history, ["d.py"])
+    record(history, ["e.py"], reverted=True, days_ago=100)
+
+    assert history.hot_paths(
+        "owner/repo",
+        ["a.py", "c.py", "d.py", "e.py", "f.py"],
+        since=NOW - timedelta(days=30),
+    ) == {"a.py", "c.py"}
+    assert history.hot_paths("owner/repo", ["e.py"]) == {"e.py"}
+    assert history.hot_paths("other/repo", ["a.py"]) == set()
+
+
+def test_hot_paths_ignore_failed_conclusions(history):
+    # A PR that failed, even because of hot paths, does not make its files hot
+    record(history, ["a.py"], conclusion="failure")
+    record(history, ["b.py"], conclusion="failure", rule_hits={"hot_path": ["b.py"]})
+
+    assert history.hot_paths("owner/repo", ["a.py", "b.py"]) == set()
+
+
+def test_hot_paths_many(history):
+    files = [f"src/file{i}.py" for i in range(1200)]
+    record(history, files[::2], reverted=True)
+    assert history.hot_paths("owner/repo", files) == set(files[::2])
+
+
+def test_persists_between_connections(tmp_path):
+    path = str(tmp_path / "history.db")
+    with HistoryStore(path) as history:
+        record(history, ["a.py"], reverted=True)
+    with HistoryStore(path) as history:
+        assert history.hot_paths("owner/repo", ["a.py"]) == {"a.py"}
+
+
+def test_hot_paths_excludes_own_pull_request(history):
+    record(history, ["a.py", "b.py"], reverted=True, pull_request=7)
+    record(history, ["b.py"], reverted=True, pull_request=8)
+    record(history, ["c.py"], reverted=True)
+
+    assert history.hot_paths(
+        "owner/repo", ["a.py", "b.py", "c.py"], exclude_pull_request=7
+    ) == {"b.py", "c.py"}
+    assert history.hot_paths("owner/repo", ["a.py"]) == {"a.py"}
+
+
+def test_upgrades_store_without_pull_request(tmp_path):
+    path = str(tmp_path / "history.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE runs (
+            id INTEGER PRIMARY KEY, repo TEXT NOT NULL, sha TEXT NOT NULL,
+            created_at REAL NOT NULL, score INTEGER NOT NULL, conclusion TEXT NOT NULL,
+            reverted INTEGER NOT NULL, duration_ms REAL, result TEXT NOT NULL
+        );
+        CREATE TABLE file_hits (
+            run_id INTEGER NOT NULL, repo TEXT NOT NULL, path TEXT NOT NULL,
+            rule TEXT NOT NULL, created_at REAL NOT NULL, failed INTEGER NOT NULL
+        );
+        INSERT INTO file_hits VALUES (1, 'owner/repo', 'a.py', '', 0, 1);
+        """
+    )
+    connection.close()
+
+    with HistoryStore(path) as history:
+        record(history, ["b.py"], reverted=True, pull_request=7)
+        assert history.hot_paths(
+            "owner/repo", ["a.py", "b.py"], exclude_pull_request=7
+        ) == {"a.py"}
+
+
+def test_upgrade_forgets_failed_conclusions(tmp_path):
+    path = str(tmp_path / "history.db")
+    with HistoryStore(path) as history:
+        record(history, ["a.py"], conclusion="failure")
+        record(history, ["b.py"], reverted=True)
+        # Mark both the way stores did before only reverts counted
+        history.connection.execute("UPDATE file_hits SET failed = 1")
+        history.connection.execute("PRAGMA user_version = 0")
+        history.connection.commit()
+
+    with HistoryStore(path) as history:
+        assert history.hot_paths("owner/repo", ["a.py", "b.py"]) == {"b.py"}
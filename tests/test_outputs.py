@@ -0,0 +1,58 @@
+import re
+
+from src.outputs import format_outputs, write_outputs, write_step_summary
+
+
+def parse_outputs(content):
+    """Parse a GITHUB_OUTPUT file the way the runner does."""
+    outputs = {}
+    lines = iter(content.splitlines())
+    for line in lines:
+        name, delimiter = line.split("<<", 1)
+        value = []
+        for value_line in lines:
+            if value_line == delimiter:
+                break
+            value.append(value_line)
+        outputs[name] = "\n".join(value)
+    return outputs
+
+
+def test_format_outputs_multiline():
+    content = format_outputs({"score": 90, "summary": '{\n  "score": 90\n}'})
+    assert parse_outputs(content) == {"score": "90", "summary": '{\n  "score": 90\n}'}
+    assert re.match(r"score<<ghadelimiter_[0-9a-f-]{36}\n90\n", content)
+
+
+def test_write_outputs_appends(tmp_path, monkeypatch):
+    path = tmp_path / "output"
+    path.write_text("earlier=1\n")
+    monkeypatch.setenv("GITHUB_OUTPUT", str(path))
+
+    assert write_outputs({"certainty_score": 80}) is True
+    assert write_outputs({"conclusion": "success"}, str(path)) is True
+
+    content = path.read_text()
+    assert content.startswith("earlier=1\n")
+    assert parse_outputs(content.split("\n", 1)[1]) == {
+        "certainty_score": "80",
+        "conclusion": "success",
+    }
+
+
+def test_write_outputs_without_file(monkeypatch):
+    monkeypatch.delenv("GITHUB_OUTPUT", raising=False)
+    assert write_outputs({"certainty_score": 80}) is False
+
+
+def test_write_step_summary(tmp_path, monkeypatch):
+    path = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(path))
+
+    assert write_step_summary("## Report") is True
+    assert path.read_text() == "## Report\n"
+
+
+def test_write_step_summary_without_file(monkeypatch):
+    monkeypatch.delenv("GITHUB_STEP_SUMMARY", raising=False)
+    assert write_step_summary("## Report") is False
@@ -0,0 +1,133 @@
+from datetime import datetime, UTC
+from unittest.mock import patch
+
+from src.certainty_score import CertaintyScore
+from src.partitions import (
+    ROOT_PROJECT,
+    ProjectRoots,
+    aggregate_scores,
+    assess_partitions,
+    parse_project_roots,
+    partition_files,
+)
+from src.replay import SnapshotFile
+
+NOW = datetime(2024, 1, 3, 12, tzinfo=UTC)
+
+
+def test_parse_project_roots():
+    assert parse_project_roots(" services/api/, packages/*\nlibs/core ,") == [
+        "services/api",
+        "packages/*",
+        "libs/core",
+    ]
+    assert parse_project_roots("") == []
+
+
+def test_project_for_longest_root():
+    roots = ProjectRoots(["services", "services/api", "packages/*", "packages/core/plugins"])
+
+    assert roots.project_for("services/api/app.py") == "services/api"
+    assert roots.project_for("services/api/v2/app.py") == "services/api"
+    assert roots.project_for("services/web/app.py") == "services"
+    assert roots.project_for("packages/ui/index.ts") == "packages/ui"
+    assert roots.project_for("packages/core/plugins/a/b.ts") == "packages/core/plugins"
+    assert roots.project_for("packages/core/src/b.ts") == "packages/core"
+    assert roots.project_for("packages/README.md") == ROOT_PROJECT
+    assert roots.project_for("README.md") == ROOT_PROJECT
+    assert roots.project_for("servicesx/app.py") == ROOT_PROJECT
+
+
+def test_partition_files_keeps_order():
+    files = [
+        SnapshotFile("services/api/a.py"),
+        SnapshotFile("docs/index.md"),
+        SnapshotFile("services/api/b.py"),
+    ]
+
+    partitions = partition_files(files, ProjectRoots(["services/api"]))
+
+    assert list(partitions) == ["services/api", ROOT_PROJECT]
+    assert [f.filename for f in partitions["services/api"]] == [
+        "services/api/a.py",
+        "services/api/b.py",
+    ]
+
+
+def test_aggregate_scores():
+    partitions = {
+        "api": CertaintyScore(
+            60,
+            ["No reviewer assigned", "Suspicious file(s)"],
+            ["api/.env"],
+            "failure",
+            {"secret_file": ["api/.env"]},
+        ),
+        "web": CertaintyScore(90, ["No reviewer assigned"], [], "success"),
+    }
+
+    aggregate = aggregate_scores(partitions)
+
+    assert aggregate.score == 60
+    assert aggregate.conclusion == "failure"
+    assert aggregate.reasons == ["No reviewer assigned", "api: Suspicious file(s)"]
+    assert aggregate.files == ["api/.env"]
+    assert aggregate.rule_hits == {"secret_file": ["api/.env"]}
+
+
+def test_assess_partitions_scores_each_project():
+    files = [SnapshotFile("services/api/.env")] + [
+        SnapshotFile(f"services/web/page_{i}.ts") for i in range(3)
+    ]
+
+    result = assess_partitions(
+        files,
+        ProjectRoots(["services/*"]),
+        reviewers=["alice"],
+        max_files=2,
+        current_time=NOW,
+    )
+
+    assert list(result.partitions) == ["services/api", "services/web"]
+    assert result.partitions["services/api"].files == ["services/api/.env"]
+    assert result.partitions["services/web"].reasons == ["3 files changed (max is 2)"]
+    assert result.aggregate.score == 70
+    assert result.aggregate.reasons == [
+        "services/api: Suspicious file(s)",
+        "services/web: 3 files changed (max is 2)",
+    ]
+
+
+def test_assess_partitions_all_good():
+    result = assess_partitions(
+        [SnapshotFile("a/x.py"), SnapshotFile("b/y.py")],
+        ProjectRoots(["a", "b"]),
+        reviewers=["alice"],
+        current_time=NOW,
+    )
+
+    assert result.aggregate == CertaintyScore(
+        100, ["All good. No major risks detected."], [], "success"
+    )
+
+
+def test_assess_partitions_no_files():
+    result = assess_partitions([], ProjectRoots(["a"]), reviewers=[], current_time=NOW)
+
+    assert list(result.partitions) == [ROOT_PROJECT]
+    assert result.aggregate.reasons == ["No reviewer assigned"]
+
+
+def test_assess_partitions_in_parallel_matches_in_process():
+    files = [
+        SnapshotFile(f"packages/p{i % 7}/file_{i}{'.env' if i % 11 == 0 else '.py'}", i, 0)
+        for i in range(200)
+    ]
+    roots = ProjectRoots(["packages/*"])
+    kwargs = dict(reviewers=["alice"], max_files=20, current_time=NOW)
+
+    expected = assess_partitions(files, roots, workers=1, **kwargs)
+    with patch("src.partitions.PARALLEL_MIN_FILES", 0):
+        result = assess_partitions(files, roots, workers=2, **kwargs)
+
+    assert result == expected
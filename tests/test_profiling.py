@@ -0,0 +1,86 @@
+import pstats
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from src.profiling import RunProfile, collapse_stacks
+
+
+def leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def middle():
+    return leaf(20000)
+
+
+def outer():
+    return [leaf(10000), middle(), bytearray(200000)]
+
+
+def test_headline_while_running():
+    with RunProfile() as profile:
+        outer()
+        headline = profile.headline(top=3)
+        outer()
+
+    assert headline.startswith("### Profile\n\nTotal time ")
+    assert headline.count("\n| `") == 3
+    # Taking the headline did not stop profiling
+    calls = pstats.Stats(profile.profiler).stats
+    assert [v[1] for k, v in calls.items() if k[2] == "outer"] == [2]
+    assert not tracemalloc.is_tracing()
+
+
+def test_allocation_report():
+    with RunProfile() as profile:
+        held = bytearray(500000)
+
+    report = profile.allocation_report(top=3)
+
+    assert report.startswith("Peak traced memory: ")
+    assert "test_profiling.py" in report.splitlines()[3]
+    assert len(held) == 500000
+
+
+def test_allocation_report_before_stop():
+    with pytest.raises(ValueError, match="has not been stopped"):
+        RunProfile().allocation_report()
+
+
+def test_collapse_stacks():
+    with RunProfile() as profile:
+        outer()
+
+    collapsed = collapse_stacks(profile.stats())
+
+    labels = [stack.split(";") for stack in collapsed]
+    nested = [
+        [label.rsplit("(", 1)[-1] for label in stack[-5:]]
+        for stack in labels
+        if stack[-1].endswith("(<genexpr>)")
+    ]
+    assert ["outer)", "middle)", "leaf)", "built-in method builtins.sum", "<genexpr>)"] in nested
+    # The time under outer is split between its stacks without losing any
+    outer_time = next(v[3] for k, v in profile.stats().stats.items() if k[2] == "outer")
+    under_outer = sum(t for stack, t in collapsed.items() if "(outer)" in stack)
+    assert under_outer == pytest.approx(outer_time, rel=0.05)
+
+
+def test_write(tmp_path):
+    with RunProfile() as profile:
+        outer()
+
+    paths = profile.write(str(tmp_path / "out"))
+
+    assert [p.rsplit("/", 1)[1] for p in paths] == [
+        "profile.prof",
+        "allocations.txt",
+        "profile.collapsed",
+    ]
+    assert pstats.Stats(paths[0]).total_calls > 0
+    for line in Path(paths[2]).read_text().splitlines():
+        stack, microseconds = line.rsplit(" ", 1)
+        assert stack
+        assert int(microseconds) > 0
@@ -0,0 +1,199 @@
+import json
+from dataclasses import asdict
+from datetime import datetime, UTC
+
+import pytest
+
+from src.certainty_score import CertaintyScore
+from src.codeowners import CodeOwners
+from src.config import RiskConfig
+from src.dependencies import DependencyDiff, PackageChange
+from src.deploy_window import DeploymentWindow, parse_weekly_rules
+from src.replay import PRSnapshot, iter_snapshots, record_snapshot, replay, main
+
+
+class File:
+    def __init__(self, filename):
+        self.filename = filename
+
+
+class Reviewer:
+    def __init__(self, login):
+        self.login = login
+
+
+def make_snapshot(
+    files, reviewers=("alice",), conclusion="success", sha="abc", risk_config=None
+):
+    return PRSnapshot(
+        repo="owner/repo",
+        sha=sha,
+        files=list(files),
+        reviewers=list(reviewers),
+        timestamp=datetime(2024, 1, 3, 10, 0, tzinfo=UTC),
+        score=100,
+        conclusion=conclusion,
+        risk_config=asdict(risk_config) if risk_config else None,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "snapshots" / "store.jsonl")
+    config = RiskConfig(min_certainty=80)
+    record_snapshot(path, make_snapshot(["main.py"], sha="small", risk_config=config))
+    big = make_snapshot([f"f{i}.py" for i in range(15)], sha="big", risk_config=config)
+    record_snapshot(path, big)
+    env = make_snapshot(["config/.env"], conclusion="failure", sha="env", risk_config=config)
+    record_snapshot(path, env)
+    return path
+
+
+def test_capture():
+    score = CertaintyScore(90, ["No reviewer assigned"], [], "success")
+    snapshot = PRSnapshot.capture(
+        "owner/repo", "sha1", [File("a.py")], [Reviewer("bob")], score
+    )
+    assert snapshot.files == ["a.py"]
+    assert snapshot.reviewers == ["bob"]
+    assert snapshot.score == 90
+    assert snapshot.conclusion == "success"
+
+
+def test_capture_records_rule_inputs():
+    score = CertaintyScore(60, [], [], "failure")
+    codeowners = CodeOwners("/infra/ @org/ops\n")
+    diff = DependencyDiff("requirements.txt", [PackageChange("django", "3.2", "4.2")])
+    window = DeploymentWindow(weekly=parse_weekly_rules("wed"))
+
+    snapshot = PRSnapshot.capture(
+        "owner/repo",
+        "sha1",
+        [File("infra/main.tf"), File("requirements.txt")],
+        [Reviewer("bob")],
+        score,
+        timestamp=datetime(2024, 1, 3, 10, 0, tzinfo=UTC),
+        reviewer_teams=["org/web"],
+        codeowners=codeowners,
+        hot_paths={"infra/main.tf"},
+        dependency_diffs=[diff],
+        deploy_window=window,
+    )
+    assert snapshot.owners == [["@org/ops"], []]
+    assert snapshot.hot_paths == ["infra/main.tf"]
+    assert snapshot.dependency_diffs == {"requirements.txt": [["django", "3.2", "4.2"]]}
+    assert snapshot.blocked_reason == "Deploying during blocked hours (wed)"
+
+    # Replaying with the recorded inputs reaches the recorded conclusion
+    replayed = PRSnapshot.from_json(snapshot.to_json())
+    assert replayed == snapshot
+    result = replayed.assess({})
+    assert set(result.rule_hits) == {"codeowners", "hot_path", "dependencies"}
+    assert "Deploying during blocked hours (wed)" in result.reasons
+    assert result.conclusion == "failure"
+
+
+def test_assess_applies_config_to_recorded_settings():
+    files = [File(f"f{i}.py") for i in range(30)]
+    timestamp = datetime(2024, 1, 5, 17, 0, tzinfo=UTC)  # Friday 5PM
+    risk_config = RiskConfig(check_work_hours=False, max_files=50, min_certainty=50)
+    score = CertaintyScore(100, [], [], "success")
+
+    snapshot = PRSnapshot.capture(
+        "owner/repo",
+        "sha1",
+        files,
+        [Reviewer("bob")],
+        score,
+        timestamp=timestamp,
+        deploy_window=DeploymentWindow(),
+        risk_config=risk_config,
+    )
+    assert snapshot.blocked_reason is None
+    assert snapshot.fingerprint == risk_config.fingerprint
+
+    snapshot = PRSnapshot.from_json(snapshot.to_json())
+    assert snapshot.recorded_config() == risk_config
+    assert snapshot.assess({}).conclusion == "success"
+
+    result = snapshot.assess({"max_files": 20, "check_work_hours": True})
+    assert "30 files changed (max is 20)" in result.reasons
+    assert "Deploying late on Friday" in result.reasons
+
+
+def test_assess_recomputes_changed_window():
+    snapshot = make_snapshot(["a.py"])
+    snapshot.blocked_reason = ""
+    assert snapshot.assess({}).reasons == ["All good. No major risks detected."]
+
+    result = snapshot.assess({"blocked_hours": "wed"})
+    assert result.reasons == ["Deploying during blocked hours (wed)"]
+
+
+def test_assess_without_recorded_inputs_uses_defaults():
+    snapshot = make_snapshot(["a.py"])
+    snapshot.timestamp = datetime(2024, 1, 5, 17, 0, tzinfo=UTC)
+
+    assert "Deploying late on Friday" in snapshot.assess({}).reasons
+
+    snapshot.blocked_reason = ""
+    assert "Deploying late on Friday" not in snapshot.assess({}).reasons
+
+
+def test_json_round_trip():
+    snapshot = make_snapshot(["a.py", "b.py"])
+    assert PRSnapshot.from_json(snapshot.to_json()) == snapshot
+
+
+def test_iter_snapshots_skips_partial_line(store):
+    with open(store, "a") as f:
+        f.write('{"repo": "owner/re')
+    snapshots = list(iter_snapshots(store))
+    assert [s.sha for s in snapshots] == ["small", "big", "env"]
+
+
+def test_assess_uses_recorded_time():
+    snapshot = make_snapshot(["main.py"])
+    snapshot.timestamp = datetime(2024, 1, 5, 17, 30, tzinfo=UTC)  # Friday 5:30PM
+    result = snapshot.assess({"min_certainty": 90})
+    assert any("Friday" in r for r in result.reasons)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_replay_counts_flips(store, workers):
+    configs = {
+        "same": {},
+        "strict": {"max_files": 10, "min_certainty": 90},
+        "relaxed": {"min_certainty": 60},
+    }
+    results = replay(store, configs, workers=workers, chunk_size=1)
+
+    assert results["same"].total == 3
+    assert results["same"].flipped == 0
+
+    assert results["strict"].flipped == 1
+    assert results["strict"].flipped_to_failure == 1
+    assert results["strict"].examples == ["owner/repo@big"]
+
+    assert results["relaxed"].flipped == 1
+    assert results["relaxed"].flipped_to_success == 1
+    assert results["relaxed"].failures == 0
+
+
+def test_replay_requires_config(store):
+    with pytest.raises(ValueError, match="At least one config"):
+        replay(store, {})
+
+
+def test_replay_rejects_invalid_config(store):
+    with pytest.raises(ValueError, match="Invalid config 'bad'"):
+        replay(store, {"bad": {"min_certainty": 200}})
+
+
+def test_main(store, tmp_path, capsys):
+    configs = tmp_path / "configs.json"
+    configs.write_text(json.dumps({"strict": {"max_files": 10, "min_certainty": 90}}))
+
+    main([store, str(configs), "--workers", "1"])
+
+    assert "strict: 1/3 flipped" in capsys.readouterr().out
@@ -1,11 +1,15 @@
 # test_risk.py
 from datetime import datetime
-from src.risk import assess_risk
+from src.codeowners import CodeOwners
+from src.dependencies import DependencyDiff, PackageChange
+from src.risk import SecretGlobs, assess_risk
 
 
 class File:
-    def __init__(self, filename):
+    def __init__(self, filename, additions=0, deletions=0):
         self.filename = filename
+        self.additions = additions
+        self.deletions = deletions
 
 
 def test_low_risk():
@@ -34,6 +38,21 @@ def test_secret_file_risk():
     assert "config/.env" in certainty_score.files
 
 
+def test_secret_globs_count():
+    globs = SecretGlobs((".env", ".pem", "prod.env"))
+    assert globs.count("main.py") == 0
+    assert globs.count("certs/key.pem") == 1
+    assert globs.count("config/prod.env") == 2
+
+
+def test_secret_file_risk_compiled_globs():
+    changed_files = [File("config/prod.env"), File("main.py")]
+    plain = assess_risk(changed_files, ["bob"], secret_globs=[".env", "prod.env"])
+    compiled = assess_risk(changed_files, ["bob"], secret_globs=SecretGlobs((".env", "prod.env")))
+    assert compiled.score == plain.score
+    assert compiled.files == plain.files == ["config/prod.env", "config/prod.env"]
+
+
 def test_time_risk():
     fake_friday = datetime(2024, 1, 5, 17, 30)  # Friday 5:30PM
     certainty_score = assess_risk(
@@ -47,3 +66,137 @@ def test_no_reviewer_risk():
     certainty_score = assess_risk(changed_files=[File("main.py")], reviewers=[])
     assert certainty_score.score < 100
     assert any("No reviewer" in r for r in certainty_score.reasons)
+
+
+def test_codeowners_risk():
+    codeowners = CodeOwners("/infra/ @org/platform\n/docs/ @alice\n")
+    certainty_score = assess_risk(
+        changed_files=[File("infra/main.tf"), File("docs/a.md"), File("main.py")],
+        reviewers=["alice"],
+        check_work_hours=False,
+        codeowners=codeowners,
+    )
+    assert certainty_score.score == 90
+    assert "1 file(s) not owned by a requested reviewer" in certainty_score.reasons
+    assert certainty_score.files == ["infra/main.tf"]
+
+
+def test_codeowners_team_reviewer():
+    codeowners = CodeOwners("/infra/ @Org/Platform\n")
+    certainty_score = assess_risk(
+        changed_files=[File("infra/main.tf")],
+        reviewers=[],
+        check_work_hours=False,
+        codeowners=codeowners,
+        reviewer_teams=["org/platform"],
+    )
+    assert not any("not owned" in r for r in certainty_score.reasons)
+
+
+def test_churn_risk():
+    certainty_score = assess_risk(
+        changed_files=[File("main.py", 20000, 300)],
+        reviewers=["alice"],
+        check_work_hours=False,
+    )
+    assert certainty_score.score == 70
+    assert "20300 weighted lines changed (max is 1000)" in certainty_score.reasons
+    assert certainty_score.files == ["main.py"]
+
+
+def test_many_small_edits_score_better_than_large_rewrite():
+    small = assess_risk(
+        changed_files=[File(f"file{i}.py", 1, 1) for i in range(25)],
+        reviewers=["alice"],
+        check_work_hours=False,
+    )
+    rewrite = assess_risk(
+        changed_files=[File("main.py", 20000, 0)],
+        reviewers=["alice"],
+        check_work_hours=False,
+    )
+    assert small.score > rewrite.score
+
+
+def test_churn_ignores_generated_files():
+    certainty_score = assess_risk(
+        changed_files=[File("package-lock.json", 30000, 20000), File("main.py", 10, 2)],
+        reviewers=["alice"],
+        check_work_hours=False,
+    )
+    assert certainty_score.score == 100
+
+
+def test_churn_weights():
+    certainty_score = assess_risk(
+        changed_files=[File("schema.sql", 400, 0)],
+        reviewers=["alice"],
+        check_work_hours=False,
+        churn_weights={".sql": 3},
+    )
+    assert any("large changes" in r for r in certainty_score.reasons)
+
+
+def test_hot_path_risk():
+    certainty_score = assess_risk(
+        changed_files=[File("infra/main.tf"), File("main.py")],
+        reviewers=["alice"],
+        check_work_hours=False,
+        hot_paths={"infra/main.tf"},
+    )
+    assert certainty_score.score == 90
+    assert certainty_score.rule_hits == {"hot_path": ["infra/main.tf"]}
+
+
+def test_rule_hits():
+    certainty_score = assess_risk(
+        changed_files=[File("config/.env"), File("big.py", 800, 0)],
+        reviewers=["bob"],
+        check_work_hours=False,
+    )
+    assert certainty_score.rule_hits == {
+        "secret_file": ["config/.env"],
+        "churn": ["big.py"],
+    }
+
+
+def test_dependency_risk():
+    diffs = [
+        DependencyDiff(
+            "requirements.txt",
+            [PackageChange("django", "3.2", "4.2"), PackageChange("six", None, "1.16.0")],
+        ),
+        DependencyDiff("web/package-lock.json", [PackageChange("react", "18.2.0", "18.3.1")]),
+        DependencyDiff("poetry.lock", []),
+        # Not changed by this PR, e.g. in another project of a monorepo
+        DependencyDiff("other/requirements.txt", [PackageChange("flask", "1.0", "3.0")]),
+    ]
+    certainty_score = assess_risk(
+        changed_files=[
+            File("requirements.txt"),
+            File("web/package-lock.json"),
+            File("poetry.lock"),
+        ],
+        reviewers=["alice"],
+        check_work_hours=False,
+        dependency_diffs=diffs,
+    )
+    assert certainty_score.score == 80
+    assert certainty_score.reasons == [
+        "3 dependency change(s) in 2 manifest(s)",
+        "1 major version bump(s): django 3.2 -> 4.2",
+    ]
+    assert certainty_score.rule_hits == {
+        "dependencies": ["requirements.txt", "web/package-lock.json"]
+    }
+
+
+def test_dependency_risk_lists_few_bumps():
+    changes = [PackageChange(f"pkg{i}", "1.0", "2.0") for i in range(7)]
+    certainty_score = assess_risk(
+        changed_files=[File("requirements.txt")],
+        reviewers=["alice"],
+        check_work_hours=False,
+        dependency_diffs=[DependencyDiff("requirements.txt", changes)],
+    )
+    assert certainty_score.reasons[1].endswith("pkg4 1.0 -> 2.0 and 2 more")
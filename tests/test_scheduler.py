@@ -0,0 +1,419 @@
+import threading
+
+import pytest
+
+from src.scheduler import (
+    PRIORITY_NORMAL,
+    PRIORITY_RELEASE,
+    FairScheduler,
+    branch_priority,
+)
+
+HOUR = 3600.0
+
+
+class FakeClock:
+    """A clock that only moves when slept on or advanced."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeAPI:
+    """An API with an hourly rate limit that fails requests once it is used up."""
+
+    def __init__(self, clock: FakeClock, limit: int, latency: float = 0.1):
+        self.clock = clock
+        self.limit = limit
+        self.latency = latency
+        self.reset_at = 0.0
+        self.remaining = 0
+        self.requests = 0
+
+    def _refresh(self) -> None:
+        if self.clock() >= self.reset_at:
+            self.reset_at = (self.clock() // HOUR + 1) * HOUR
+            self.remaining = self.limit
+
+    def request(self) -> None:
+        self._refresh()
+        if self.remaining == 0:
+            raise RuntimeError("API rate limit exceeded")
+        self.remaining -= 1
+        self.requests += 1
+        self.clock.now += self.latency
+
+    def rate_limit(self):
+        self._refresh()
+        return self.remaining, self.limit, self.reset_at
+
+
+class StaleAPI:
+    """Rate limit headers that are only refreshed by making a request."""
+
+    def __init__(self, clock: FakeClock, limit: int):
+        self.api = FakeAPI(clock, limit)
+        self.headers = (limit, limit, HOUR)
+
+    def request(self) -> None:
+        self.api.request()
+        self.headers = (self.api.remaining, self.api.limit, self.api.reset_at)
+
+    def rate_limit(self):
+        return self.headers
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def log():
+    return []
+
+
+def job(log, repo_name, api=None, requests=0):
+    def run():
+        for _ in range(requests):
+            api.request()
+        log.append(repo_name)
+        return repo_name
+
+    return run
+
+
+def make_scheduler(clock, api=None, **kwargs):
+    return FairScheduler(
+        rate_limit=api.rate_limit if api else None, clock=clock, sleep=clock.sleep, **kwargs
+    )
+
+
+@pytest.mark.parametrize(
+    "branch, priority",
+    [
+        ("release/1.2", PRIORITY_RELEASE),
+        ("release-2024-05", PRIORITY_RELEASE),
+        ("hotfix/login", PRIORITY_RELEASE),
+        ("main", PRIORITY_NORMAL),
+        ("feature/release-notes", PRIORITY_NORMAL),
+    ],
+)
+def test_branch_priority(branch, priority):
+    assert branch_priority(branch) == priority
+
+
+def test_submit_returns_future(clock, log):
+    scheduler = make_scheduler(clock)
+
+    future = scheduler.submit("org/a", job(log, "org/a"))
+    scheduler.run()
+
+    assert future.result() == "org/a"
+    assert scheduler.pending() == 0
+
+
+def test_submit_invalid_cost(clock, log):
+    with pytest.raises(ValueError, match="Cost must be at least 1"):
+        make_scheduler(clock).submit("org/a", job(log, "org/a"), cost=0)
+
+
+def test_failed_job_does_not_stop_others(clock, log):
+    scheduler = make_scheduler(clock)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    failed = scheduler.submit("org/a", fail)
+    scheduler.submit("org/a", job(log, "org/a"))
+    scheduler.run()
+
+    assert isinstance(failed.exception(), RuntimeError)
+    assert log == ["org/a"]
+
+
+def test_each_repo_is_first_in_first_out(clock):
+    scheduler = make_scheduler(clock)
+    order = []
+    for i in range(5):
+        scheduler.submit("org/a", lambda i=i: order.append(i))
+    scheduler.run()
+
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_equal_weights_alternate(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(3):
+        scheduler.submit("org/a", job(log, "org/a"))
+    for _ in range(3):
+        scheduler.submit("org/b", job(log, "org/b"))
+    scheduler.run()
+
+    assert log == ["org/a", "org/b"] * 3
+
+
+def test_weights_share_requests(clock, log):
+    scheduler = make_scheduler(clock, weights={"org/a": 2})
+    for _ in range(30):
+        scheduler.submit("org/a", job(log, "org/a"))
+        scheduler.submit("org/b", job(log, "org/b"))
+
+    for _ in range(12):
+        scheduler.run_next()
+
+    assert log.count("org/a") == 8
+    assert log.count("org/b") == 4
+
+
+def test_share_accounts_for_cost(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(10):
+        scheduler.submit("org/big", job(log, "org/big"), cost=3)
+        scheduler.submit("org/small", job(log, "org/small"))
+
+    for _ in range(8):
+        scheduler.run_next()
+
+    assert log.count("org/big") == 2
+    assert log.count("org/small") == 6
+
+
+def test_idle_repo_does_not_wait_behind_backlog(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(100):
+        scheduler.submit("org/monorepo", job(log, "org/monorepo"))
+    for _ in range(50):
+        scheduler.run_next()
+
+    scheduler.submit("org/small", job(log, "org/small"))
+    scheduler.run_next()
+
+    assert log[-1] == "org/small"
+
+
+def test_idle_repo_does_not_bank_credit(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(10):
+        scheduler.submit("org/a", job(log, "org/a"))
+    for _ in range(10):
+        scheduler.run_next()
+
+    # org/b was idle while org/a ran, so it only gets its share from now on
+    for _ in range(4):
+        scheduler.submit("org/a", job(log, "org/a"))
+        scheduler.submit("org/b", job(log, "org/b"))
+    for _ in range(4):
+        scheduler.run_next()
+
+    assert log[10:].count("org/a") == 2
+
+
+def test_release_branches_go_first(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(5):
+        scheduler.submit("org/a", job(log, "org/a"))
+        scheduler.submit("org/b", job(log, "org/b"))
+    scheduler.submit("org/a", job(log, "org/a release"), priority=branch_priority("release/1"))
+    scheduler.submit("org/c", job(log, "org/c release"), priority=PRIORITY_RELEASE)
+    scheduler.run()
+
+    assert log[:2] == ["org/a release", "org/c release"]
+    assert len(log) == 12
+
+
+def test_budget_defers_repo_to_next_window(clock, log):
+    api = FakeAPI(clock, limit=5000)
+    scheduler = make_scheduler(clock, api, budgets={"org/monorepo": 10})
+    for _ in range(5):
+        scheduler.submit("org/monorepo", job(log, "org/monorepo", api, 5), cost=5)
+    for _ in range(3):
+        scheduler.submit("org/small", job(log, "org/small", api, 1))
+
+    while scheduler.run_next():
+        pass
+
+    assert log.count("org/monorepo") == 2
+    assert log.count("org/small") == 3
+
+    scheduler.run()
+
+    assert log.count("org/monorepo") == 5
+    # Two windows of sleep: one for the third job, one for the fifth
+    assert len(clock.sleeps) == 2
+    assert clock() >= 2 * HOUR
+
+
+def test_default_budget(clock, log):
+    api = FakeAPI(clock, limit=5000)
+    scheduler = make_scheduler(clock, api, budgets={"org/vip": 100}, default_budget=2)
+    for repo_name in ("org/vip", "org/other"):
+        for _ in range(3):
+            scheduler.submit(repo_name, job(log, repo_name, api, 1))
+
+    while scheduler.run_next():
+        pass
+
+    assert log.count("org/vip") == 3
+    assert log.count("org/other") == 2
+
+
+def test_job_larger_than_budget_runs_alone(clock, log):
+    api = FakeAPI(clock, limit=5000)
+    scheduler = make_scheduler(clock, api, default_budget=10)
+    scheduler.submit("org/a", job(log, "org/a", api, 25), cost=25)
+    scheduler.submit("org/a", job(log, "org/a", api, 1))
+
+    assert scheduler.run_next()
+    assert not scheduler.run_next()
+
+
+def test_charges_actual_requests(clock, log):
+    api = FakeAPI(clock, limit=5000)
+    scheduler = make_scheduler(clock, api, default_budget=10)
+    # Estimated at 1 request each, but they make 8 and 3
+    scheduler.submit("org/a", job(log, "org/a", api, 8))
+    scheduler.submit("org/a", job(log, "org/a", api, 3))
+    scheduler.submit("org/a", job(log, "org/a", api, 1))
+
+    while scheduler.run_next():
+        pass
+
+    # The third job would go over the budget of 10 after the 11 actually used
+    assert scheduler.metrics()["org/a"].requests == 11
+    assert len(log) == 2
+
+
+def test_shared_rate_limit_is_never_exceeded(clock, log):
+    api = FakeAPI(clock, limit=100)
+    scheduler = make_scheduler(clock, api)
+    for _ in range(200):
+        scheduler.submit("org/monorepo", job(log, "org/monorepo", api, 5), cost=5)
+    small_repos = [f"org/small-{i}" for i in range(10)]
+    for repo_name in small_repos:
+        scheduler.submit(repo_name, job(log, repo_name, api, 2), cost=2)
+
+    scheduler.run()
+
+    # The fake API raises once the limit is used up, so every job succeeding proves it held
+    assert len(log) == 210
+    assert api.requests == 200 * 5 + 10 * 2
+    metrics = scheduler.metrics()
+    # The small repos were all served in the first window, ahead of the monorepo's backlog
+    assert all(metrics[r].max_wait < HOUR for r in small_repos)
+    assert metrics["org/monorepo"].max_wait > 8 * HOUR
+
+
+def test_waits_for_rate_limit_reset(clock, log):
+    api = FakeAPI(clock, limit=3)
+    scheduler = make_scheduler(clock, api)
+    for _ in range(2):
+        scheduler.submit("org/a", job(log, "org/a", api, 2), cost=2)
+
+    scheduler.run()
+
+    assert log == ["org/a", "org/a"]
+    assert clock.sleeps == [pytest.approx(HOUR - 1000.2)]
+
+
+def test_stale_rate_limit_is_assumed_reset(clock, log):
+    api = StaleAPI(clock, limit=3)
+    scheduler = make_scheduler(clock, api)
+    for _ in range(3):
+        scheduler.submit("org/a", job(log, "org/a", api, 2), cost=2)
+
+    scheduler.run()
+
+    # Without fresh headers after the reset the scheduler would sleep forever
+    assert log == ["org/a"] * 3
+    assert len(clock.sleeps) == 2
+
+
+def test_job_larger_than_rate_limit_runs_alone_after_reset(clock, log):
+    api = FakeAPI(clock, limit=10)
+    scheduler = make_scheduler(clock, api)
+    scheduler.submit("org/a", job(log, "org/a", api, 3))
+    # Estimated at more than the whole limit, so it waits for a fresh window
+    scheduler.submit("org/b", job(log, "org/b", api, 10), cost=25)
+    scheduler.submit("org/a", job(log, "org/a", api, 3))
+
+    scheduler.run()
+
+    assert log == ["org/a", "org/b", "org/a"]
+    assert len(clock.sleeps) == 2
+
+
+def test_metrics(clock, log):
+    scheduler = make_scheduler(clock)
+    for _ in range(3):
+        scheduler.submit("org/a", job(log, "org/a"))
+    scheduler.submit("org/b", job(log, "org/b"))
+
+    metrics = scheduler.metrics()
+    assert metrics["org/a"].depth == 3
+    assert metrics["org/b"].depth == 1
+    assert metrics["org/a"].mean_wait == 0.0
+
+    clock.now += 10
+    scheduler.run_next()
+    clock.now += 20
+    scheduler.run()
+
+    metrics = scheduler.metrics()
+    assert metrics["org/a"].depth == 0
+    assert metrics["org/a"].dispatched == 3
+    assert metrics["org/a"].requests == 3
+    assert metrics["org/a"].max_wait == 30
+    assert metrics["org/a"].mean_wait == pytest.approx((10 + 30 + 30) / 3)
+    assert metrics["org/b"].max_wait == 30
+
+
+def test_metrics_are_a_snapshot(clock, log):
+    scheduler = make_scheduler(clock)
+    scheduler.submit("org/a", job(log, "org/a"))
+
+    metrics = scheduler.metrics()
+    scheduler.run()
+
+    assert metrics["org/a"].depth == 1
+
+
+def test_cancelled_job_is_skipped(clock, log):
+    scheduler = make_scheduler(clock)
+    future = scheduler.submit("org/a", job(log, "org/a"))
+    future.cancel()
+
+    scheduler.run()
+
+    assert log == []
+    assert scheduler.metrics()["org/a"].requests == 0
+
+
+def test_submit_from_threads(clock, log):
+    scheduler = make_scheduler(clock)
+
+    def submit_many(repo_name):
+        for _ in range(250):
+            scheduler.submit(repo_name, job(log, repo_name))
+
+    threads = [
+        threading.Thread(target=submit_many, args=(f"org/{i}",)) for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert scheduler.pending() == 1000
+    scheduler.run()
+    assert len(log) == 1000
+    # Fair sharing keeps every repo within one job of the others throughout
+    assert sorted(log[:4]) == [f"org/{i}" for i in range(4)]